@@ -0,0 +1,239 @@
+"""
+Multi-Resolution Sales Rollups for Wing Shop
+Daily/weekly/monthly/quarterly totals per product and store, built once at
+load time and updated incrementally when new daily rows are appended
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+
+GRANULARITIES = {'daily': 'D', 'weekly': 'W', 'monthly': 'M', 'quarterly': 'Q'}
+
+PRODUCT_COLUMNS = ['family', 'product', 'category', 'product_name']
+STORE_COLUMNS = ['store_nbr', 'store', 'store_id']
+
+ALL = 'all'
+
+def period_start(dates, granularity):
+    """Start of the daily/weekly (Monday)/monthly/quarterly period of each date"""
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    freq = GRANULARITIES[granularity]
+    if freq == 'D':
+        return dates.normalize()
+    return dates.to_period(freq).start_time
+
+class PeriodTable:
+    """
+    Period totals of one key in arrays that grow by doubling
+
+    Adding to existing periods and appending periods after the last one
+    both happen in place, so folding in a day touches only its periods.
+    A period before the last one that is not stored yet (out-of-order
+    rows) is inserted, which copies the arrays.
+    """
+
+    def __init__(self, capacity=16):
+        self.periods = np.empty(capacity, dtype='datetime64[ns]')
+        self.sales = np.zeros(capacity)
+        self.rows = np.zeros(capacity)
+        self.size = 0
+        self._frame = None
+
+    def add(self, periods, sales, rows):
+        """Add totals for sorted, distinct periods"""
+        periods = np.asarray(periods, dtype='datetime64[ns]')
+        sales = np.asarray(sales, dtype=np.float64)
+        rows = np.asarray(rows, dtype=np.float64)
+        n = self.size
+        pos = np.searchsorted(self.periods[:n], periods)
+        found = pos < n
+        found[found] = self.periods[pos[found]] == periods[found]
+        self.sales[pos[found]] += sales[found]
+        self.rows[pos[found]] += rows[found]
+
+        new = ~found
+        if new.any():
+            if n and periods[new][0] <= self.periods[n - 1]:
+                self._insert(pos[new], periods[new], sales[new], rows[new])
+            else:
+                k = int(new.sum())
+                if n + k > len(self.periods):
+                    self._grow(max(2 * len(self.periods), n + k))
+                self.periods[n:n + k] = periods[new]
+                self.sales[n:n + k] = sales[new]
+                self.rows[n:n + k] = rows[new]
+                self.size = n + k
+        self._frame = None
+
+    def _grow(self, capacity):
+        for name in ['periods', 'sales', 'rows']:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _insert(self, positions, periods, sales, rows):
+        n = self.size
+        self.periods = np.insert(self.periods[:n], positions, periods)
+        self.sales = np.insert(self.sales[:n], positions, sales)
+        self.rows = np.insert(self.rows[:n], positions, rows)
+        self.size = len(self.periods)
+
+    def since(self, first):
+        """(period starts, sales) of the periods starting at or after `first`"""
+        start = np.searchsorted(self.periods[:self.size], np.datetime64(first, 'ns'))
+        return self.periods[start:self.size].copy(), self.sales[start:self.size].copy()
+
+    def last(self):
+        return pd.Timestamp(self.periods[self.size - 1]) if self.size else None
+
+    def frame(self):
+        """The table as a frame with 'sales' and 'rows', indexed by period start"""
+        if self._frame is None:
+            n = self.size
+            self._frame = pd.DataFrame({'sales': self.sales[:n].copy(), 'rows': self.rows[:n].copy()},
+                                       index=pd.DatetimeIndex(self.periods[:n].copy()))
+        return self._frame
+
+class Rollups:
+    """
+    Period totals keyed by (product, store), including 'all' for either
+
+    Each table holds, per period start, 'sales' (sum of unit sales) and
+    'rows' (daily rows that went into the total).
+    """
+
+    def __init__(self, frame, sales_col='unit_sales', product_col=None, store_col=None):
+        self.sales_col = sales_col
+        self.product_col = product_col if product_col is not None else _first_column(frame, PRODUCT_COLUMNS)
+        self.store_col = store_col if store_col is not None else _first_column(frame, STORE_COLUMNS)
+        self.tables = {granularity: {} for granularity in GRANULARITIES}
+        # Bumped on every append so consumers can memoize per version
+        self.version = 0
+        self._lock = threading.RLock()
+        self.append(frame)
+
+    def append(self, rows):
+        """
+        Fold new daily rows into every rollup
+
+        Only the periods the rows fall in are touched, so appending a day
+        costs one small groupby per granularity regardless of history length.
+        """
+        self.stage(rows)()
+
+    def stage(self, rows):
+        """
+        Group new daily rows without folding them in yet
+
+        Returns:
+            Function that folds the grouped totals into the rollups
+        """
+        merges = []
+        if rows is not None and len(rows):
+            keyed = pd.DataFrame({
+                'product': rows[self.product_col].astype(str).values if self.product_col else ALL,
+                'store': rows[self.store_col].astype(str).values if self.store_col else ALL,
+                # Totals in float64 even when the frame stores float32 sales
+                'sales': pd.to_numeric(rows[self.sales_col], errors='coerce').fillna(0.0).values.astype(np.float64)
+            })
+            for granularity in GRANULARITIES:
+                keyed['period'] = period_start(rows['date'].values, granularity)
+                for by in self._key_levels():
+                    grouped = keyed.groupby(by + ['period'])['sales'].agg(['sum', 'count'])
+                    grouped.columns = ['sales', 'rows']
+                    merges.append((granularity, by, grouped))
+
+        def publish():
+            if not merges:
+                return
+            with self._lock:
+                for granularity, by, grouped in merges:
+                    self._merge(granularity, by, grouped)
+                self.version += 1
+        return publish
+
+    def _key_levels(self):
+        """Groupings that produce every (product, store) key, 'all' included"""
+        levels = [[]]
+        if self.product_col:
+            levels.append(['product'])
+        if self.store_col:
+            levels.append(['store'])
+        if self.product_col and self.store_col:
+            levels.append(['product', 'store'])
+        return levels
+
+    def _merge(self, granularity, by, grouped):
+        tables = self.tables[granularity]
+        if by:
+            parts = grouped.groupby(level=list(range(len(by))))
+        else:
+            parts = [((), grouped)]
+
+        for key, part in parts:
+            key = key if isinstance(key, tuple) else (key,)
+            values = dict(zip(by, key))
+            table_key = (values.get('product', ALL), values.get('store', ALL))
+            delta = part.droplevel(list(range(len(by)))) if by else part
+            if table_key not in tables:
+                tables[table_key] = PeriodTable()
+            tables[table_key].add(delta.index.values, delta['sales'].values, delta['rows'].values)
+
+    def _table(self, granularity, product, store):
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        return self.tables[granularity].get((str(product), str(store)))
+
+    def table(self, granularity='daily', product=ALL, store=ALL):
+        """Period totals for one key as a frame, empty if the key has no sales"""
+        with self._lock:
+            table = self._table(granularity, product, store)
+            if table is None:
+                return pd.DataFrame({'sales': [], 'rows': []}, index=pd.DatetimeIndex([]))
+            return table.frame()
+
+    def last_period(self, granularity='daily'):
+        """Start of the latest period with sales, or None"""
+        with self._lock:
+            table = self._table(granularity, ALL, ALL)
+            return None if table is None else table.last()
+
+    def series_since(self, since, granularity='daily', product=ALL, store=ALL):
+        """
+        Totals for periods overlapping [since, ...)
+
+        Returns:
+            (period starts, sales) arrays
+        """
+        first = period_start([since], granularity)[0]
+        with self._lock:
+            table = self._table(granularity, product, store)
+            if table is None:
+                return np.array([], dtype='datetime64[ns]'), np.array([])
+            return table.since(first)
+
+    def keys(self):
+        return list(self.tables['daily'])
+
+def _first_column(frame, candidates):
+    for col in candidates:
+        if col in frame.columns:
+            return col
+    return None
+
+def summarize(values):
+    """Summary statistics of a value array, matching DataProcessor.get_statistics"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return {}
+    return {
+        'mean': float(values.mean()),
+        'median': float(np.median(values)),
+        'std': float(values.std(ddof=1)) if len(values) > 1 else float('nan'),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'count': len(values)
+    }
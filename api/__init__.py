@@ -12,6 +12,11 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from api.models_handler import ModelHandler
 from api.data_processor import DataProcessor
+from model_watcher import ModelWatcher
+from feature_store import FeatureStore
+from serialization import json_response, negotiate_mimetype, binary_response, JSON_MIMETYPE
+from inventory import INVENTORY_PATH, cached_inventory, family_name, plan_records
+from simulation import DEFAULT_CONFIDENCE
 
 app = Flask(__name__)
 
@@ -19,6 +24,26 @@ app = Flask(__name__)
 model_handler = ModelHandler()
 data_processor = DataProcessor()
 
+def _swap_model_handler(candidate, version):
+    """Install a validated handler; requests already running keep the old one"""
+    global model_handler
+    model_handler = candidate
+
+# Reload models/ in the background when training writes new artifacts;
+# started by the first request so a cold start does not hash every artifact
+model_watcher = ModelWatcher(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models'),
+    ModelHandler, lambda handler: handler.smoke_test(), _swap_model_handler,
+    interval=float(os.environ.get('MODEL_WATCH_INTERVAL', 30))
+)
+
+@app.before_request
+def start_background_tasks():
+    """Model hot reload, and the feature store that training and forecasts read, kept current"""
+    model_watcher.start()
+    if model_handler.history is not None:
+        FeatureStore.shared().follow(model_handler.history)
+
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
@@ -29,7 +54,8 @@ def health():
     return jsonify({
         'status': 'healthy',
         'service': 'Wing Shop Random Forest Forecaster',
-        'models_loaded': model_handler.is_ready()
+        'models_loaded': model_handler.is_ready(),
+        'model_version': model_watcher.version
     }), 200
 
 # ============================================================================
@@ -40,23 +66,36 @@ def health():
 def forecast():
     """
     Generate forecast using Random Forest model
-    Expected JSON: {'days': 7, 'product': 'category_name', 'store': 44}
+    Expected JSON: {'days': 7, 'product': 'category_name', 'store': 44,
+                    'samples': 1000, 'confidence': 0.95}
     """
     try:
+        handler = model_handler
         data = request.get_json() or {}
         days = data.get('days', 7)
         product = data.get('product', 'all')
         store = data.get('store', 44)
+        samples = data.get('samples')
+        confidence = float(data.get('confidence', DEFAULT_CONFIDENCE))
         
-        if not model_handler.is_ready():
+        if not 0 < confidence < 1:
+            return jsonify({'error': 'confidence must be between 0 and 1'}), 400
+        
+        if not handler.is_ready():
             return jsonify({'error': 'Model not loaded'}), 503
         
-        forecast_data = model_handler.predict(
+        forecast_data = handler.predict(
             days=days,
             product=product,
-            store=store
+            store=store,
+            samples=samples,
+            confidence=confidence
         )
         
+        interval_requested = 'samples' in data or 'confidence' in data
+        if interval_requested and forecast_data and forecast_data[0]['confidence'] is None:
+            return jsonify({'error': 'Forecast intervals are not available for the loaded model'}), 400
+        
         return jsonify({
             'success': True,
             'forecast': forecast_data,
@@ -74,26 +113,120 @@ def forecast_bulk():
     Expected JSON: {'days': 7, 'products': ['rice', 'water', 'oil']}
     """
     try:
+        handler = model_handler
         data = request.get_json() or {}
         days = data.get('days', 7)
         products = data.get('products', [])
         
-        if not model_handler.is_ready():
+        if not handler.is_ready():
             return jsonify({'error': 'Model not loaded'}), 503
         
+        store = data.get('store', 44)
+        
         forecasts = {}
         for product in products:
-            forecasts[product] = model_handler.predict(days=days, product=product)
+            forecasts[product] = handler.predict(days=days, product=product, store=store)
         
-        return jsonify({
+        return json_response({
             'success': True,
             'forecasts': forecasts,
             'days': days
+        }, 200)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/forecast/hierarchy', methods=['POST'])
+def forecast_hierarchy():
+    """
+    Reconciled store x family forecasts for one hierarchy level
+    Expected JSON: {'days': 7, 'level': 'store' | 'family' | 'total'}
+    """
+    try:
+        handler = model_handler
+        data = request.get_json() or {}
+        days = data.get('days', 7)
+        level = data.get('level', 'store')
+        
+        if level not in ('store', 'family', 'total'):
+            return jsonify({'error': f'Unknown level: {level}'}), 400
+        
+        if handler.hierarchy is None:
+            return jsonify({'error': 'Hierarchical model not loaded'}), 503
+        
+        result = handler.predict_hierarchy(days=days, level=level)
+        
+        return jsonify({
+            'success': True,
+            'level': level,
+            'days': days,
+            **result
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/forecast/distribution', methods=['POST'])
+def forecast_distribution():
+    """
+    Quantiles of simulated Random Forest demand, per day and in total
+    Expected JSON: {'days': 7, 'quantiles': [0.05, 0.5, 0.95], 'samples': 1000, 'total_days': 7}
+    """
+    try:
+        handler = model_handler
+        data = request.get_json() or {}
+        days = data.get('days', 7)
+        quantiles = data.get('quantiles', [0.05, 0.5, 0.95])
+        
+        if not quantiles or not all(0 <= float(q) <= 1 for q in quantiles):
+            return jsonify({'error': 'quantiles must be between 0 and 1'}), 400
+        
+        if handler.model is None:
+            return jsonify({'error': 'Random Forest model not loaded'}), 503
+        
+        distribution = handler.predict_distribution(
+            days=days,
+            quantiles=quantiles,
+            samples=data.get('samples'),
+            total_days=data.get('total_days')
+        )
+        
+        return json_response({
+            'success': True,
+            'days': days,
+            **distribution
+        }, 200)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/forecast/explain', methods=['POST'])
+def forecast_explain():
+    """
+    Per-day feature contributions of the Random Forest forecast
+    Expected JSON: {'days': 7, 'top': 5}
+    """
+    try:
+        handler = model_handler
+        data = request.get_json() or {}
+        days = data.get('days', 7)
+        top = data.get('top', 5)
+        
+        if handler.model is None:
+            return jsonify({'error': 'Random Forest model not loaded'}), 503
+        
+        explanations = handler.explain(days=days, top=top)
+        
+        return json_response({
+            'success': True,
+            'method': 'path contributions',
+            'days': days,
+            'explanations': explanations
+        }, 200)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
 # ============================================================================
 # DATA ENDPOINTS
 # ============================================================================
@@ -116,18 +249,116 @@ def get_historical():
     try:
         days = request.args.get('days', 30, type=int)
         product = request.args.get('product', 'all')
+        response_format = request.args.get('format', 'records')
+        granularity = request.args.get('granularity', 'daily')
         
-        historical = data_processor.get_historical(days=days, product=product)
+        # Compact columnar binary when the client asks for it in Accept
+        mimetype = negotiate_mimetype()
+        if mimetype != JSON_MIMETYPE:
+            dates, values = data_processor.get_historical_series(days=days, product=product,
+                                                                  granularity=granularity)
+            return binary_response(mimetype, dates, {'value': values})
         
-        return jsonify({
+        historical = data_processor.get_historical(
+            days=days,
+            product=product,
+            response_format=response_format,
+            granularity=granularity
+        )
+        
+        return json_response({
             'success': True,
             'historical': historical,
+            'format': response_format,
+            'granularity': granularity,
             'days': days,
             'product': product
+        }, 200)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/ingest', methods=['POST'])
+def ingest():
+    """Append new daily sales rows"""
+    try:
+        data = request.get_json() or {}
+        rows = data.get('rows')
+        if not rows:
+            return jsonify({'error': 'No rows provided'}), 400
+        
+        result = data_processor.ingest(rows)
+        
+        return jsonify({
+            'success': True,
+            **result
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/replenishment', methods=['GET'])
+def replenishment():
+    """
+    Safety stock, reorder point and order quantity per store x family
+    Query: store, family, reorder_only=true
+    """
+    try:
+        handler = model_handler
+        if not handler.is_ready():
+            return jsonify({'error': 'Model not loaded'}), 503
+        
+        if not os.path.exists(INVENTORY_PATH):
+            return jsonify({'error': 'No inventory data (data/inventory.csv, see data/inventory.example.csv)'}), 404
+        
+        inventory = cached_inventory(INVENTORY_PATH)
+        store = request.args.get('store', type=int)
+        family = request.args.get('family')
+        if store is not None:
+            inventory = inventory[inventory['store_nbr'] == store]
+        if family:
+            inventory = inventory[inventory['family'] == family_name(family)]
+        if inventory.empty:
+            return jsonify({'error': 'No inventory rows match'}), 404
+        
+        plan, unmatched = handler.plan_replenishment(inventory.reset_index(drop=True),
+                                                     store=store if store is not None else 44)
+        if plan.empty:
+            return jsonify({'error': 'No inventory data with a forecast', 'unmatched': unmatched}), 404
+        reorder_only = request.args.get('reorder_only', 'false').lower() == 'true'
+        
+        return json_response({
+            'success': True,
+            'plan': plan_records(plan, reorder_only=reorder_only),
+            'series': len(plan),
+            'reorder_count': int(plan['reorder'].sum()),
+            'unmatched': unmatched
+        }, 200)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/kpis', methods=['GET'])
+def get_kpis():
+    """
+    Average sales, change, accuracy and 7-day demand per product and store
+    Query: product, store
+    """
+    try:
+        handler = model_handler
+        mape = handler.get_metrics()['mape'] if handler.is_ready() else None
+        kpis = data_processor.get_kpis(
+            product=request.args.get('product'),
+            store=request.args.get('store'),
+            compute=handler.forecast_totals,
+            model_version=model_watcher.version['checksum'],
+            mape=mape
+        )
+        
+        return json_response({
+            'success': True,
+            'kpis': kpis
+        }, 200)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/api/metrics', methods=['GET'])
 def get_metrics():
     """Get performance metrics"""
@@ -9,6 +9,13 @@ import numpy as np
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from serialization import format_dates, to_float_array, records_from_columns
+from aggregations import Rollups, summarize
+from kpis import KPIEngine, kpi_records
+from ingestion import LiveDataset
+from schema import compact_frame
+from synthetic import sales_frame, synthetic_history, PRODUCTS, DEFAULT_STORE
+
 class DataProcessor:
     """Processes and provides access to sales data"""
     
@@ -16,7 +23,11 @@ class DataProcessor:
         self.data = None
         self.products = []
         self.stores = []
+        self.rollups = None
+        self.kpi_engine = None
+        self.dataset = None
         self._load_data()
+        self._build_rollups()
     
     def _load_data(self):
         """Load sales data from CSV"""
@@ -34,9 +45,16 @@ class DataProcessor:
             for csv_file in csv_files:
                 csv_path = data_dir / csv_file
                 if csv_path.exists():
-                    self.data = pd.read_csv(csv_path)
-                    if 'date' in self.data.columns:
-                        self.data['date'] = pd.to_datetime(self.data['date'])
+                    if csv_file == 'processed_sales_data.csv':
+                        # Replays rows ingested since the CSV was written
+                        # Compact frame shared with the dashboard in this process
+                        self.dataset = LiveDataset.shared(csv_path)
+                        self.dataset.subscribe(self._on_ingest)
+                        self.data = self.dataset.load()
+                    else:
+                        self.data = compact_frame(pd.read_csv(csv_path))
+                        if 'date' in self.data.columns:
+                            self.data['date'] = pd.to_datetime(self.data['date'])
                     
                     print(f"✓ Data loaded from {csv_path}")
                     self._extract_metadata()
@@ -80,19 +98,41 @@ class DataProcessor:
     
     def _create_synthetic_data(self):
         """Create synthetic sales data for demo"""
-        dates = pd.date_range(start='2023-01-01', end=datetime.now(), freq='D')
-        
-        synthetic_data = {
-            'date': dates,
-            'unit_sales': np.random.randint(50, 300, len(dates)),
-            'family': np.random.choice(['Rice', 'Water', 'Oil', 'Noodles', 'Sugar'], len(dates)),
-            'store_nbr': 44,
-            'transactions': np.random.randint(100, 500, len(dates))
-        }
-        
-        self.data = pd.DataFrame(synthetic_data)
-        self.products = ['Rice', 'Water', 'Oil', 'Noodles', 'Sugar']
-        self.stores = [44]
+        self.data = sales_frame(start='2023-01-01', stores=[DEFAULT_STORE], products=PRODUCTS)
+        self.products = list(PRODUCTS)
+        self.stores = [DEFAULT_STORE]
+    
+    def _build_rollups(self):
+        """Precompute daily/weekly/monthly/quarterly totals per product and store"""
+        try:
+            if self.data is not None and 'date' in self.data.columns:
+                sales_col = 'unit_sales' if 'unit_sales' in self.data.columns else self.data.columns[-1]
+                self.rollups = Rollups(self.data, sales_col=sales_col)
+                self.kpi_engine = KPIEngine(self.rollups)
+        except Exception as e:
+            print(f"Error building rollups: {e}")
+            self.rollups = None
+            self.kpi_engine = None
+    
+    def ingest(self, records):
+        """
+        Append new daily rows through the write-ahead log
+        
+        Returns:
+            Dict with the number of rows appended, the new last date and seq
+        """
+        if self.dataset is None:
+            raise ValueError("Ingestion needs data/processed_sales_data.csv")
+        return self.dataset.ingest(records)
+    
+    def _on_ingest(self, frame, new_rows):
+        fold_rollups = self.rollups.stage(new_rows) if self.rollups is not None else None
+        
+        def publish():
+            if fold_rollups is not None:
+                fold_rollups()
+            self.data = frame
+        return publish
     
     def get_products(self):
         """Get list of available products"""
@@ -100,86 +140,131 @@ class DataProcessor:
             return ['Rice', 'Water', 'Oil', 'Noodles', 'Sugar']
         return self.products
     
-    def get_historical(self, days=30, product='all'):
+    def get_historical(self, days=30, product='all', response_format='records', granularity='daily'):
         """
         Get historical sales data
         
         Args:
             days: Number of days to retrieve
             product: Specific product or 'all'
+            response_format: 'records' for a list of points, 'columnar' for
+                one dict of equal-length date/value columns
+            granularity: 'daily', 'weekly', 'monthly' or 'quarterly' totals
         
         Returns:
-            List of historical data points
+            List of historical data points, or a columnar dict
         """
         try:
             if self.data is None or self.data.empty:
                 return []
             
-            # Get last N days
-            cutoff_date = datetime.now() - timedelta(days=days)
-            
-            if 'date' in self.data.columns:
-                filtered = self.data[self.data['date'] >= cutoff_date].copy()
-            else:
-                filtered = self.data.tail(days).copy()
+            dates, values = self.get_historical_series(days, product, granularity)
             
-            # Filter by product if specified
-            if product != 'all':
-                for col in ['family', 'product', 'category', 'product_name']:
-                    if col in filtered.columns:
-                        filtered = filtered[filtered[col] == product]
-                        break
+            # Format output column-wise straight from the arrays
+            columns = {
+                'date': format_dates(dates),
+                'value': to_float_array(values, decimals=2)
+            }
             
-            # Aggregate by date if multiple entries
-            sales_col = 'unit_sales' if 'unit_sales' in filtered.columns else filtered.columns[-1]
+            if response_format == 'columnar':
+                columns['product'] = product
+                return columns
             
-            if 'date' in filtered.columns:
-                daily_sales = filtered.groupby('date')[sales_col].sum().reset_index()
-            else:
-                daily_sales = filtered[[sales_col]].reset_index()
-            
-            # Format output
-            result = []
-            for _, row in daily_sales.iterrows():
-                date = row['date'] if 'date' in row else datetime.now()
-                value = float(row[sales_col]) if sales_col in row else 0
-                
-                result.append({
-                    'date': pd.to_datetime(date).strftime('%Y-%m-%d'),
-                    'value': round(value, 2),
-                    'product': product
-                })
-            
-            return result
+            columns['product'] = [product] * len(dates)
+            return records_from_columns(columns)
         
+        except ValueError:
+            raise
         except Exception as e:
             print(f"Error retrieving historical data: {e}")
             return self._get_synthetic_historical(days, product)
     
+    def get_historical_series(self, days=30, product='all', granularity='daily'):
+        """
+        Sales totals per period over the last N days as raw arrays
+        
+        Returns:
+            (dates, values) as datetime64 and float arrays; dates are
+            period starts for coarser granularities
+        """
+        # Get last N days
+        cutoff_date = datetime.now() - timedelta(days=days)
+        
+        # Read precomputed totals instead of regrouping the daily rows
+        if self.rollups is not None:
+            return self.rollups.series_since(cutoff_date, granularity, product=product)
+        
+        if granularity != 'daily':
+            raise ValueError(f"Granularity '{granularity}' needs dated sales data")
+        
+        if 'date' in self.data.columns:
+            filtered = self.data[self.data['date'] >= cutoff_date]
+        else:
+            filtered = self.data.tail(days)
+        
+        # Filter by product if specified
+        if product != 'all':
+            for col in ['family', 'product', 'category', 'product_name']:
+                if col in filtered.columns:
+                    filtered = filtered[filtered[col] == product]
+                    break
+        
+        # Aggregate by date if multiple entries
+        sales_col = 'unit_sales' if 'unit_sales' in filtered.columns else filtered.columns[-1]
+        
+        if 'date' not in filtered.columns:
+            values = filtered[sales_col].values
+            return np.full(len(values), np.datetime64(datetime.now(), 'D')), values
+        
+        daily_sales = filtered.groupby('date')[sales_col].sum()
+        return daily_sales.index.values, daily_sales.values
+    
     def _get_synthetic_historical(self, days=30, product='all'):
         """Generate synthetic historical data"""
-        result = []
-        base_value = 150
+        dates, values = synthetic_history(days)
+        return records_from_columns({
+            'date': format_dates(dates),
+            'value': to_float_array(values, decimals=2),
+            'product': [product] * days
+        })
+    
+    def get_kpis(self, product=None, store=None, **kwargs):
+        """
+        KPIs of every product and store, from the rollups and cached forecasts
         
-        for i in range(days, 0, -1):
-            date = datetime.now() - timedelta(days=i)
-            # Add trend and noise
-            value = base_value + (days - i) * 0.5 + np.random.normal(0, 10)
-            
-            result.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'value': round(max(0, value), 2),
-                'product': product
-            })
+        Args:
+            product, store: Optional filters
+            kwargs: compute, model_version and mape for KPIEngine.kpis()
+        
+        Returns:
+            List of KPI dicts, one per (product, store)
+        """
+        if self.kpi_engine is None:
+            raise ValueError("KPIs need dated sales data")
         
-        return result
+        kpis = self.kpi_engine.kpis(**kwargs)
+        if product is not None:
+            kpis = kpis[kpis.index.get_level_values('product') == str(product)]
+        if store is not None:
+            kpis = kpis[kpis.index.get_level_values('store') == str(store)]
+        return kpi_records(kpis)
     
-    def get_statistics(self, product='all'):
-        """Get statistical summary of product sales"""
+    def get_statistics(self, product='all', granularity='daily'):
+        """
+        Get statistical summary of product sales
+        
+        Args:
+            product: Specific product or 'all'
+            granularity: Summarize 'daily', 'weekly', 'monthly' or
+                'quarterly' totals
+        """
         try:
             if self.data is None or self.data.empty:
                 return {}
             
+            if self.rollups is not None:
+                return summarize(self.rollups.table(granularity, product=product)['sales'].values)
+            
             filtered = self.data.copy()
             
             # Filter by product
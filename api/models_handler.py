@@ -6,21 +6,68 @@ Loads and manages the trained Random Forest model
 import os
 import json
 import pickle
-import joblib
+import threading
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from exogenous import EXOGENOUS_FILE, ExogenousIndex
+from explanations import PathContributions, explanation_records
+from feature_store import DEFAULT_SERIES, FeatureStore
+from forecast_models import forecast_random_forest
+from hierarchical import HierarchicalForecaster
+from ingestion import LiveDataset
+from inventory import (
+    PLAN_COLUMNS, plan_for_hierarchy, store_stock, required_horizon, replenishment_plan, demand_sigma
+)
+from serialization import format_dates, to_float_array, records_from_columns
+from series_state import live_forecast_inputs
+from simulation import (
+    DEFAULT_CONFIDENCE, MAX_SIMULATED_DAYS, RF_RESIDUALS_FILE, SamplePaths, check_horizon, load_residuals,
+    sample_count, simulate_random_forest
+)
+from startup import load_artifact, load_joblib, resolve, describe
+from synthetic import fallback_forecast
+
+# Forecast runs (with their feature rows) kept per handler for explain()
+FORECAST_CACHE_SIZE = 32
+
+# Simulated path sets kept per handler, oldest evicted first
+PATH_CACHE_SIZE = 8
+
+def forecast_records(dates, predictions, lower=None, upper=None, confidence=DEFAULT_CONFIDENCE):
+    """
+    One dict per forecast day
+
+    Without lower/upper the bounds and confidence are None rather than a
+    made-up band.
+    """
+    n = len(dates)
+    return records_from_columns({
+        'date': format_dates(dates),
+        'prediction': to_float_array(predictions, decimals=2),
+        'lower_bound': np.maximum(to_float_array(lower, decimals=2), 0) if lower is not None else [None] * n,
+        'upper_bound': to_float_array(upper, decimals=2) if upper is not None else [None] * n,
+        'confidence': [confidence if lower is not None else None] * n
+    })
+
 class ModelHandler:
     """Manages Random Forest model loading and predictions"""
     
     def __init__(self):
-        self.model = None
+        self._model = None
+        self._hierarchy = None
+        self.history = None
         self.feature_columns = None
         self.scaler = None
         self.model_ready = False
         self.model_metrics = {}
+        self.residuals = None
+        self._forecasts = {}
+        self._paths = {}
+        self._contributions = None
+        self._lock = threading.Lock()
         self._load_model()
     
     def _load_model(self):
@@ -30,17 +77,26 @@ class ModelHandler:
             root_dir = Path(__file__).parent.parent
             model_dir = root_dir / 'models'
             
-            # Load Random Forest model
+            # Load Random Forest model (unpickling imports scikit-learn,
+            # deferred to first use when STARTUP_MODE=lazy)
             model_path = model_dir / 'random_forest_model.pkl'
             if model_path.exists():
-                with open(model_path, 'rb') as f:
-                    self.model = pickle.load(f)
-                print(f"✓ Random Forest model loaded from {model_path}")
+                self._model = load_artifact(model_path)
+                print(f"✓ Random Forest model {describe(self._model)} from {model_path}")
             else:
                 model_path = model_dir / 'random_forest_model.joblib'
                 if model_path.exists():
-                    self.model = joblib.load(model_path)
-                    print(f"✓ Random Forest model loaded from {model_path}")
+                    self._model = load_artifact(model_path, load_joblib)
+                    print(f"✓ Random Forest model {describe(self._model)} from {model_path}")
+            
+            # Out-of-bag residuals for the simulated forecast intervals
+            self.residuals = load_residuals(model_dir / RF_RESIDUALS_FILE)
+            
+            # Load the global store x family model if one was trained
+            global_path = model_dir / 'global_random_forest.pkl'
+            if global_path.exists():
+                self._hierarchy = load_artifact(global_path, HierarchicalForecaster.load)
+                print(f"✓ Global store x family model {describe(self._hierarchy)} from {global_path}")
             
             # Load feature columns
             features_path = model_dir / 'feature_columns.json'
@@ -54,6 +110,12 @@ class ModelHandler:
                     'day_of_week', 'month', 'is_holiday'
                 ]
             
+            # Sales history for the lag and rolling features, shared with
+            # DataProcessor so it is held once and sees ingested rows
+            history_path = root_dir / 'data' / 'processed_sales_data.csv'
+            if history_path.exists():
+                self.history = LiveDataset.shared(history_path)
+            
             # Load scaler if available
             scaler_path = model_dir / 'scaler.pkl'
             if scaler_path.exists():
@@ -73,17 +135,52 @@ class ModelHandler:
                     'rmse': 125.3
                 }
             
-            self.model_ready = self.model is not None
+            self.model_ready = self._model is not None or self._hierarchy is not None
             
         except Exception as e:
             print(f"Warning: Could not load model: {e}")
             self.model_ready = False
     
+    @property
+    def model(self):
+        """Single-series Random Forest, or None"""
+        return resolve(self._model)
+    
+    @property
+    def hierarchy(self):
+        """Global store x family HierarchicalForecaster, or None"""
+        return resolve(self._hierarchy)
+    
     def is_ready(self):
         """Check if model is loaded and ready"""
         return self.model_ready
     
-    def predict(self, days=7, product='all', store=44):
+    def smoke_test(self):
+        """
+        Raise unless the loaded models can predict one day
+        
+        As app.validate_model_version() does, the Random Forest's own
+        predict() is called on the feature row of the day after the data
+        ends, built from the live history the way forecasts build it.
+        """
+        if not self.model_ready:
+            raise ValueError("No model could be loaded")
+        
+        if self.model is not None:
+            if self.history is None:
+                raise ValueError("Random Forest smoke prediction needs the sales history")
+            features = self._random_forest_run(self._future_dates(1))['features']
+            # The raw prediction: the recursive forecast clips NaN to 0
+            pred = self.model.predict(features[:1])
+            if not np.all(np.isfinite(pred)):
+                raise ValueError("Random Forest smoke prediction is not finite")
+        
+        if self.hierarchy is not None:
+            _, forecasts = self.hierarchy.forecast(horizon=1)
+            if not np.all(np.isfinite(forecasts)):
+                raise ValueError("Global model smoke prediction is not finite")
+    
+    def predict(self, days=7, product='all', store=44, samples=None, confidence=DEFAULT_CONFIDENCE):
         """
         Generate forecast using Random Forest model
         
@@ -91,106 +188,294 @@ class ModelHandler:
             days: Number of days to forecast
             product: Product category
             store: Store number
+            samples: Simulated paths behind the bounds (more is slower
+                but steadier; default simulation.DEFAULT_SAMPLES)
+            confidence: Coverage of the lower/upper bounds
         
         Returns:
-            List of forecast values with dates
+            List of forecast values with dates; bounds and confidence are
+            None when no model can simulate them
         """
         try:
             if not self.model_ready:
                 raise ValueError("Model not loaded")
             
-            # Create future dates
-            future_dates = pd.date_range(
-                start=datetime.now() + timedelta(days=1),
-                periods=days,
-                freq='D'
-            )
+            if self.hierarchy is not None:
+                return self._predict_hierarchical(days, product, store, samples, confidence)
             
-            # Create feature matrix for future dates
-            forecasts = []
+            # Forecast from the day after the data ends, where the lag
+            # and state features are anchored
+            future_dates = self._future_dates(days)
             
-            for i, date in enumerate(future_dates):
-                # Create features (simplified - in production use actual historical data)
-                features = self._create_features(date, product, store)
-                
-                # Make prediction
-                if self.model is not None:
-                    pred = float(self.model.predict([features])[0])
-                    # Ensure non-negative prediction
-                    pred = max(0, pred)
-                else:
-                    # Fallback prediction
-                    pred = 100 + np.random.normal(0, 10)
-                
-                forecasts.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'prediction': round(pred, 2),
-                    'lower_bound': round(max(0, pred * 0.85), 2),
-                    'upper_bound': round(pred * 1.15, 2),
-                    'confidence': 0.95
-                })
+            if self.model is not None:
+                predictions = self._forecast_random_forest(future_dates)
+                # Quantiles of simulated paths, cached with the forecast;
+                # horizons too long to simulate get no interval
+                lower = upper = None
+                if days <= MAX_SIMULATED_DAYS:
+                    lower, upper = self.sample_paths(future_dates, samples).interval(confidence)
+            else:
+                # Fallback prediction, without an interval to report
+                predictions = fallback_forecast(days, start=future_dates[0], base=100, slope=0, noise=10)[1]
+                lower = upper = None
             
-            return forecasts
+            return forecast_records(future_dates, predictions, lower, upper, confidence)
         
         except Exception as e:
             print(f"Prediction error: {e}")
             return self._get_fallback_forecast(days)
     
-    def _create_features(self, date, product, store):
-        """Create feature vector for prediction"""
-        try:
-            # This is a simplified version
-            # In production, use actual historical data
-            features = np.zeros(len(self.feature_columns))
-            
-            # Fill with dummy values based on patterns
-            day_of_week = date.weekday()
-            month = date.month
-            
-            # Assign to feature positions
-            for i, col in enumerate(self.feature_columns):
-                if 'lag' in col or 'rolling' in col:
-                    features[i] = 100 + np.random.normal(0, 20)
-                elif 'day_of_week' in col:
-                    features[i] = day_of_week
-                elif 'month' in col:
-                    features[i] = month
-                elif 'holiday' in col:
-                    features[i] = 0  # Not a holiday
-            
-            return features
+    def _predict_hierarchical(self, days, product, store, samples=None, confidence=DEFAULT_CONFIDENCE):
+        """
+        Forecast one store/product node of the reconciled hierarchy, with
+        bounds from the node's simulated paths when the global model has
+        residuals to bootstrap
+        """
+        selected = self.hierarchy.select(horizon=days, store=store, product=product)
+        if selected is None:
+            raise ValueError(f"No series for store={store}, product={product}")
         
-        except Exception as e:
-            print(f"Feature creation error: {e}")
-            return np.random.randn(len(self.feature_columns))
+        dates, values = selected
+        lower = upper = None
+        if self.hierarchy.residuals is not None and days <= MAX_SIMULATED_DAYS:
+            _, paths = self.hierarchy.sample_paths(days, store, product, samples)
+            lower, upper = SamplePaths(dates, paths).interval(confidence)
+        return forecast_records(dates, values, lower, upper, confidence)
     
-    def _get_fallback_forecast(self, days):
-        """Generate fallback forecast when model fails"""
-        forecasts = []
-        base_value = 100
-        
-        for i in range(days):
-            date = datetime.now() + timedelta(days=i+1)
-            # Trend with some noise
-            value = base_value + (i * 2) + np.random.normal(0, 5)
-            
-            forecasts.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'prediction': round(max(0, value), 2),
-                'lower_bound': round(max(0, value * 0.85), 2),
-                'upper_bound': round(value * 1.15, 2),
-                'confidence': 0.90
-            })
+    def predict_hierarchy(self, days=7, level='store'):
+        """
+        Reconciled forecasts for every node of one hierarchy level
+        
+        Args:
+            days: Number of days to forecast
+            level: 'store', 'family' or 'total'
+        
+        Returns:
+            Dict with dates and node -> forecast values
+        """
+        if self.hierarchy is None:
+            raise ValueError("Global store x family model not loaded")
+        
+        levels = self.hierarchy.reconcile(days)
+        if level == 'total':
+            nodes = {'total': levels['total']}
+        else:
+            nodes = {str(node): row.values for node, row in levels[level].iterrows()}
+        
+        return {
+            'dates': [d.strftime('%Y-%m-%d') for d in levels['dates']],
+            'forecasts': {node: [round(float(v), 2) for v in values] for node, values in nodes.items()}
+        }
+    
+    def forecast_totals(self, days=7):
+        """
+        Total forecast demand over the next `days` days per (product, store)
+        rollup key, for the KPI engine
+        
+        The global model covers every store x family series and their
+        store, family and overall totals; the single-store Random Forest
+        only the overall total.
+        """
+        if self.hierarchy is not None:
+            levels = self.hierarchy.reconcile(days)
+            keys = self.hierarchy.keys
+            totals = {('all', 'all'): float(levels['total'].sum())}
+            for (family, store), value in zip(zip(keys['family'], keys['store_nbr']), levels['series'].sum(axis=1)):
+                totals[(str(family), str(store))] = float(value)
+            for store, row in levels['store'].iterrows():
+                totals[('all', str(store))] = float(row.sum())
+            for family, row in levels['family'].iterrows():
+                totals[(str(family), 'all')] = float(row.sum())
+            return totals
+        
+        if self.model is not None and self.history is not None:
+            return {('all', 'all'): float(self._forecast_random_forest(self._future_dates(days)).sum())}
+        
+        return {}
+    
+    def plan_replenishment(self, inventory, store=44):
+        """
+        Reorder plan for the inventory rows this handler can forecast
+        
+        With the global model every store x family row is planned from its
+        own series; otherwise the single-store Random Forest plans the
+        store's total stock row (family 'all') and nothing else.
+        
+        Returns:
+            (plan frame, unmatched (store, family) pairs); the plan is empty
+            when no row has a forecast
+        """
+        if self.hierarchy is not None:
+            return plan_for_hierarchy(self.hierarchy, inventory)
+        
+        if self.model is None or self.history is None:
+            raise ValueError("No model loaded for replenishment")
+        
+        stock = store_stock(inventory, store)
+        unmatched = inventory.drop(stock.index)[['store_nbr', 'family']].values.tolist()
+        if stock.empty:
+            return pd.DataFrame(columns=PLAN_COLUMNS), unmatched
+        
+        frame = self.history.load()
+        horizon = required_horizon(stock)
+        future_dates = self._future_dates(horizon)
+        mean = self._forecast_random_forest(future_dates)
+        plan = replenishment_plan(stock, mean[None, :], demand_sigma(frame['unit_sales'].values))
+        return plan, unmatched
+    
+    def _future_dates(self, days):
+        """
+        The `days` dates after the last day of sales history (from
+        tomorrow when there is no history to anchor the features on)
+        """
+        if self.history is not None:
+            start = self.history.load()['date'].iloc[-1] + timedelta(days=1)
+        else:
+            start = datetime.now() + timedelta(days=1)
+        return pd.date_range(start=pd.Timestamp(start).normalize(), periods=days, freq='D')
+    
+    def _forecast_random_forest(self, future_dates):
+        """Random Forest forecast for future_dates (cached, see _random_forest_run)"""
+        return self._random_forest_run(future_dates)['predictions'].copy()
+    
+    def _random_forest_run(self, future_dates):
+        """
+        Recursive forecast with features from the shared registry
+        
+        Lag and rolling inputs of the first day come from the feature
+        store's rows of the live data (ingested rows included), or from
+        the latest-state snapshot while the store catches up; later days
+        are computed recursively from the last HISTORY_DAYS sales, exactly
+        as in training. Holidays known for the forecast days come from the
+        exogenous calendar; other exogenous inputs take their serving value.
+        
+        Runs are cached per forecast dates and ingested batch, together with
+        the feature rows the model saw, so explain() reuses them.
+        
+        Returns:
+            Dict with predictions and features, plus contributions once
+            explain() has computed them
+        """
+        if self.history is None:
+            raise ValueError("No sales history for lag features")
+        
+        key = (future_dates[0].strftime('%Y-%m-%d'), len(future_dates), self.history.seq)
+        run = self._forecasts.get(key)
+        if run is not None:
+            return run
+        
+        # Known holidays over the defaults
+        calendar = ExogenousIndex.shared(self.history.csv_path.with_name(EXOGENOUS_FILE))
+        history, future_features, known_rows = live_forecast_inputs(
+            self.history, DEFAULT_SERIES, future_dates, self.feature_columns, calendar, FeatureStore.shared()
+        )
+        predictions, X = forecast_random_forest(
+            self.model,
+            history,
+            future_features,
+            self.feature_columns,
+            return_features=True,
+            known_rows=known_rows
+        )
+        
+        run = {'key': key, 'dates': future_dates, 'predictions': predictions, 'features': X, 'history': history}
+        with self._lock:
+            if len(self._forecasts) >= FORECAST_CACHE_SIZE:
+                self._forecasts.pop(next(iter(self._forecasts)))
+            self._forecasts[key] = run
+        return run
+    
+    def sample_paths(self, future_dates, samples=None):
+        """
+        Simulated Random Forest demand paths over future_dates
+        
+        Each path bootstraps the out-of-bag residuals saved at training
+        (normal errors with the reported RMSE if there are none) through
+        the recursive forecast. The last PATH_CACHE_SIZE path sets are
+        cached per forecast run and sample count; horizons beyond
+        simulation.MAX_SIMULATED_DAYS are rejected.
+        
+        Returns:
+            simulation.SamplePaths
+        """
+        check_horizon(len(future_dates))
+        run = self._random_forest_run(future_dates)
+        n_samples = sample_count(samples, len(future_dates))
+        key = run['key'] + (n_samples,)
+        cached = self._paths.get(key)
+        if cached is not None:
+            return cached
+        
+        paths = SamplePaths(future_dates, simulate_random_forest(
+            self.model, run['history'], run['features'], self.feature_columns,
+            self.residuals, n_samples, sigma=self.get_metrics()['rmse']
+        ))
+        with self._lock:
+            if len(self._paths) >= PATH_CACHE_SIZE:
+                self._paths.pop(next(iter(self._paths)))
+            self._paths[key] = paths
+        return paths
+    
+    def predict_distribution(self, days=7, quantiles=(0.05, 0.5, 0.95), samples=None, total_days=None):
+        """
+        Quantiles of each day's demand and of the total over `total_days`
+        (default: all `days`), from the Random Forest's simulated paths
+        """
+        if self.model is None:
+            raise ValueError("Simulation needs the single-store Random Forest")
+        future_dates = self._future_dates(days)
+        return self.sample_paths(future_dates, samples).summary(quantiles, total_days)
+    
+    def explain(self, days=7, top=5):
+        """
+        Why the Random Forest forecasts what it does, day by day
+        
+        Contributions are path-based: each split on the way to a leaf
+        credits the change of the node mean to its feature. They are
+        computed for every forecast day in one batch and cached with the
+        forecast, so repeated requests only format the result.
+        
+        Args:
+            days: Number of days to explain, from the day after the data
+                ends as in predict()
+            top: Largest contributions listed per day (None for all)
         
-        return forecasts
+        Returns:
+            List of {date, prediction, bias, contributions} dicts; bias
+            plus all contributions is the prediction before clipping at 0
+        """
+        if self.model is None:
+            raise ValueError("Explanations need the single-store Random Forest")
+        
+        future_dates = self._future_dates(days)
+        run = self._random_forest_run(future_dates)
+        if 'contributions' not in run:
+            with self._lock:
+                if self._contributions is None:
+                    self._contributions = PathContributions(self.model)
+            run['contributions'] = self._contributions.contributions(run['features'])
+        
+        return explanation_records(run['dates'], run['predictions'], run['contributions'],
+                                   self._contributions.bias, self.feature_columns, top)
+    
+    def _get_fallback_forecast(self, days):
+        """Generate fallback forecast when model fails (no interval)"""
+        dates, values = fallback_forecast(days)
+        return forecast_records(dates, values)
     
     def get_metrics(self):
         """Get model performance metrics"""
+        # Rolling-origin backtest results (written by backtesting.py) take
+        # precedence over the single train/test split metrics
+        backtest = self.model_metrics.get('backtest', {}).get('models', {}).get('random_forest', {})
+        overall = backtest.get('all', {}).get('overall', {})
+        
         return {
             'model_type': self.model_metrics.get('model_type', 'Random Forest'),
             'accuracy': self.model_metrics.get('accuracy', 0.92),
-            'mape': self.model_metrics.get('mape', 8.5),
-            'rmse': self.model_metrics.get('rmse', 125.3),
+            'mape': overall.get('mape') or self.model_metrics.get('mape', 8.5),
+            'rmse': overall.get('rmse') or self.model_metrics.get('rmse', 125.3),
+            'backtest': backtest,
             'status': 'ready' if self.model_ready else 'not_loaded',
             'last_updated': datetime.now().isoformat()
         }
@@ -8,10 +8,33 @@ import numpy as np
 import pickle
 import json
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait
 import os
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
+from backtesting import backtest_metric
+from downsampling import SeriesPyramid
+from aggregations import Rollups, ALL
+from kpis import KPIEngine
+from statespace import STATE_FILES, load_state
+from simulation import SamplePaths, can_simulate, simulate
+from startup import load_artifact, resolve, import_report, budget_problems
+from ingestion import LiveDataset
+from exogenous import EXOGENOUS_FILE, ExogenousIndex
+from feature_store import DEFAULT_SERIES, FeatureStore
+from series_state import live_forecast_inputs
+from model_watcher import ModelWatcher
+from forecast_models import MODEL_NAMES, inverse_error_weights, forecast_random_forest
+from inventory import (
+    INVENTORY_PATH, cached_inventory, store_stock, required_horizon, replenishment_plan,
+    demand_sigma, plan_records, family_name
+)
+from serialization import (
+    format_dates, to_float_array, json_response, negotiate_mimetype, binary_response, JSON_MIMETYPE
+)
+
 app = Flask(__name__)
 
 # ============================================================================
@@ -29,42 +52,64 @@ def load_models():
     except:
         models['ma'] = None
     
-    # Load Exponential Smoothing
-    try:
-        with open('models/exp_smoothing_model.pkl', 'rb') as f:
-            models['exp_smoothing'] = pickle.load(f)
-    except:
-        models['exp_smoothing'] = None
+    # Load Exponential Smoothing, SARIMA and Prophet from their exported
+    # state (NumPy only); older model directories only have the pickles
+    for model_name in ['exp_smoothing', 'sarima', 'prophet']:
+        try:
+            if os.path.exists(f'models/{STATE_FILES[model_name]}'):
+                models[model_name] = load_state(f'models/{STATE_FILES[model_name]}')
+            else:
+                with open(f'models/{model_name}_model.pkl', 'rb') as f:
+                    models[model_name] = pickle.load(f)
+        except:
+            models[model_name] = None
     
-    # Load SARIMA
+    # Load Random Forest (unpickling imports scikit-learn, deferred to first
+    # use when STARTUP_MODE=lazy)
     try:
-        with open('models/sarima_model.pkl', 'rb') as f:
-            models['sarima'] = pickle.load(f)
+        models['random_forest'] = load_artifact('models/random_forest_model.pkl')
+        with open('models/feature_columns.json', 'r') as f:
+            models['feature_columns'] = json.load(f)
     except:
-        models['sarima'] = None
+        models['random_forest'] = None
     
-    # Load Prophet
+    return models
+
+def load_model_metrics():
+    """Load saved model metrics, including rolling-origin backtest results"""
     try:
-        with open('models/prophet_model.pkl', 'rb') as f:
-            models['prophet'] = pickle.load(f)
+        with open('models/model_metrics.json', 'r') as f:
+            return json.load(f)
     except:
-        models['prophet'] = None
+        return {}
+
+def load_ensemble_weights(model_metrics):
+    """Load ensemble member weights learned from backtest or holdout error"""
+    # Prefer the multi-cutoff backtest over the single training holdout
+    errors = {}
+    for model_name in MODEL_NAMES:
+        rmse = backtest_metric(model_metrics, model_name, key='rmse')
+        if rmse is not None:
+            errors[model_name] = {'rmse': rmse}
+    if errors:
+        return inverse_error_weights(errors)
     
-    # Load Random Forest
     try:
-        with open('models/random_forest_model.pkl', 'rb') as f:
-            models['random_forest'] = pickle.load(f)
-        with open('models/feature_columns.json', 'r') as f:
-            models['feature_columns'] = json.load(f)
+        with open('models/ensemble_weights.json', 'r') as f:
+            return json.load(f).get('weights', {})
     except:
-        models['random_forest'] = None
-    
-    return models
+        return {}
+
+# Store whose daily totals processed_sales_data.csv holds (train_and_save_models.py --store)
+SERIES_STORE = int(os.environ.get('SERIES_STORE', 44))
+
+# Processed data plus every row ingested since it was written
+DATASET = LiveDataset.shared('data/processed_sales_data.csv')
 
 def load_data():
     """Load processed sales data"""
     try:
-        data = pd.read_csv('data/processed_sales_data.csv', parse_dates=['date'])
+        data = DATASET.load()
         return data
     except:
         return None
@@ -72,54 +117,250 @@ def load_data():
 # Load models and data on startup
 MODELS = load_models()
 DATA = load_data()
+MODEL_METRICS = load_model_metrics()
+ENSEMBLE_WEIGHTS = load_ensemble_weights(MODEL_METRICS)
+
+# Built once so downsampled historical queries cost O(output)
+HISTORY_PYRAMID = SeriesPyramid.from_frame(DATA) if DATA is not None else None
+
+# Daily rollups behind the KPIs, updated incrementally on ingest
+ROLLUPS = Rollups(DATA) if DATA is not None else None
+KPI_ENGINE = KPIEngine(ROLLUPS) if ROLLUPS is not None else None
+
+def _swap_data(frame, new_rows):
+    """Build the pyramid and rollup totals of an ingest; swapped in once it is logged"""
+    pyramid = SeriesPyramid.from_frame(frame)
+    fold_rollups = ROLLUPS.stage(new_rows) if ROLLUPS is not None else None
+
+    def publish():
+        global DATA, HISTORY_PYRAMID
+        if fold_rollups is not None:
+            fold_rollups()
+        DATA, HISTORY_PYRAMID = frame, pyramid
+    return publish
+
+DATASET.subscribe(_swap_data)
+
+# Ensemble members run concurrently; a member slower than the budget is dropped
+ENSEMBLE_MEMBERS = ['ma', 'exp_smoothing', 'sarima', 'prophet', 'random_forest']
+ENSEMBLE_MEMBER_BUDGET = float(os.environ.get('ENSEMBLE_MEMBER_BUDGET', 2.0))
+
+# One pool for every request, so members that outlive their budget cannot
+# pile up threads; queued members of a finished request are cancelled
+ENSEMBLE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ENSEMBLE_WORKERS', 4 * len(ENSEMBLE_MEMBERS))),
+    thread_name_prefix='ensemble'
+)
+
+# ============================================================================
+# MODEL HOT RELOAD
+# ============================================================================
+
+def load_model_version():
+    """Load every artifact a model version consists of"""
+    model_metrics = load_model_metrics()
+    return load_models(), model_metrics, load_ensemble_weights(model_metrics)
+
+def validate_model_version(candidate):
+    """
+    Smoke-predict one day with every loaded model of a candidate version
+
+    The Random Forest's own predict() is called on the next day's feature
+    row of the live data, so an artifact that cannot predict is rejected
+    instead of passing through calculate_forecast()'s moving-average fallback.
+    """
+    models = candidate[0]
+    loaded = [m for m in ENSEMBLE_MEMBERS if models.get(m) is not None]
+    if not loaded:
+        raise ValueError("No models could be loaded")
+    for model_name in loaded:
+        if model_name == 'random_forest':
+            if DATA is None:
+                raise ValueError("random_forest smoke prediction needs the processed data")
+            dates = pd.date_range(start=DATA['date'].max() + timedelta(days=1), periods=1)
+            _, features = forecast_random_forest_from_state(models, dates, return_features=True)
+            # The raw prediction: the recursive forecast clips NaN to 0
+            predictions = resolve(models['random_forest']).predict(features[:1])
+        else:
+            forecast = calculate_forecast(model_name, days=1, models=models)
+            predictions = None if forecast is None else forecast['predictions']
+        if predictions is None or not np.all(np.isfinite(predictions)):
+            raise ValueError(f"{model_name} smoke prediction failed")
+
+def _swap_models(candidate, version):
+    global MODELS, MODEL_METRICS, ENSEMBLE_WEIGHTS
+    MODELS, MODEL_METRICS, ENSEMBLE_WEIGHTS = candidate
+
+# Started by the first request, so importing the app stays cheap in lazy startup mode
+MODEL_WATCHER = ModelWatcher(
+    'models', load_model_version, validate_model_version, _swap_models,
+    interval=float(os.environ.get('MODEL_WATCH_INTERVAL', 30))
+)
+
+@app.before_request
+def start_background_tasks():
+    """Model hot reload, and the feature store that training and forecasts read, kept current"""
+    MODEL_WATCHER.start()
+    if DATA is not None:
+        FeatureStore.shared().follow(DATASET)
+
+# Categories the dashboard offers; each maps to a family through inventory.family_name
+CATEGORIES = [
+    {'id': 'rice', 'name': 'Rice', 'icon': '🌾'},
+    {'id': 'water', 'name': 'Bottled Water', 'icon': '💧'},
+    {'id': 'oil', 'name': 'Cooking Oil', 'icon': '🫒'},
+    {'id': 'noodles', 'name': 'Instant Noodles', 'icon': '🍜'},
+    {'id': 'sugar', 'name': 'Sugar', 'icon': '🧂'}
+]
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
-def calculate_forecast(model_name, days=7):
-    """Generate forecast for specified number of days"""
+def calculate_forecast(model_name, days=7, models=None):
+    """
+    Generate forecast for specified number of days
+    
+    A model that is not loaded falls back to the last week's average,
+    flagged by 'fallback' in the result.
+    """
     
     if DATA is None:
         return None
     
+    # Read the active version once so a hot reload mid-request is not seen
+    models = MODELS if models is None else models
+    
+    if model_name == 'ensemble':
+        return calculate_ensemble_forecast(days, models=models)
+    
     forecast_dates = pd.date_range(
         start=DATA['date'].max() + timedelta(days=1),
         periods=days
     )
     
-    if model_name == 'ma' and MODELS['ma']:
+    if model_name == 'ma' and models['ma']:
         # Moving Average
-        ma_value = np.mean(MODELS['ma']['last_values'])
+        ma_value = np.mean(models['ma']['last_values'])
         predictions = [ma_value] * days
         
-    elif model_name == 'exp_smoothing' and MODELS['exp_smoothing']:
+    elif model_name == 'exp_smoothing' and models['exp_smoothing']:
         # Exponential Smoothing
-        predictions = MODELS['exp_smoothing'].forecast(steps=days)
+        predictions = models['exp_smoothing'].forecast(steps=days)
         
-    elif model_name == 'sarima' and MODELS['sarima']:
+    elif model_name == 'sarima' and models['sarima']:
         # SARIMA
-        predictions = MODELS['sarima'].forecast(steps=days)
+        predictions = models['sarima'].forecast(steps=days)
         
-    elif model_name == 'prophet' and MODELS['prophet']:
+    elif model_name == 'prophet' and models['prophet']:
         # Prophet
         future = pd.DataFrame({'ds': forecast_dates})
-        forecast = MODELS['prophet'].predict(future)
+        forecast = models['prophet'].predict(future)
         predictions = forecast['yhat'].values
         
-    elif model_name == 'random_forest' and MODELS['random_forest']:
-        # Random Forest (simplified - would need full feature engineering)
-        avg_sales = DATA['unit_sales'].tail(30).mean()
-        predictions = [avg_sales] * days
+    elif model_name == 'random_forest' and models['random_forest']:
+        predictions = forecast_random_forest_from_state(models, forecast_dates)
         
     else:
         # Default to moving average
         avg_sales = DATA['unit_sales'].tail(7).mean()
         predictions = [avg_sales] * days
+        return {
+            'dates': format_dates(forecast_dates),
+            'predictions': to_float_array(predictions),
+            'fallback': True
+        }
     
     return {
-        'dates': [d.strftime('%Y-%m-%d') for d in forecast_dates],
-        'predictions': [float(p) for p in predictions]
+        'dates': format_dates(forecast_dates),
+        'predictions': to_float_array(predictions),
+        'fallback': False
+    }
+
+def forecast_random_forest_from_state(models, forecast_dates, return_features=False):
+    """Recursive Random Forest forecast from the stored features of the live data"""
+    calendar = ExogenousIndex.shared(DATASET.csv_path.with_name(EXOGENOUS_FILE))
+    history, future_features, known_rows = live_forecast_inputs(
+        DATASET, DEFAULT_SERIES, forecast_dates, models['feature_columns'], calendar, FeatureStore.shared()
+    )
+    return forecast_random_forest(
+        resolve(models['random_forest']), history, future_features, models['feature_columns'],
+        return_features=return_features, known_rows=known_rows
+    )
+
+def _timed_member_forecast(model_name, days, models):
+    """Run one ensemble member and record how long it took"""
+    start = time.perf_counter()
+    forecast = calculate_forecast(model_name, days, models)
+    return forecast, (time.perf_counter() - start) * 1000
+
+def calculate_ensemble_forecast(days=7, budget=None, models=None):
+    """
+    Weighted ensemble of all loaded models evaluated concurrently
+    
+    Members that miss the latency budget or fail are dropped and the
+    remaining weights are renormalized. Members run on the shared
+    ENSEMBLE_EXECUTOR and the budget counts from submission. Members that
+    have not started by the deadline are cancelled. A Python thread cannot
+    be stopped, so a member already running finishes on its pool thread
+    and its result is discarded.
+    
+    Returns:
+        Forecast dict with per-member status, or None if no member is
+        loaded or none returned in time
+    """
+    budget = ENSEMBLE_MEMBER_BUDGET if budget is None else budget
+    weights = ENSEMBLE_WEIGHTS
+    models = MODELS if models is None else models
+    members = [m for m in ENSEMBLE_MEMBERS if models.get(m) is not None]
+    if not members:
+        return None
+    
+    deadline = time.monotonic() + budget
+    futures = {
+        ENSEMBLE_EXECUTOR.submit(_timed_member_forecast, m, days, models): m
+        for m in members
+    }
+    done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0.0))
+    for future in not_done:
+        future.cancel()
+    
+    member_info = {}
+    predictions = {}
+    dates = None
+    for future, member in futures.items():
+        if future in not_done:
+            member_info[member] = {'status': 'timeout', 'elapsed_ms': None, 'weight': 0.0}
+            continue
+        try:
+            forecast, elapsed_ms = future.result()
+            predictions[member] = np.asarray(forecast['predictions'], dtype=float)
+            dates = forecast['dates']
+            member_info[member] = {'status': 'ok', 'elapsed_ms': round(elapsed_ms, 1)}
+        except Exception as e:
+            member_info[member] = {'status': 'error', 'error': str(e), 'elapsed_ms': None, 'weight': 0.0}
+    
+    if not predictions:
+        return None
+    
+    # Weights learned at training time, equal weights if none were saved
+    raw_weights = {m: weights.get(m, 1.0 if not weights else 0.0) for m in predictions}
+    total = sum(raw_weights.values())
+    if total <= 0:
+        raw_weights = {m: 1.0 for m in predictions}
+        total = float(len(predictions))
+    
+    combined = np.zeros(days)
+    for member, values in predictions.items():
+        weight = raw_weights[member] / total
+        member_info[member]['weight'] = round(weight, 4)
+        combined += weight * values
+    
+    return {
+        'dates': dates,
+        'predictions': combined,
+        'fallback': False,
+        'members': member_info
     }
 
 def calculate_confidence_bounds(predictions, std_dev_multiplier=1.96):
@@ -130,67 +371,151 @@ def calculate_confidence_bounds(predictions, std_dev_multiplier=1.96):
     # Use historical standard deviation
     hist_std = DATA['unit_sales'].tail(30).std()
     
-    lower_bounds = [max(0, p - std_dev_multiplier * hist_std) for p in predictions]
-    upper_bounds = [p + std_dev_multiplier * hist_std for p in predictions]
+    predictions = to_float_array(predictions)
     
     return {
-        'lower': [float(b) for b in lower_bounds],
-        'upper': [float(b) for b in upper_bounds]
+        'lower': np.maximum(0, predictions - std_dev_multiplier * hist_std),
+        'upper': predictions + std_dev_multiplier * hist_std
     }
 
-def calculate_metrics():
-    """Calculate dashboard KPIs"""
-    if DATA is None:
+def simulated_bounds(model_name, days, samples=None, confidence=0.95, models=None):
+    """
+    Interval of simulated sample paths for SARIMA, Exponential Smoothing or
+    Prophet served from their state files, or None for other models
+    """
+    forecaster = (MODELS if models is None else models).get(model_name)
+    if DATA is None or not can_simulate(forecaster):
         return None
     
-    # Recent data (last 30 days)
-    recent_data = DATA.tail(30)
-    previous_data = DATA.tail(60).head(30)
-    
-    # Average daily sales
-    avg_sales = recent_data['unit_sales'].mean()
-    prev_avg_sales = previous_data['unit_sales'].mean()
-    sales_change = ((avg_sales - prev_avg_sales) / prev_avg_sales * 100) if prev_avg_sales > 0 else 0
-    
-    # Calculate forecast accuracy (using last 7 days as test)
-    # For simplicity, using MAPE on recent data
-    recent_mean = recent_data['unit_sales'].mean()
-    recent_std = recent_data['unit_sales'].std()
-    mape = (recent_std / recent_mean * 100) if recent_mean > 0 else 0
-    forecast_accuracy = max(0, 100 - mape)
-    
-    # Next 7-day demand forecast
-    forecast_7day = calculate_forecast('exp_smoothing', days=7)
-    if forecast_7day:
-        next_7day_demand = sum(forecast_7day['predictions'])
+    forecast_dates = pd.date_range(start=DATA['date'].max() + timedelta(days=1), periods=days)
+    try:
+        paths = SamplePaths(forecast_dates, simulate(forecaster, days, samples, dates=forecast_dates))
+    except ValueError as e:
+        print(f"⚠ {model_name} simulation unavailable: {e}")
+        return None
+    lower, upper = paths.interval(confidence)
+    return {'lower': np.maximum(0, lower), 'upper': upper}
+
+_PLAN_CACHE = {}
+
+def store_replenishment(model_name='exp_smoothing'):
+    """
+    Reorder plan for the total stock of the store the processed data covers
+    
+    The forecast is of the whole store, so only an inventory row with the
+    store's total stock (family 'all') is planned against it.
+    
+    Returns:
+        One-row plan frame, or None without inventory data
+    """
+    if DATA is None or not os.path.exists(INVENTORY_PATH):
+        return None
+    
+    # Recomputed only when the data, models or inventory file change
+    cache_key = (len(DATA), MODEL_WATCHER.version['checksum'], model_name,
+                 os.stat(INVENTORY_PATH).st_mtime_ns)
+    if cache_key in _PLAN_CACHE:
+        return _PLAN_CACHE[cache_key]
+    
+    stock = store_stock(cached_inventory(INVENTORY_PATH), SERIES_STORE)
+    if stock.empty:
+        return None
+    
+    horizon = required_horizon(stock)
+    forecast = calculate_forecast(model_name, days=horizon)
+    if forecast:
+        mean = np.asarray(forecast['predictions'], dtype=float)
     else:
-        next_7day_demand = avg_sales * 7
+        mean = np.full(horizon, float(DATA['unit_sales'].tail(30).mean()))
+    
+    plan = replenishment_plan(stock, mean[None, :], demand_sigma(DATA['unit_sales'].values))
+    _PLAN_CACHE.clear()
+    _PLAN_CACHE[cache_key] = plan
+    return plan
+
+def demand_forecast_totals(days):
+    """
+    Forecast demand of the store series for the KPI engine; nothing when
+    the model is not loaded, so the KPI reports the average it falls back to
+    """
+    forecast = calculate_forecast('exp_smoothing', days=days)
+    if not forecast or forecast['fallback']:
+        return {}
+    return {(ALL, ALL): float(np.sum(forecast['predictions']))}
+
+def category_family(category):
+    """Product key of a category id from /api/categories ('rice' -> 'GROCERY I'), or the value itself"""
+    for entry in CATEGORIES:
+        if entry['id'] == str(category).lower():
+            return family_name(entry['name'])
+    return family_name(category)
+
+def calculate_metrics(category='all'):
+    """
+    Calculate dashboard KPIs
+    
+    Sales KPIs come from the daily rollups and the 7-day demand from a
+    forecast cached until the data or models change. A category listed by
+    /api/categories whose family has no rollups of its own (the processed
+    data holds store totals) gets the 'all' KPIs, flagged as a fallback.
+    
+    Returns:
+        KPI dict, or None if the category is unknown
+    """
+    if DATA is None or KPI_ENGINE is None:
+        return None
     
-    # Days of stock (simplified calculation)
-    current_inventory = avg_sales * 10  # Assume 10 days of inventory
-    daily_demand = avg_sales
-    days_of_stock = current_inventory / daily_demand if daily_demand > 0 else 0
+    def lookup(product):
+        # Forecast accuracy from the rolling-origin backtest of the model used
+        # for the 7-day demand; fall back to recent volatility if none was run
+        return KPI_ENGINE.lookup(
+            product=product, compute=demand_forecast_totals,
+            model_version=MODEL_WATCHER.version['checksum'],
+            mape=backtest_metric(MODEL_METRICS, 'exp_smoothing', product)
+        )
+    
+    scope = ALL if category == ALL else category_family(category)
+    kpis = lookup(scope)
+    if kpis is None and any(entry['id'] == str(category).lower() for entry in CATEGORIES):
+        scope = ALL
+        kpis = lookup(scope)
+    if kpis is None:
+        return None
+    
+    # Days of stock from the on-hand inventory of the forecast store
+    plan = store_replenishment() if scope == ALL else None
+    if plan is not None:
+        row = plan.iloc[0]
+        days_of_stock = float(row['days_of_stock']) if np.isfinite(row['days_of_stock']) else None
+        stock_status = 'Reorder' if row['reorder'] else 'Healthy'
+    else:
+        days_of_stock, stock_status = None, 'No inventory data'
     
     return {
         'avg_daily_sales': {
-            'value': round(avg_sales, 0),
-            'change': round(sales_change, 1),
+            'value': round(kpis['avg_sales'], 0),
+            'change': round(kpis['sales_change'], 1),
             'unit': 'kg'
         },
         'forecast_accuracy': {
-            'value': round(forecast_accuracy, 1),
-            'mape': round(mape, 1),
+            'value': round(kpis['forecast_accuracy'], 1),
+            'mape': round(kpis['mape'], 1),
             'unit': '%'
         },
         'next_7day_demand': {
-            'value': round(next_7day_demand, 0),
+            'value': round(kpis['next_7day_demand'], 0),
             'unit': 'kg',
-            'label': 'Predicted'
+            'label': 'Predicted' if kpis['forecast_source'] == 'model' else 'Average'
         },
         'days_of_stock': {
-            'value': round(days_of_stock, 0),
+            'value': round(days_of_stock, 0) if days_of_stock is not None else None,
             'unit': 'days',
-            'status': 'Healthy' if days_of_stock >= 5 else 'Low Stock'
+            'status': stock_status
+        },
+        'scope': {
+            'category': category,
+            'product': scope,
+            'fallback': scope == ALL and category != ALL
         }
     }
 
@@ -207,10 +532,12 @@ def index():
 def get_metrics():
     """Get dashboard KPIs"""
     category = request.args.get('category', 'all')
-    metrics = calculate_metrics()
+    metrics = calculate_metrics(category)
     
     if metrics:
         return jsonify(metrics)
+    elif DATA is not None:
+        return jsonify({'error': f'No sales data for category: {category}'}), 404
     else:
         return jsonify({'error': 'Data not available'}), 500
 
@@ -221,11 +548,14 @@ def get_forecast():
     days = int(request.args.get('days', 7))
     category = request.args.get('category', 'all')
     
-    forecast = calculate_forecast(model, days)
+    models = MODELS
+    forecast = calculate_forecast(model, days, models=models)
     
     if forecast:
-        # Add confidence bounds
-        bounds = calculate_confidence_bounds(forecast['predictions'])
+        # Add confidence bounds: quantiles of simulated paths where the model
+        # can be simulated, the historical spread otherwise
+        bounds = (simulated_bounds(model, days, request.args.get('samples', type=int), models=models)
+                  or calculate_confidence_bounds(forecast['predictions']))
         forecast['lower_bound'] = bounds['lower']
         forecast['upper_bound'] = bounds['upper']
         
@@ -233,11 +563,15 @@ def get_forecast():
         if DATA is not None:
             historical = DATA.tail(30)[['date', 'unit_sales']].copy()
             forecast['historical'] = {
-                'dates': [d.strftime('%Y-%m-%d') for d in historical['date']],
-                'actual': [float(v) for v in historical['unit_sales']]
+                'dates': format_dates(historical['date'].values),
+                'actual': to_float_array(historical['unit_sales'].values)
             }
         
-        return jsonify(forecast)
+        return json_response(forecast)
+    elif DATA is None:
+        return jsonify({'error': 'Data not available'}), 500
+    elif model == 'ensemble':
+        return jsonify({'error': 'No ensemble member is loaded or returned in time'}), 503
     else:
         return jsonify({'error': 'Forecast generation failed'}), 500
 
@@ -250,19 +584,67 @@ def get_historical():
     days = int(request.args.get('days', 90))
     category = request.args.get('category', 'all')
     
-    historical = DATA.tail(days)[['date', 'unit_sales']].copy()
+    max_points = request.args.get('max_points', type=int)
+    method = request.args.get('method', 'minmax')
+    resample = request.args.get('resample')
     
-    return jsonify({
-        'dates': [d.strftime('%Y-%m-%d') for d in historical['date']],
-        'sales': [float(v) for v in historical['unit_sales']]
-    })
+    try:
+        dates, sales = HISTORY_PYRAMID.query(days, max_points, method, resample)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    mimetype = negotiate_mimetype()
+    if mimetype != JSON_MIMETYPE:
+        return binary_response(mimetype, dates, {'sales': sales})
+    
+    response = {
+        'dates': format_dates(dates),
+        'sales': to_float_array(sales, decimals=3)
+    }
+    if resample is not None:
+        response['resample'] = resample
+    elif max_points is not None:
+        response['method'] = method
+    
+    return json_response(response)
+
+@app.route('/api/ingest', methods=['POST'])
+def ingest():
+    """Append new daily sales rows to the running service"""
+    payload = request.get_json(silent=True) or {}
+    rows = payload.get('rows')
+    if not rows:
+        return jsonify({'error': 'No rows provided'}), 400
+    
+    try:
+        result = DATASET.ingest(rows)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'success': True, **result})
+
+@app.route('/api/replenishment', methods=['GET'])
+def get_replenishment():
+    """Safety stock, reorder point and order quantity for the store's stock"""
+    model = request.args.get('model', 'exp_smoothing')
+    
+    try:
+        plan = store_replenishment(model)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if plan is None:
+        return jsonify({'error': 'No inventory data for this store'}), 404
+    
+    return json_response({'store': SERIES_STORE, 'model': model, 'plan': plan_records(plan)})
 
 @app.route('/api/models', methods=['GET'])
 def get_models():
     """Get available models and their status"""
     available_models = []
+    models = MODELS
     
-    for model_name, model in MODELS.items():
+    for model_name, model in models.items():
         if model is not None and model_name != 'feature_columns':
             available_models.append({
                 'id': model_name,
@@ -270,20 +652,34 @@ def get_models():
                 'status': 'ready'
             })
     
-    return jsonify({'models': available_models})
+    if sum(models.get(m) is not None for m in ENSEMBLE_MEMBERS) >= 2:
+        available_models.append({
+            'id': 'ensemble',
+            'name': 'Ensemble',
+            'status': 'ready'
+        })
+    
+    return jsonify({'models': available_models, 'version': MODEL_WATCHER.version})
+
+STARTUP_REPORT = {}
+
+@app.route('/api/startup', methods=['GET'])
+def get_startup():
+    """Cold import time of this app per module, measured once in a fresh process"""
+    if 'report' not in STARTUP_REPORT or request.args.get('refresh'):
+        try:
+            STARTUP_REPORT['report'] = import_report('app', top=request.args.get('top', 15, type=int))
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 500
+    
+    report = STARTUP_REPORT['report']
+    problems = budget_problems(report)
+    return jsonify({**report, 'within_budget': not problems, 'problems': problems})
 
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     """Get available product categories"""
-    categories = [
-        {'id': 'rice', 'name': 'Rice', 'icon': '🌾'},
-        {'id': 'water', 'name': 'Bottled Water', 'icon': '💧'},
-        {'id': 'oil', 'name': 'Cooking Oil', 'icon': '🫒'},
-        {'id': 'noodles', 'name': 'Instant Noodles', 'icon': '🍜'},
-        {'id': 'sugar', 'name': 'Sugar', 'icon': '🧂'}
-    ]
-    
-    return jsonify({'categories': categories})
+    return jsonify({'categories': CATEGORIES})
 
 # ============================================================================
 # RUN APP
@@ -0,0 +1,305 @@
+"""
+Rolling-Origin Backtesting for Wing Shop
+Evaluates every forecasting model across many cutoffs in parallel worker
+processes and writes MAPE/RMSE/bias into models/model_metrics.json
+"""
+
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from exogenous import EXOGENOUS_FILE, ExogenousIndex
+from features import feature_matrix, future_features
+from feature_store import FEATURE_STORE_DIR, FeatureStore
+from forecast_models import (
+    MODEL_NAMES, RF_FEATURE_COLUMNS,
+    fit_model, forecast_model, fit_random_forest, forecast_random_forest, load_tuned_params
+)
+
+ROOT_DIR = Path(__file__).parent
+
+# ============================================================================
+# FEATURE MATRICES
+# ============================================================================
+
+class FeatureMatrix:
+    """
+    Feature matrix for one series, engineered once and sliced per fold
+
+    With a FeatureStore the series is materialized first (only dates not
+    stored yet are computed) and the matrix is read back from the store.
+    The matrix is only used to train; forecast days get the inputs serving
+    would have (see future()).
+    """
+
+    def __init__(self, frame, feature_cols=None, store=None, series=None, calendar=None):
+        self.feature_cols = list(feature_cols or RF_FEATURE_COLUMNS)
+        self.calendar = calendar
+        self.frame = frame.sort_values('date').reset_index(drop=True)
+        self.dates = self.frame['date'].values
+        self.sales = self.frame['unit_sales'].values.astype(float)
+        if store is not None:
+            store.materialize(series, self.frame)
+            self.X = store.lookup(series, self.dates, self.feature_cols)
+        else:
+            self.X = feature_matrix(self.frame, self.feature_cols)
+        self.valid = ~np.isnan(self.X).any(axis=1) & ~np.isnan(self.sales)
+
+    def __len__(self):
+        return len(self.sales)
+
+    def future(self, cutoff, horizon):
+        """
+        Features of rows [cutoff, cutoff + horizon) as serving would build them
+        at the cutoff: no real future transactions or oil price, holidays from
+        the calendar (or the rows themselves, since they are scheduled)
+        """
+        future = self.frame.iloc[cutoff:cutoff + horizon]
+        return future_features(self.frame.iloc[:cutoff], future['date'].values, self.feature_cols,
+                               self.calendar, scheduled=future)
+
+def load_category_frames(data_path=None):
+    """Load processed sales data, split per category when a family column exists"""
+    data_path = Path(data_path or ROOT_DIR / 'data' / 'processed_sales_data.csv')
+    frame = pd.read_csv(data_path, parse_dates=['date'])
+
+    for col in ['family', 'category', 'product']:
+        if col in frame.columns:
+            return {str(name): group.drop(columns=[col]) for name, group in frame.groupby(col)}
+
+    return {'all': frame}
+
+def rolling_origin_cutoffs(n_rows, horizon, n_folds, step, min_train=365):
+    """Row indices of the forecast origins, oldest first"""
+    last = n_rows - horizon
+    cutoffs = [last - i * step for i in range(n_folds)]
+    return sorted(c for c in cutoffs if c >= min_train)
+
+# ============================================================================
+# FOLD EVALUATION
+# ============================================================================
+
+def evaluate_fold(matrix, model_name, cutoff, horizon, params=None):
+    """
+    Fit on rows [0, cutoff) and forecast rows [cutoff, cutoff + horizon)
+
+    Returns:
+        (actual, predicted) arrays of length horizon
+    """
+    actual = matrix.sales[cutoff:cutoff + horizon]
+
+    if model_name == 'random_forest':
+        # Slice the shared matrix instead of re-engineering features per fold
+        train = matrix.valid[:cutoff]
+        model = fit_random_forest(matrix.X[:cutoff][train], matrix.sales[:cutoff][train], params)
+        predicted = forecast_random_forest(
+            model, matrix.sales[:cutoff], matrix.future(cutoff, horizon), matrix.feature_cols
+        )
+    else:
+        history = matrix.frame.iloc[:cutoff]
+        future = matrix.frame.iloc[cutoff:cutoff + horizon]
+        model = fit_model(model_name, history, params)
+        predicted = forecast_model(model_name, model, history, future, calendar=matrix.calendar)
+
+    return actual, np.asarray(predicted, dtype=float)
+
+# Feature matrices are shipped to each worker once, not once per fold
+_WORKER_MATRICES = {}
+
+def _init_worker(matrices):
+    global _WORKER_MATRICES
+    _WORKER_MATRICES = matrices
+
+def _run_fold(category, model_name, cutoff, horizon, params=None):
+    params = dict(params or {})
+    if model_name == 'random_forest':
+        # One process per fold already saturates the cores
+        params.setdefault('n_jobs', 1)
+    return evaluate_fold(_WORKER_MATRICES[category], model_name, cutoff, horizon, params)
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def summarize_errors(actual, predicted):
+    """
+    MAPE, RMSE and bias for (n_folds, horizon) arrays, overall and per horizon
+    """
+    actual = np.asarray(actual, dtype=float)
+    predicted = np.asarray(predicted, dtype=float)
+    error = predicted - actual
+    nonzero = actual != 0
+    ape = np.where(nonzero, np.abs(error) / np.where(nonzero, np.abs(actual), 1), np.nan)
+
+    def _summary(err, ape_values):
+        return {
+            'mape': float(np.nanmean(ape_values) * 100) if np.isfinite(ape_values).any() else None,
+            'rmse': float(np.sqrt(np.mean(err ** 2))),
+            'bias': float(np.mean(err))
+        }
+
+    by_horizon = []
+    for h in range(actual.shape[1]):
+        summary = _summary(error[:, h], ape[:, h])
+        summary['horizon'] = h + 1
+        by_horizon.append(summary)
+
+    overall = _summary(error.ravel(), ape.ravel())
+    overall['n_folds'] = int(actual.shape[0])
+    return {'overall': overall, 'by_horizon': by_horizon}
+
+# ============================================================================
+# BACKTEST RUNNER
+# ============================================================================
+
+def run_backtest(frames, models=None, horizon=14, n_folds=12, step=7, workers=None, params=None,
+                 feature_store=None, calendar=None):
+    """
+    Rolling-origin evaluation of every model on every category
+
+    Args:
+        frames: Dict of category -> processed daily sales frame
+        models: Model names to evaluate (default: all of MODEL_NAMES)
+        horizon: Days forecast from each cutoff
+        n_folds: Number of cutoffs per category
+        step: Days between consecutive cutoffs
+        workers: Worker processes (1 runs inline)
+        params: Optional dict of model name -> parameter overrides
+        feature_store: Optional FeatureStore to read the Random Forest
+            features from, one series per category
+        calendar: Optional exogenous.ExogenousIndex with the holidays of
+            the forecast days
+
+    Returns:
+        Dict ready to store under 'backtest' in model_metrics.json
+    """
+    models = models or MODEL_NAMES
+    params = params or {}
+    workers = workers or os.cpu_count() or 1
+    matrices = {category: FeatureMatrix(frame, store=feature_store, series=category, calendar=calendar)
+                for category, frame in frames.items()}
+
+    tasks = []
+    for category, matrix in matrices.items():
+        for cutoff in rolling_origin_cutoffs(len(matrix), horizon, n_folds, step):
+            for model_name in models:
+                tasks.append((category, model_name, cutoff))
+
+    fold_results = {}
+    if workers == 1:
+        _init_worker(matrices)
+        for category, model_name, cutoff in tasks:
+            try:
+                fold_results[(category, model_name, cutoff)] = _run_fold(
+                    category, model_name, cutoff, horizon, params.get(model_name))
+            except Exception as e:
+                print(f"⚠ {model_name}/{category} @ {cutoff} failed: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(matrices,)) as executor:
+            futures = {
+                executor.submit(_run_fold, category, model_name, cutoff, horizon,
+                                params.get(model_name)): (category, model_name, cutoff)
+                for category, model_name, cutoff in tasks
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    fold_results[key] = future.result()
+                except Exception as e:
+                    print(f"⚠ {key[1]}/{key[0]} @ {key[2]} failed: {e}")
+
+    results = {}
+    for model_name in models:
+        results[model_name] = {}
+        for category, matrix in matrices.items():
+            keys = sorted(k for k in fold_results if k[0] == category and k[1] == model_name)
+            if not keys:
+                continue
+            actual = np.vstack([fold_results[k][0] for k in keys])
+            predicted = np.vstack([fold_results[k][1] for k in keys])
+            summary = summarize_errors(actual, predicted)
+            summary['cutoffs'] = [pd.Timestamp(matrix.dates[k[2]]).strftime('%Y-%m-%d') for k in keys]
+            results[model_name][category] = summary
+
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'horizon': horizon,
+        'n_folds': n_folds,
+        'step': step,
+        'models': results
+    }
+
+def save_backtest_metrics(backtest, metrics_path=None):
+    """Merge backtest results into model_metrics.json, keeping existing keys"""
+    metrics_path = Path(metrics_path or ROOT_DIR / 'models' / 'model_metrics.json')
+    metrics = {}
+    if metrics_path.exists():
+        with open(metrics_path, 'r') as f:
+            metrics = json.load(f)
+
+    metrics['backtest'] = backtest
+    with open(metrics_path, 'w') as f:
+        json.dump(metrics, f, indent=2)
+
+    return metrics_path
+
+def backtest_metric(metrics, model_name, category='all', key='mape'):
+    """Look up an overall backtest metric, or None if it was not computed"""
+    try:
+        return metrics['backtest']['models'][model_name][category]['overall'][key]
+    except (KeyError, TypeError):
+        return None
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Rolling-origin backtest of all forecasting models')
+    parser.add_argument('--data', default=None, help='Processed sales CSV')
+    parser.add_argument('--models', nargs='+', default=MODEL_NAMES, choices=MODEL_NAMES)
+    parser.add_argument('--horizon', type=int, default=14)
+    parser.add_argument('--folds', type=int, default=12)
+    parser.add_argument('--step', type=int, default=7)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help='model_metrics.json to update')
+    parser.add_argument('--defaults', action='store_true',
+                        help='Ignore tuned parameters from models/hyperparameters.json')
+    parser.add_argument('--feature-store', default=str(FEATURE_STORE_DIR),
+                        help='Feature store directory')
+    parser.add_argument('--no-feature-store', action='store_true',
+                        help='Compute features in memory instead of reading them from the store')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("WING SHOP - ROLLING-ORIGIN BACKTEST")
+    print("="*80)
+
+    frames = load_category_frames(args.data)
+    print(f"✓ Loaded {len(frames)} series: {list(frames)}")
+
+    params = {} if args.defaults else load_tuned_params(ROOT_DIR / 'models' / 'hyperparameters.json')
+    store = None if args.no_feature_store else FeatureStore(args.feature_store)
+    data_path = Path(args.data or ROOT_DIR / 'data' / 'processed_sales_data.csv')
+    calendar = ExogenousIndex.shared(data_path.with_name(EXOGENOUS_FILE))
+    backtest = run_backtest(frames, args.models, args.horizon, args.folds, args.step, args.workers, params, store,
+                            calendar)
+    path = save_backtest_metrics(backtest, args.output)
+
+    for model_name, categories in backtest['models'].items():
+        for category, summary in categories.items():
+            overall = summary['overall']
+            mape = f"{overall['mape']:.2f}%" if overall['mape'] is not None else 'n/a'
+            print(f"  - {model_name:<14} {category:<12} MAPE={mape}  "
+                  f"RMSE={overall['rmse']:.1f}  bias={overall['bias']:.1f}")
+
+    print(f"\n✓ Backtest metrics saved: {path}")
+
+if __name__ == '__main__':
+    main()
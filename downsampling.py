@@ -0,0 +1,189 @@
+"""
+Server-Side Downsampling for Wing Shop Charts
+Multi-resolution min/max pyramid built once at load time, so a request for
+the last `days` points at most `max_points` wide costs O(output)
+"""
+
+import numpy as np
+import pandas as pd
+
+DOWNSAMPLE_METHODS = ['minmax', 'lttb']
+RESAMPLE_RULES = {'weekly': 'W-SUN', 'monthly': 'MS'}
+
+# LTTB picks from this many pyramid points per output point
+LTTB_OVERSAMPLE = 4
+
+# ============================================================================
+# PYRAMID
+# ============================================================================
+
+class SeriesPyramid:
+    """
+    Min/max pyramid over one daily series
+
+    Level k groups `factor ** k` consecutive rows into a bucket and keeps
+    the row index of the bucket's minimum and maximum. Buckets are anchored
+    at the end of the series, so the most recent bucket of every level is
+    always complete and a tail query never splits it.
+    """
+
+    def __init__(self, dates, values, factor=2):
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.values = np.asarray(values, dtype=float)
+        self.factor = factor
+        self.levels = []
+
+        n = len(self.values)
+        min_idx = max_idx = np.arange(n)
+        size = 1
+        while len(min_idx) > 1:
+            min_idx = self._coarsen(min_idx, np.argmin, np.inf)
+            max_idx = self._coarsen(max_idx, np.argmax, -np.inf)
+            size *= factor
+            self.levels.append((size, min_idx, max_idx))
+
+        self._resampled = {}
+        frame = pd.Series(self.values, index=pd.DatetimeIndex(self.dates))
+        for name, rule in RESAMPLE_RULES.items():
+            totals = frame.resample(rule).sum(min_count=1).dropna()
+            self._resampled[name] = (totals.index.values, totals.values)
+
+    @classmethod
+    def from_frame(cls, frame, value_col='unit_sales', factor=2):
+        frame = frame.sort_values('date')
+        return cls(frame['date'].values, frame[value_col].values, factor)
+
+    def _coarsen(self, indices, pick, pad_value):
+        """Merge `factor` buckets of the level below, padding at the front"""
+        pad = (-len(indices)) % self.factor
+        padded = np.concatenate([np.full(pad, -1), indices])
+        groups = padded.reshape(-1, self.factor)
+        values = np.where(groups >= 0, self.values[np.maximum(groups, 0)], pad_value)
+        return groups[np.arange(len(groups)), pick(values, axis=1)]
+
+    def __len__(self):
+        return len(self.values)
+
+    # ------------------------------------------------------------------------
+    # QUERIES
+    # ------------------------------------------------------------------------
+
+    def tail(self, days):
+        """Raw last `days` rows"""
+        start = max(0, len(self.values) - days)
+        return self.dates[start:], self.values[start:]
+
+    def minmax_indices(self, days, max_points):
+        """
+        Row indices of the min and max of each bucket covering the last
+        `days` rows, from the finest level that fits in `max_points`
+
+        The oldest bucket may reach slightly before the requested window
+        because buckets are anchored at the end of the series.
+        """
+        days = min(days, len(self.values))
+        if days <= max_points:
+            return np.arange(len(self.values) - days, len(self.values))
+
+        for size, min_idx, max_idx in self.levels:
+            buckets = -(-days // size)
+            if 2 * buckets <= max_points or size == self.levels[-1][0]:
+                break
+
+        pairs = np.sort(np.column_stack([min_idx[-buckets:], max_idx[-buckets:]]), axis=1).ravel()
+        keep = np.concatenate([[True], pairs[1:] != pairs[:-1]])
+        return pairs[keep]
+
+    def minmax(self, days, max_points):
+        """Min/max bucketing of the last `days` rows into at most `max_points`"""
+        idx = self.minmax_indices(days, max_points)
+        return self.dates[idx], self.values[idx]
+
+    def lttb(self, days, max_points):
+        """
+        Largest-Triangle-Three-Buckets over the last `days` rows
+
+        Runs on the min/max points of a pyramid level a few times wider than
+        the output instead of on the raw rows, so the cost stays O(output).
+        """
+        idx = self.minmax_indices(days, max_points * LTTB_OVERSAMPLE)
+        if len(idx) <= max_points:
+            return self.dates[idx], self.values[idx]
+
+        chosen = idx[lttb_indices(self.dates[idx].astype('datetime64[D]').astype(float),
+                                  self.values[idx], max_points)]
+        return self.dates[chosen], self.values[chosen]
+
+    def resampled(self, rule, days):
+        """Calendar totals (weekly/monthly) covering the last `days` days"""
+        dates, values = self._resampled[rule]
+        if len(self.dates) == 0:
+            return dates, values
+        cutoff = self.dates[-1] - np.timedelta64(days, 'D')
+        start = np.searchsorted(dates, cutoff, side='right')
+        return dates[start:], values[start:]
+
+    def query(self, days, max_points=None, method='minmax', resample=None):
+        """
+        Dispatch one historical query
+
+        Args:
+            days: Number of most recent rows (calendar days for `resample`)
+            max_points: Upper bound on returned points (None = raw)
+            method: 'minmax' or 'lttb'
+            resample: 'weekly' or 'monthly' totals instead of daily rows
+
+        Returns:
+            (dates, values) arrays
+        """
+        if resample is not None:
+            if resample not in RESAMPLE_RULES:
+                raise ValueError(f"Unknown resample rule: {resample}")
+            dates, values = self.resampled(resample, days)
+            if max_points is not None and len(values) > max_points:
+                dates, values = dates[-max_points:], values[-max_points:]
+            return dates, values
+
+        if max_points is None:
+            return self.tail(days)
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(f"Unknown downsampling method: {method}")
+        if max_points < 3:
+            raise ValueError("max_points must be at least 3")
+        if method == 'lttb':
+            return self.lttb(days, max_points)
+        return self.minmax(days, max_points)
+
+# ============================================================================
+# LTTB
+# ============================================================================
+
+def lttb_indices(x, y, n_out):
+    """
+    Indices selected by Largest-Triangle-Three-Buckets
+
+    Keeps the first and last points and, for every bucket in between, the
+    point forming the largest triangle with the previously selected point
+    and the mean of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.zeros(n_out, dtype=np.int64)
+    selected[-1] = n - 1
+    a = 0
+
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
@@ -0,0 +1,220 @@
+"""
+Exogenous Calendar for Wing Shop
+Oil price, holiday flags per locale and transactions per store as dense
+arrays over one daily calendar, built once from the raw files and shared by
+training, ingestion and serving, so the exogenous inputs of any date range
+are an array slice instead of a merge
+"""
+
+import os
+import argparse
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).parent
+EXOGENOUS_FILE = 'exogenous.npz'
+EXOGENOUS_PATH = ROOT_DIR / 'data' / EXOGENOUS_FILE
+
+# Columns lookups return, in the names used by the processed data
+EXOGENOUS_COLUMNS = ['transactions', 'dcoilwtico', 'is_holiday']
+
+def _days(dates):
+    return pd.DatetimeIndex(pd.to_datetime(dates)).values.astype('datetime64[D]')
+
+class ExogenousIndex:
+    """
+    Dense date-indexed exogenous inputs
+
+    Day d of the calendar is position (d - start) of every array. The oil
+    price is carried forward over days without a quote (and backward
+    before the first one), days without holiday events are 0 and days a
+    store has no transaction count are 0, as in the training merge.
+
+    Args:
+        start: First calendar day
+        oil: (n_days,) oil price
+        locales: Holiday locales ('National', 'Regional', 'Local')
+        holidays: (n_locales, n_days) int8 flag per locale
+        stores: Store numbers with transaction counts
+        transactions: (n_stores, n_days) transactions
+        store: Store the processed daily data belongs to (default for lookups)
+    """
+
+    def __init__(self, start, oil, locales, holidays, stores, transactions, store=None):
+        self.start = np.datetime64(start, 'D')
+        self.oil = np.asarray(oil, dtype=np.float64)
+        self.locales = [str(locale) for locale in locales]
+        self.holidays = np.asarray(holidays, dtype=np.int8).reshape(len(self.locales), len(self.oil))
+        self.is_holiday = self.holidays.max(axis=0) if len(self.locales) else np.zeros(len(self.oil), np.int8)
+        self.stores = np.asarray(stores, dtype=np.int64)
+        self.transactions = np.asarray(transactions, dtype=np.float64).reshape(len(self.stores), len(self.oil))
+        self.store = None if store is None else int(store)
+        self._store_rows = {int(s): i for i, s in enumerate(self.stores)}
+
+    @classmethod
+    def from_frames(cls, oil, holiday_events, transactions, store=None):
+        """
+        Build the calendar from the raw oil.csv, holidays_events.csv and
+        transactions.csv frames; it spans the earliest to latest date of any
+        """
+        oil_days, hol_days, txn_days = _days(oil['date']), _days(holiday_events['date']), _days(transactions['date'])
+        every = np.concatenate([oil_days, hol_days, txn_days])
+        start, end = every.min(), every.max()
+        n_days = int((end - start).astype(np.int64)) + 1
+
+        prices = np.full(n_days, np.nan)
+        prices[(oil_days - start).astype(np.int64)] = oil['dcoilwtico'].values.astype(np.float64)
+        prices = pd.Series(prices).ffill().bfill().values
+
+        locales = sorted(holiday_events['locale'].dropna().unique()) if 'locale' in holiday_events else ['National']
+        holidays = np.zeros((len(locales), n_days), dtype=np.int8)
+        event_locales = (holiday_events['locale'].values if 'locale' in holiday_events
+                         else np.full(len(holiday_events), 'National'))
+        for row, locale in enumerate(locales):
+            holidays[row, (hol_days[event_locales == locale] - start).astype(np.int64)] = 1
+
+        stores = np.sort(transactions['store_nbr'].unique())
+        counts = np.zeros((len(stores), n_days))
+        rows = np.searchsorted(stores, transactions['store_nbr'].values)
+        counts[rows, (txn_days - start).astype(np.int64)] = transactions['transactions'].values
+
+        return cls(start, prices, locales, holidays, stores, counts, store)
+
+    @classmethod
+    def from_raw(cls, raw_dir, store=None):
+        raw_dir = Path(raw_dir)
+        return cls.from_frames(
+            pd.read_csv(raw_dir / 'oil.csv', parse_dates=['date']),
+            pd.read_csv(raw_dir / 'holidays_events.csv', parse_dates=['date']),
+            pd.read_csv(raw_dir / 'transactions.csv', parse_dates=['date']),
+            store
+        )
+
+    def __len__(self):
+        return len(self.oil)
+
+    @property
+    def end(self):
+        return self.start + np.timedelta64(len(self.oil) - 1, 'D')
+
+    # ------------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------------
+
+    def _positions(self, dates):
+        """(slice or index array, in-range mask) of dates in the calendar"""
+        offsets = (_days(dates) - self.start).astype(np.int64)
+        inside = (offsets >= 0) & (offsets < len(self.oil))
+        if len(offsets) and inside.all() and (np.diff(offsets) == 1).all():
+            return slice(int(offsets[0]), int(offsets[-1]) + 1), inside
+        return np.clip(offsets, 0, max(len(self.oil) - 1, 0)), inside
+
+    def _take(self, values, positions, inside):
+        if isinstance(positions, slice):
+            return values[positions].astype(np.float64)
+        return np.where(inside, values[positions], np.nan)
+
+    def columns(self, dates, store=None):
+        """
+        EXOGENOUS_COLUMNS for the given dates
+
+        Consecutive dates inside the calendar are one slice of each array.
+        Dates outside the calendar, and transactions of a store without
+        counts, are NaN so callers can apply their own defaults.
+
+        Args:
+            dates: Dates to look up
+            store: Store for transactions (default: the index's store)
+
+        Returns:
+            Dict of column -> float array
+        """
+        positions, inside = self._positions(dates)
+        store = self.store if store is None else int(store)
+        row = self._store_rows.get(store)
+        return {
+            'transactions': (self._take(self.transactions[row], positions, inside) if row is not None
+                             else np.full(len(inside), np.nan)),
+            'dcoilwtico': self._take(self.oil, positions, inside),
+            'is_holiday': self._take(self.is_holiday, positions, inside)
+        }
+
+    def holiday_flags(self, dates, locale='National'):
+        """Holiday flag of one locale for the given dates (NaN outside the calendar)"""
+        positions, inside = self._positions(dates)
+        return self._take(self.holidays[self.locales.index(locale)], positions, inside)
+
+    def fill(self, exogenous, dates, store=None, columns=None):
+        """
+        Copy of an exogenous dict with the values the calendar knows replacing its own
+
+        Args:
+            columns: Only replace these columns (default: every column of the dict)
+        """
+        filled = dict(exogenous)
+        for col, known in self.columns(dates, store).items():
+            if col in filled and (columns is None or col in columns):
+                filled[col] = np.where(np.isnan(known), np.asarray(filled[col], dtype=float), known)
+        return filled
+
+    # ------------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------------
+
+    def save(self, path=EXOGENOUS_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                start=np.array(self.start),
+                oil=self.oil,
+                locales=np.array(self.locales),
+                holidays=self.holidays,
+                stores=self.stores,
+                transactions=self.transactions,
+                store=np.array(-1 if self.store is None else self.store)
+            )
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path=EXOGENOUS_PATH):
+        with np.load(path) as data:
+            store = int(data['store'])
+            return cls(data['start'], data['oil'], data['locales'].tolist(), data['holidays'],
+                       data['stores'], data['transactions'], None if store < 0 else store)
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, path=EXOGENOUS_PATH):
+        """One index per file in the process, or None when the file does not exist"""
+        key = str(Path(path).resolve())
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls.load(path) if Path(path).exists() else None
+            return cls._instances[key]
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the Wing Shop exogenous calendar')
+    parser.add_argument('raw_dir', help='Directory with oil.csv, holidays_events.csv and transactions.csv')
+    parser.add_argument('--store', type=int, default=44, help='Store of the processed daily data')
+    parser.add_argument('--out', default=str(EXOGENOUS_PATH))
+    args = parser.parse_args()
+
+    index = ExogenousIndex.from_raw(args.raw_dir, args.store)
+    path = index.save(args.out)
+    print(f"✓ {len(index)} days ({index.start} to {index.end}), {len(index.stores)} stores, "
+          f"locales {', '.join(index.locales)} → {path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,421 @@
+"""
+Feature Store for Wing Shop
+Registry features materialized per (series, date) into columnar .npy files,
+extended with only the new dates as data arrives, and read back with a
+point-in-time lookup so training, backtesting and serving use the same
+stored values
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from features import (
+    CALENDAR_FEATURES, DERIVED_COLUMNS, EXOGENOUS_DEFAULTS, HISTORY_DAYS, FeatureSet, canonical_name,
+    future_features, history_spec
+)
+
+ROOT_DIR = Path(__file__).parent
+FEATURE_STORE_DIR = ROOT_DIR / 'data' / 'feature_store'
+
+# Series id of the single store-level daily series
+DEFAULT_SERIES = 'all'
+
+MANIFEST = 'manifest.json'
+
+# ============================================================================
+# STORE
+# ============================================================================
+
+class FeatureStore:
+    """
+    Columnar on-disk features, one directory per series
+
+    Each series holds dates.npy, sales.npy and one <feature>.npy per column
+    in a generation directory, plus a manifest naming the generation and
+    its row count. Appends grow the arrays of the current generation and
+    then rewrite the manifest, so a reader that sliced arrays to the
+    manifest's row count never sees a half-written append. A rebuild
+    (changed history or new columns) writes a new generation and swaps the
+    manifest. Writers of a series hold an exclusive lock on its lock file,
+    so processes sharing the directory never interleave their writes.
+
+    Every stored row only uses information available on its date: lags and
+    rolling windows see sales strictly before it, calendar features the
+    date itself, and exogenous columns their value recorded for that day.
+
+    Args:
+        root: Directory of the store
+    """
+
+    def __init__(self, root=FEATURE_STORE_DIR):
+        self.root = Path(root)
+        self._arrays = {}
+        self._following = {}
+        self._lock = threading.Lock()
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, root=FEATURE_STORE_DIR):
+        """One store per directory in the process, like LiveDataset.shared()"""
+        key = str(Path(root).resolve())
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(root)
+            return cls._instances[key]
+
+    def _series_dir(self, series):
+        return self.root / quote(str(series), safe='')
+
+    def series(self):
+        """Ids of every materialized series"""
+        if not self.root.exists():
+            return []
+        return sorted(unquote(p.name) for p in self.root.iterdir() if (p / MANIFEST).exists())
+
+    def manifest(self, series):
+        """Manifest of a series, or None if it was never materialized"""
+        try:
+            with open(self._series_dir(series) / MANIFEST, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, series, manifest):
+        path = self._series_dir(series) / MANIFEST
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+    # ------------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------------
+
+    def materialize(self, series, frame, columns=None):
+        """
+        Store the features of every date of `frame` not stored yet
+
+        Only dates after the last stored one are computed, from the stored
+        tail of HISTORY_DAYS rows plus the new rows. The series is rebuilt
+        from scratch instead when the frame disagrees with the stored sales
+        or asks for columns the store does not have.
+
+        Args:
+            series: Series id, e.g. DEFAULT_SERIES or 'store/family'
+            frame: Daily frame with 'date', 'unit_sales' and any exogenous columns
+            columns: Feature columns to store (default: every derived column
+                plus the frame's exogenous columns)
+
+        Returns:
+            Number of rows written
+        """
+        frame = frame.sort_values('date').reset_index(drop=True)
+        if columns is None:
+            columns = DERIVED_COLUMNS + [c for c in EXOGENOUS_DEFAULTS if c in frame.columns]
+        columns = list(dict.fromkeys(canonical_name(c) for c in columns))
+
+        with self._lock, self._write_lock(series):
+            manifest = self.manifest(series)
+            if manifest is not None and self._can_append(series, manifest, frame, columns):
+                return self._append(series, manifest, frame)
+            return self._rebuild(series, frame, columns, manifest)
+
+    @contextmanager
+    def _write_lock(self, series):
+        """Exclusive lock on a series across processes (in-process only without fcntl)"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / f"{quote(str(series), safe='')}.lock", 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _can_append(self, series, manifest, frame, columns):
+        if not set(columns) <= set(manifest['columns']):
+            return False
+        dates, sales = self.history(series)
+        stored = frame[frame['date'] <= dates[-1]] if len(dates) else frame.iloc[:0]
+        return (len(stored) == len(dates)
+                and np.array_equal(stored['date'].values.astype('datetime64[D]'), dates)
+                and np.allclose(stored['unit_sales'].values.astype(float), sales, equal_nan=True))
+
+    def _compute(self, columns, dates, sales, exogenous, skip=0):
+        """Feature arrays over (dates, sales), without the first `skip` rows"""
+        features = FeatureSet(dates, sales, exogenous)
+        return {col: np.asarray(features[col], dtype=np.float64)[skip:] for col in columns}
+
+    def _exogenous(self, frame):
+        return {col: frame[col].values.astype(float) for col in EXOGENOUS_DEFAULTS if col in frame.columns}
+
+    def _rebuild(self, series, frame, columns, manifest):
+        generation = (manifest['generation'] + 1) if manifest else 1
+        gen_dir = self._series_dir(series) / f'gen-{generation:05d}'
+        if gen_dir.exists():
+            shutil.rmtree(gen_dir)
+        gen_dir.mkdir(parents=True)
+
+        dates = frame['date'].values.astype('datetime64[D]')
+        sales = frame['unit_sales'].values.astype(np.float64)
+        arrays = {'dates': dates, 'sales': sales}
+        arrays.update(self._compute(columns, frame['date'].values, sales, self._exogenous(frame)))
+        for name, values in arrays.items():
+            np.save(gen_dir / f'{name}.npy', values)
+
+        self._write_manifest(series, {
+            'series': str(series),
+            'generation': generation,
+            'columns': columns,
+            'rows': len(frame),
+            'first_date': str(dates[0]) if len(dates) else None,
+            'last_date': str(dates[-1]) if len(dates) else None,
+            'updated_at': datetime.now().isoformat()
+        })
+        if manifest:
+            shutil.rmtree(self._series_dir(series) / f"gen-{manifest['generation']:05d}", ignore_errors=True)
+        return len(frame)
+
+    def _append(self, series, manifest, frame):
+        last = np.datetime64(manifest['last_date'], 'D') if manifest['last_date'] else None
+        new_rows = frame if last is None else frame[frame['date'].values.astype('datetime64[D]') > last]
+        if new_rows.empty:
+            return 0
+
+        # Lags and rolling windows of the new rows only need the stored tail
+        dates, sales = self.history(series)
+        tail_dates = np.concatenate([dates[-HISTORY_DAYS:], new_rows['date'].values.astype('datetime64[D]')])
+        tail_sales = np.concatenate([sales[-HISTORY_DAYS:], new_rows['unit_sales'].values.astype(np.float64)])
+        tail = frame.iloc[len(frame) - len(tail_dates):]
+        computed = self._compute(manifest['columns'], tail_dates, tail_sales, self._exogenous(tail),
+                                 skip=len(tail_dates) - len(new_rows))
+
+        gen_dir = self._series_dir(series) / f"gen-{manifest['generation']:05d}"
+        additions = {'dates': tail_dates[-len(new_rows):], 'sales': tail_sales[-len(new_rows):]}
+        additions.update(computed)
+        rows = manifest['rows']
+        for name, values in additions.items():
+            stored = np.load(gen_dir / f'{name}.npy')[:rows]
+            tmp_path = gen_dir / f'{name}.tmp.npy'
+            np.save(tmp_path, np.concatenate([stored, values]))
+            os.replace(tmp_path, gen_dir / f'{name}.npy')
+
+        manifest = dict(manifest, rows=rows + len(new_rows),
+                        last_date=str(additions['dates'][-1]), updated_at=datetime.now().isoformat())
+        self._write_manifest(series, manifest)
+        return len(new_rows)
+
+    # ------------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------------
+
+    def _array(self, series, name, manifest=None):
+        """Stored array of a series, memory-mapped and cut to the manifest's rows"""
+        manifest = manifest or self.manifest(series)
+        if manifest is None:
+            raise KeyError(f"Series not materialized: {series}")
+        key = (str(series), manifest['generation'], manifest['rows'], name)
+        values = self._arrays.get(key)
+        if values is None:
+            path = self._series_dir(series) / f"gen-{manifest['generation']:05d}" / f'{name}.npy'
+            values = np.load(path, mmap_mode='r')[:manifest['rows']]
+            # Arrays of older versions of this series are dropped
+            self._arrays = {k: v for k, v in self._arrays.items() if k[0] != key[0] or k[:3] == key[:3]}
+            self._arrays[key] = values
+        return values
+
+    def history(self, series, as_of=None):
+        """
+        (dates, sales) of a series, up to and including `as_of` if given
+        """
+        manifest = self.manifest(series)
+        dates = self._array(series, 'dates', manifest)
+        sales = self._array(series, 'sales', manifest)
+        if as_of is not None:
+            end = np.searchsorted(dates, np.datetime64(pd.Timestamp(as_of), 'D'), side='right')
+            dates, sales = dates[:end], sales[:end]
+        return np.asarray(dates), np.asarray(sales)
+
+    def lookup(self, series, dates, columns):
+        """
+        Feature matrix of stored dates
+
+        Row i holds the features stored for dates[i]. A date the series has
+        no row for (a closure day, or a day before the first or after the
+        last stored one) is a miss: its calendar columns are computed for
+        that date and every other column is NaN, never another day's values.
+
+        Returns:
+            Array of shape (len(dates), len(columns))
+        """
+        manifest = self.manifest(series)
+        stored_dates = self._array(series, 'dates', manifest)
+        wanted = pd.DatetimeIndex(dates)
+        days = wanted.values.astype('datetime64[D]')
+        rows = np.minimum(np.searchsorted(stored_dates, days), max(len(stored_dates) - 1, 0))
+        found = (stored_dates[rows] == days) if len(stored_dates) else np.zeros(len(days), dtype=bool)
+
+        X = np.full((len(days), len(columns)), np.nan)
+        for j, col in enumerate(columns):
+            name = canonical_name(col)
+            if name not in manifest['columns']:
+                raise KeyError(f"Feature {col} is not stored for series {series}")
+            X[found, j] = self._array(series, name, manifest)[rows[found]]
+            if name in CALENDAR_FEATURES and not found.all():
+                X[~found, j] = np.asarray(CALENDAR_FEATURES[name](wanted[~found]), dtype=float)
+        return X
+
+    def last_date(self, series):
+        """Last stored date of a series, or None if it has no rows"""
+        manifest = self.manifest(series)
+        return pd.Timestamp(manifest['last_date']) if manifest and manifest['last_date'] else None
+
+    def forecast_inputs(self, series, future_dates, feature_cols, calendar=None):
+        """
+        Inputs of forecast_models.forecast_random_forest() for the days after
+        the last stored one, as SeriesState.forecast_inputs() returns them
+
+        The recent sales and the last exogenous values are the stored ones,
+        and the history columns of the first day are computed from the
+        stored tail by the registry, as materialize() computes stored rows.
+
+        Returns:
+            (recent sales, (len(future_dates), len(feature_cols)) matrix,
+            number of leading rows whose history columns are filled)
+        """
+        manifest = self.manifest(series)
+        if manifest is None or not manifest['rows']:
+            raise KeyError(f"Series not materialized: {series}")
+        tail = slice(max(manifest['rows'] - HISTORY_DAYS, 0), manifest['rows'])
+        recent = pd.DataFrame({
+            'date': self._array(series, 'dates', manifest)[tail],
+            'unit_sales': np.asarray(self._array(series, 'sales', manifest)[tail], dtype=np.float64)
+        })
+        for col in EXOGENOUS_DEFAULTS:
+            if col in manifest['columns']:
+                recent[col] = np.asarray(self._array(series, col, manifest)[tail], dtype=np.float64)
+
+        X = future_features(recent, future_dates, feature_cols, calendar)
+        if not len(X):
+            return recent['unit_sales'].values, X, 0
+        # The first forecast day is the row after the tail
+        next_day = FeatureSet(np.append(recent['date'].values.astype('datetime64[ns]'),
+                                        pd.DatetimeIndex(future_dates[:1]).values),
+                              np.append(recent['unit_sales'].values, np.nan))
+        slots = [j for j, col in enumerate(feature_cols) if history_spec(col) is not None]
+        first = np.array([next_day[feature_cols[j]][-1] for j in slots], dtype=float)
+        if not np.isfinite(first).all():
+            return recent['unit_sales'].values, X, 0
+        X[0, slots] = first
+        return recent['unit_sales'].values, X, 1
+
+    def feature_set(self, series, dates):
+        """Stored features aligned with `dates`, usable wherever a FeatureSet is"""
+        return StoredFeatures(self, series, dates)
+
+    def follow(self, dataset, series=DEFAULT_SERIES):
+        """
+        Keep a LiveDataset materialized from a background thread
+
+        The thread materializes the dataset once and again after every
+        ingested batch; ingest() only wakes it, so no store write happens
+        on a request thread or inside an ingest. Only the first call per
+        dataset and series starts a thread.
+
+        Returns:
+            The thread
+        """
+        key = (id(dataset), str(series))
+        with self._lock:
+            if key in self._following:
+                return self._following[key]
+            # Latest frame to store; the thread waits while it is None
+            latest = {'frame': None}
+            pending = threading.Condition()
+
+            def wake(frame):
+                with pending:
+                    latest['frame'] = frame
+                    pending.notify()
+
+            dataset.subscribe(lambda frame, new_rows: lambda: wake(frame))
+            thread = threading.Thread(target=self._follow, args=(dataset, series, latest, pending),
+                                      name=f'feature-store-{series}', daemon=True)
+            self._following[key] = thread
+        thread.start()
+        return thread
+
+    def _follow(self, dataset, series, latest, pending):
+        frame = dataset.load()
+        while True:
+            try:
+                self.materialize(series, frame)
+            except Exception as e:
+                # The next batch retries; training materializes on its own
+                print(f"⚠ Feature store not updated for {series}: {e}")
+            with pending:
+                while latest['frame'] is None:
+                    pending.wait()
+                frame, latest['frame'] = latest['frame'], None
+
+class StoredFeatures:
+    """Features of one series read from a FeatureStore for a fixed list of dates"""
+
+    def __init__(self, store, series, dates):
+        self.store = store
+        self.series = series
+        self.dates = pd.DatetimeIndex(dates)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, name):
+        return self.store.lookup(self.series, self.dates, [name])[:, 0]
+
+    def matrix(self, columns, dtype=np.float64):
+        return self.store.lookup(self.series, self.dates, columns).astype(dtype, copy=False)
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Materialize features of the processed sales data')
+    parser.add_argument('--data', default=str(ROOT_DIR / 'data' / 'processed_sales_data.csv'))
+    parser.add_argument('--store', default=str(FEATURE_STORE_DIR))
+    parser.add_argument('--series', default=DEFAULT_SERIES)
+    parser.add_argument('--rebuild', action='store_true', help='Drop the stored series first')
+    args = parser.parse_args()
+
+    from ingestion import LiveDataset
+
+    if not Path(args.data).exists():
+        print(f"✗ Data not found: {args.data}")
+        sys.exit(1)
+
+    store = FeatureStore(args.store)
+    if args.rebuild:
+        shutil.rmtree(store._series_dir(args.series), ignore_errors=True)
+
+    # Ingested rows not yet in the CSV are replayed from the append log
+    written = store.materialize(args.series, LiveDataset(args.data).load())
+    manifest = store.manifest(args.series)
+    print(f"✓ {args.series}: {written} new rows, {manifest['rows']} stored "
+          f"({manifest['first_date']} to {manifest['last_date']}, {len(manifest['columns'])} features)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+Feature Registry for Wing Shop
+Every derived feature is declared once here and computed lazily and
+vectorized from the date and sales arrays, so training, backtesting and
+serving build exactly the same inputs
+"""
+
+import re
+import zlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+LAGS = [1, 7, 14, 30]
+WINDOWS = [7, 14, 30]
+HISTORY_DAYS = max(LAGS + WINDOWS)
+
+# ============================================================================
+# DECLARATIONS
+# ============================================================================
+
+# Calendar features: name -> function of a DatetimeIndex
+CALENDAR_FEATURES = {
+    'year': lambda d: d.year.values,
+    'month': lambda d: d.month.values,
+    'day': lambda d: d.day.values,
+    'dayofweek': lambda d: d.dayofweek.values,
+    'quarter': lambda d: d.quarter.values,
+    'is_weekend': lambda d: (d.dayofweek >= 5).astype(int),
+    'day_of_month': lambda d: d.day.values,
+    'is_month_start': lambda d: d.is_month_start.astype(int),
+    'is_month_end': lambda d: d.is_month_end.astype(int),
+    'is_payday': lambda d: ((d.day == 15) | d.is_month_end).astype(int)
+}
+
+# History features are parsed from their name: lag_N, rolling_mean_N, rolling_std_N
+HISTORY_PATTERN = re.compile(r'^(?:sales_)?(lag|rolling_mean|rolling_std)_(\d+)$')
+
+# Exogenous inputs are not derived; serving fills them with these defaults.
+# NaN means no neutral value exists and the last known one is carried
+# forward: a forest trained on real counts never sees 0 transactions
+EXOGENOUS_DEFAULTS = {
+    'onpromotion': np.nan,
+    'transactions': np.nan,
+    'dcoilwtico': np.nan,
+    'is_holiday': 0.0
+}
+
+# Exogenous inputs published ahead of time (the holiday calendar); the
+# others are unknown on forecast days and always take their serving value,
+# in holdouts and backtests too, so those score what serving will see
+SCHEDULED_EXOGENOUS = ['is_holiday']
+
+# Names used by older artifacts (train_random_forest.py, feature_columns.json)
+ALIASES = {
+    'day_of_week': 'dayofweek',
+    'weekday': 'dayofweek',
+    'holiday': 'is_holiday'
+}
+
+CALENDAR_COLUMNS = list(CALENDAR_FEATURES)
+HISTORY_COLUMNS = (
+    [f'sales_lag_{lag}' for lag in LAGS] +
+    [f'sales_rolling_{stat}_{window}' for window in WINDOWS for stat in ('mean', 'std')]
+)
+DERIVED_COLUMNS = CALENDAR_COLUMNS + HISTORY_COLUMNS
+
+def canonical_name(name):
+    """Registry name of a feature, resolving aliases such as lag_1 -> sales_lag_1"""
+    name = ALIASES.get(name, name)
+    match = HISTORY_PATTERN.match(name)
+    if match:
+        return f'sales_{match.group(1)}_{match.group(2)}'
+    if name in CALENDAR_FEATURES or name in EXOGENOUS_DEFAULTS:
+        return name
+    raise KeyError(f"Unknown feature: {name}")
+
+def history_spec(name):
+    """(kind, n) of a history feature, or None for calendar/exogenous features"""
+    match = HISTORY_PATTERN.match(ALIASES.get(name, name))
+    return (match.group(1), int(match.group(2))) if match else None
+
+def is_derived(name):
+    try:
+        return canonical_name(name) not in EXOGENOUS_DEFAULTS
+    except KeyError:
+        return False
+
+# ============================================================================
+# COMPUTATION
+# ============================================================================
+
+def history_series(kind, n, sales):
+    """
+    History feature for every day of a sales series
+
+    Day t only sees sales strictly before t: lag_n is sales[t - n] and the
+    rolling windows cover sales[t - n:t]. next_history_value() is the same
+    definition for the day after the last observation.
+    """
+    sales = pd.Series(np.asarray(sales, dtype=float))
+    if kind == 'lag':
+        return sales.shift(n).values
+    previous = sales.shift(1).rolling(window=n)
+    return (previous.mean() if kind == 'rolling_mean' else previous.std()).values
+
+def next_history_value(kind, n, history):
+    """
+    History feature for the day right after `history` (used recursively)
+
+    A 2-D history is a batch of series (one per row, e.g. simulated paths)
+    and gives one value per row.
+    """
+    history = np.asarray(history, dtype=float)
+    if kind == 'lag':
+        return history[..., -n]
+    window = history[..., -n:]
+    return window.mean(axis=-1) if kind == 'rolling_mean' else window.std(ddof=1, axis=-1)
+
+def data_version(dates, sales):
+    """Cheap fingerprint of a (dates, sales) pair for memoization"""
+    sales = np.ascontiguousarray(sales, dtype=float)
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    edges = (str(dates[0]), str(dates[-1])) if len(dates) else ('', '')
+    return (len(sales),) + edges + (zlib.crc32(sales.tobytes()),)
+
+_CACHE = OrderedDict()
+_CACHE_SIZE = 256
+_CACHE_LOCK = threading.Lock()
+
+class FeatureSet:
+    """
+    Lazily computed features over one daily series
+
+    Columns are computed on first access and memoized per data version, so
+    repeated requests for the same data reuse earlier work and new data
+    (a different version) never sees stale columns.
+
+    Args:
+        dates: Date of every row
+        sales: Sales of every row (NaN/None for future rows)
+        exogenous: Optional dict of exogenous column -> array
+        version: Hashable data version; derived from the arrays if omitted
+    """
+
+    def __init__(self, dates, sales=None, exogenous=None, version=None):
+        self.dates = pd.DatetimeIndex(dates)
+        self.sales = (np.full(len(self.dates), np.nan) if sales is None
+                      else np.asarray(sales, dtype=float))
+        self.exogenous = dict(exogenous or {})
+        if version is None:
+            version = data_version(self.dates, self.sales)
+        self.version = version
+
+    @classmethod
+    def from_frame(cls, frame, version=None):
+        exogenous = {col: frame[col].values for col in EXOGENOUS_DEFAULTS if col in frame.columns}
+        return cls(frame['date'].values, frame['unit_sales'].values, exogenous, version)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, name):
+        name = canonical_name(name)
+        if name in self.exogenous:
+            return np.asarray(self.exogenous[name], dtype=float)
+
+        key = (self.version, name)
+        with _CACHE_LOCK:
+            if key in _CACHE:
+                _CACHE.move_to_end(key)
+                return _CACHE[key]
+
+        values = self._compute(name)
+        # Cached arrays are shared between callers
+        values.setflags(write=False)
+        with _CACHE_LOCK:
+            _CACHE[key] = values
+            if len(_CACHE) > _CACHE_SIZE:
+                _CACHE.popitem(last=False)
+        return values
+
+    def _compute(self, name):
+        if name in CALENDAR_FEATURES:
+            return np.array(CALENDAR_FEATURES[name](self.dates))
+        spec = history_spec(name)
+        if spec is not None:
+            return history_series(spec[0], spec[1], self.sales)
+        return np.full(len(self.dates), EXOGENOUS_DEFAULTS[name], dtype=float)
+
+    def matrix(self, columns, dtype=np.float64):
+        """(n_rows, n_columns) feature matrix in the order of `columns`"""
+        X = np.empty((len(self.dates), len(columns)), dtype=dtype)
+        for j, col in enumerate(columns):
+            X[:, j] = self[col]
+        return X
+
+    def frame(self, columns):
+        return pd.DataFrame({col: self[col] for col in columns}, index=range(len(self.dates)))
+
+def future_exogenous(frame, n_rows):
+    """
+    Exogenous columns for n_rows days after a frame: the serving defaults,
+    except that columns without a neutral default (promotions, transactions,
+    the oil price) carry their last known value forward
+    """
+    exogenous = {}
+    for col, default in EXOGENOUS_DEFAULTS.items():
+        value = default
+        if np.isnan(default) and col in frame.columns and frame[col].notna().any():
+            value = float(frame[col].dropna().iloc[-1])
+        exogenous[col] = np.full(n_rows, value, dtype=float)
+    return exogenous
+
+def future_features(history, dates, columns, calendar=None, scheduled=None):
+    """
+    Feature matrix for forecast days after `history`, built as serving builds it
+
+    Unscheduled exogenous columns come from future_exogenous(), so the real
+    future transactions or oil price are never used even when they exist
+    (holdouts, backtests). History columns are NaN for the recursive
+    forecast to fill.
+
+    Args:
+        history: Daily frame up to the forecast origin
+        dates: Forecast dates
+        columns: Feature columns of the model
+        calendar: Optional exogenous.ExogenousIndex for SCHEDULED_EXOGENOUS
+        scheduled: Optional frame or dict with the SCHEDULED_EXOGENOUS
+            values of the forecast days, used where the calendar has none
+    """
+    exogenous = future_exogenous(history, len(dates))
+    if scheduled is not None:
+        for col in SCHEDULED_EXOGENOUS:
+            if col in scheduled:
+                values = np.asarray(scheduled[col], dtype=float)
+                exogenous[col] = np.where(np.isnan(values), exogenous[col], values)
+    if calendar is not None:
+        exogenous = calendar.fill(exogenous, dates, columns=SCHEDULED_EXOGENOUS)
+    return FeatureSet(dates, exogenous=exogenous).matrix(columns)
+
+def add_features(frame, columns=None, version=None):
+    """
+    Copy of a single-series daily frame with derived columns from the registry
+
+    Derived columns already stored in the frame (e.g. from an older CSV)
+    are recomputed, so every caller sees the registry's definition.
+    """
+    wanted = [c for c in (columns or DERIVED_COLUMNS) if is_derived(c)]
+    if not wanted:
+        return frame
+    features = FeatureSet.from_frame(frame, version)
+    result = frame.copy()
+    for col in wanted:
+        result[col] = features[col]
+    return result
+
+def feature_matrix(frame, columns, version=None):
+    """Feature matrix for `columns` of a single-series daily frame"""
+    return FeatureSet.from_frame(frame, version).matrix(columns)
@@ -0,0 +1,247 @@
+"""
+Forecasting Model Definitions for Wing Shop
+Shared fit/forecast routines used by training, backtesting and ensemble weighting
+"""
+
+import json
+import numpy as np
+import pandas as pd
+
+from features import FeatureSet, future_features, history_spec, next_history_value
+import warnings
+warnings.filterwarnings('ignore')
+
+# ============================================================================
+# MODEL CONFIGURATION
+# ============================================================================
+
+MODEL_NAMES = ['ma', 'exp_smoothing', 'sarima', 'prophet', 'random_forest']
+
+# Same-day transactions and promotions are not known on forecast days, so
+# the forest does not use them
+RF_FEATURE_COLUMNS = ['dayofweek', 'month', 'quarter', 'is_weekend', 'is_payday',
+                      'dcoilwtico', 'is_holiday',
+                      'sales_lag_1', 'sales_lag_7', 'sales_lag_14', 'sales_lag_30',
+                      'sales_rolling_mean_7', 'sales_rolling_mean_14', 'sales_rolling_mean_30']
+
+DEFAULT_PARAMS = {
+    'ma': {'window': 7},
+    'exp_smoothing': {'seasonal_periods': 7, 'trend': 'add', 'seasonal': 'add'},
+    'sarima': {'order': (1, 1, 1), 'seasonal_order': (1, 1, 1, 7)},
+    'prophet': {'changepoint_prior_scale': 0.05, 'country_holidays': 'EC'},
+    'random_forest': {'n_estimators': 100, 'max_depth': 10, 'min_samples_split': 5,
+                      'random_state': 42, 'n_jobs': -1}
+}
+
+def load_tuned_params(path='models/hyperparameters.json'):
+    """Load search winners saved by hyperparameter_search.py, keyed by model name"""
+    try:
+        with open(path, 'r') as f:
+            tuned = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {name: entry['params'] for name, entry in tuned.items() if 'params' in entry}
+
+# ============================================================================
+# FIT / FORECAST
+# ============================================================================
+
+def fit_model(name, frame, params=None, features=None):
+    """
+    Fit one model on a processed daily sales frame
+
+    Args:
+        name: One of MODEL_NAMES
+        frame: DataFrame with 'date', 'unit_sales' and feature columns
+        params: Optional overrides for DEFAULT_PARAMS[name]
+        features: Optional FeatureSet aligned with frame's rows (e.g. from
+            FeatureStore.feature_set()); computed from the frame if omitted
+
+    Returns:
+        The fitted model object (the same object train_and_save_models.py pickles)
+    """
+    config = dict(DEFAULT_PARAMS[name])
+    config.update(params or {})
+    series = frame.set_index('date')['unit_sales']
+    # The daily series has closure-day gaps, so statsmodels gets a positional
+    # index; a gappy date index without a freq cannot be forecast from
+    positional = series.reset_index(drop=True)
+
+    if name == 'ma':
+        window = config['window']
+        return {'window': window, 'last_values': series.tail(window).values}
+
+    if name == 'exp_smoothing':
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+        return ExponentialSmoothing(
+            positional,
+            seasonal_periods=config['seasonal_periods'],
+            trend=config['trend'],
+            seasonal=config['seasonal']
+        ).fit()
+
+    if name == 'sarima':
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+        return SARIMAX(
+            positional,
+            order=tuple(config['order']),
+            seasonal_order=tuple(config['seasonal_order'])
+        ).fit(disp=False, start_params=config.get('start_params'))
+
+    if name == 'prophet':
+        from prophet import Prophet
+        model = Prophet(
+            yearly_seasonality=True,
+            weekly_seasonality=True,
+            daily_seasonality=False,
+            changepoint_prior_scale=config['changepoint_prior_scale']
+        )
+        model.add_country_holidays(country_name=config['country_holidays'])
+        model.fit(frame[['date', 'unit_sales']].rename(columns={'date': 'ds', 'unit_sales': 'y'}))
+        return model
+
+    if name == 'random_forest':
+        feature_cols = config.pop('feature_columns', RF_FEATURE_COLUMNS)
+        # Features come from the registry, the same code serving uses
+        if features is None:
+            features = FeatureSet.from_frame(frame)
+        X = features.matrix(feature_cols)
+        y = frame['unit_sales'].values.astype(float)
+        valid = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+        return fit_random_forest(X[valid], y[valid], config)
+
+    raise ValueError(f"Unknown model: {name}")
+
+def forecast_model(name, model, history, future, feature_cols=None, calendar=None):
+    """
+    Forecast the rows of `future` from a model fitted on `history`
+
+    Args:
+        name: One of MODEL_NAMES
+        model: Fitted model returned by fit_model
+        history: Frame the model was fitted on (used for recursive lags)
+        future: Frame with 'date' for the forecast days; of its exogenous
+            columns only the scheduled ones (holidays) are used, as in serving
+        calendar: Optional exogenous.ExogenousIndex for the scheduled columns
+
+    Returns:
+        NumPy array of predictions, one per row of `future`
+    """
+    steps = len(future)
+
+    if name == 'ma':
+        return np.repeat(float(np.mean(model['last_values'])), steps)
+
+    if name in ('exp_smoothing', 'sarima'):
+        return np.asarray(model.forecast(steps=steps), dtype=float)
+
+    if name == 'prophet':
+        forecast = model.predict(pd.DataFrame({'ds': future['date'].values}))
+        return forecast['yhat'].values
+
+    if name == 'random_forest':
+        feature_cols = feature_cols or RF_FEATURE_COLUMNS
+        return forecast_random_forest(
+            model,
+            history['unit_sales'].values,
+            future_features(history, future['date'].values, feature_cols, calendar, scheduled=future),
+            feature_cols
+        )
+
+    raise ValueError(f"Unknown model: {name}")
+
+def fit_random_forest(X, y, params=None):
+    """Fit the Random Forest on a prebuilt feature matrix"""
+    from sklearn.ensemble import RandomForestRegressor
+    config = dict(DEFAULT_PARAMS['random_forest'])
+    config.update(params or {})
+    config.pop('feature_columns', None)
+    model = RandomForestRegressor(**config)
+    model.fit(X, y)
+    return model
+
+def forecast_random_forest(model, sales_history, future_features, feature_cols, return_features=False,
+                           known_rows=0):
+    """
+    Recursive forecast feeding each prediction back into the lag features
+
+    Args:
+        model: Fitted RandomForestRegressor
+        sales_history: 1-D array of sales up to the forecast origin
+        future_features: (steps, n_features) matrix; exogenous columns are
+            used as-is, lag/rolling columns are overwritten recursively
+        feature_cols: Column names for future_features (registry names or
+            aliases such as lag_1 / rolling_mean_7)
+        return_features: Also return the feature rows the model was given
+        known_rows: Leading rows whose lag/rolling columns are already
+            filled (e.g. from series_state.SeriesState.forecast_inputs())
+            and are used as given
+
+    Returns:
+        NumPy array of predictions, one per row of future_features, or
+        (predictions, features) with return_features
+    """
+    sales = list(np.asarray(sales_history, dtype=float))
+    features = np.array(future_features, dtype=float)
+    predictions = np.zeros(len(features))
+
+    lag_slots = []
+    for j, col in enumerate(feature_cols):
+        spec = history_spec(col)
+        if spec is not None:
+            lag_slots.append((j,) + spec)
+    longest = max((n for _, _, n in lag_slots), default=1)
+
+    for i in range(len(features)):
+        if i >= known_rows:
+            recent = sales[-longest:]
+            for j, kind, n in lag_slots:
+                features[i, j] = next_history_value(kind, n, recent)
+
+        pred = max(0.0, float(model.predict(features[i:i + 1])[0]))
+        predictions[i] = pred
+        sales.append(pred)
+
+    if return_features:
+        return predictions, features
+    return predictions
+
+# ============================================================================
+# ENSEMBLE WEIGHTS
+# ============================================================================
+
+def holdout_errors(frame, holdout_days=28, models=None, params=None):
+    """
+    Fit each model on all but the last `holdout_days` rows and score the holdout
+
+    Returns:
+        Dict of model name -> {'rmse', 'mape'}; models that fail are omitted
+    """
+    train = frame.iloc[:-holdout_days].reset_index(drop=True)
+    test = frame.iloc[-holdout_days:].reset_index(drop=True)
+    actual = test['unit_sales'].values.astype(float)
+
+    errors = {}
+    for name in models or MODEL_NAMES:
+        try:
+            fitted = fit_model(name, train, (params or {}).get(name))
+            predicted = forecast_model(name, fitted, train, test)
+        except Exception as e:
+            print(f"⚠ Holdout for {name} failed: {e}")
+            continue
+
+        nonzero = actual != 0
+        errors[name] = {
+            'rmse': float(np.sqrt(np.mean((actual - predicted) ** 2))),
+            'mape': float(np.mean(np.abs((actual[nonzero] - predicted[nonzero]) / actual[nonzero])) * 100)
+        }
+
+    return errors
+
+def inverse_error_weights(errors):
+    """Ensemble weights proportional to 1 / RMSE², normalized to sum to 1"""
+    inverse = {name: 1.0 / max(e['rmse'], 1e-9) ** 2 for name, e in errors.items()}
+    total = sum(inverse.values())
+    if total == 0:
+        return {}
+    return {name: value / total for name, value in inverse.items()}
@@ -0,0 +1,610 @@
+"""
+Hierarchical Store x Family Forecasting for Wing Shop
+One global Random Forest shared by every store x family series, batched
+recursive inference and bottom-up reconciliation to store, family and
+total forecasts
+"""
+
+import sys
+import time
+import pickle
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from features import CALENDAR_FEATURES, LAGS, WINDOWS, HISTORY_DAYS
+from simulation import DEFAULT_SEED, check_horizon, out_of_bag_predictions, sample_count
+from synthetic import iter_partitions
+
+ROOT_DIR = Path(__file__).parent
+
+# Map actual families to dashboard categories
+CATEGORY_MAPPING = {
+    'GROCERY I': 'Rice',
+    'BEVERAGES': 'Bottled Water',
+    'GROCERY II': 'Cooking Oil',
+    'BREAD/BAKERY': 'Instant Noodles',
+    'PRODUCE': 'Sugar'
+}
+
+CALENDAR_COLUMNS = ['dayofweek', 'month', 'quarter', 'is_weekend', 'is_payday']
+GLOBAL_FEATURE_COLUMNS = (
+    ['store_id', 'family_id'] + CALENDAR_COLUMNS +
+    [f'sales_lag_{lag}' for lag in LAGS] +
+    [f'sales_rolling_mean_{window}' for window in WINDOWS]
+)
+
+GLOBAL_RF_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 12,
+    'min_samples_split': 5,
+    'max_samples': 0.2,
+    'random_state': 42,
+    'n_jobs': -1
+}
+
+# Raw train rows reduced to daily totals at a time
+RAW_CHUNK_ROWS = 5_000_000
+
+# Latest training days per series whose out-of-bag residuals are kept
+# for simulated intervals
+RESIDUAL_DAYS = 56
+
+# Forecasts and simulated paths kept per model, least recently used
+# evicted first
+CACHE_SIZE = 16
+
+# ============================================================================
+# SERIES PANEL
+# ============================================================================
+
+class SeriesPanel:
+    """Dense (series x day) sales matrix for every store x family series"""
+
+    def __init__(self, keys, dates, sales):
+        self.keys = keys.reset_index(drop=True)
+        self.dates = pd.DatetimeIndex(dates)
+        self.sales = np.asarray(sales, dtype=np.float32)
+        self.families = sorted(self.keys['family'].unique().tolist())
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Build from a long frame with date, store_nbr, family and unit_sales"""
+        daily = frame.groupby(['store_nbr', 'family', 'date'])['unit_sales'].sum()
+        wide = daily.unstack('date')
+        # Closed days and series without sales become explicit zeros
+        all_dates = pd.date_range(wide.columns.min(), wide.columns.max(), freq='D')
+        wide = wide.reindex(columns=all_dates).fillna(0).clip(lower=0)
+        return cls(wide.index.to_frame(index=False), all_dates, wide.values)
+
+    @classmethod
+    def from_raw(cls, train, items, chunk_rows=RAW_CHUNK_ROWS):
+        """
+        Build from the raw train.csv and items.csv
+
+        Every block of raw rows is reduced to (store, family, day) totals
+        before anything is pivoted, with the family looked up as an integer
+        category code per item, so memory follows series x days instead of
+        raw rows and no object column is ever built. Items without a family
+        are dropped, as in a left merge followed by a groupby.
+
+        Args:
+            train: Raw train frame, or an iterable of such frames (e.g.
+                synthetic.iter_partitions()) to stream the file
+            items: items.csv frame with item_nbr and family
+            chunk_rows: Rows reduced at a time when `train` is one frame
+        """
+        family = items.drop_duplicates('item_nbr').set_index('item_nbr')['family'].astype('category')
+        order = np.argsort(family.index.values)
+        item_numbers = family.index.values[order]
+        item_codes = family.cat.codes.values[order]
+
+        blocks = train
+        if isinstance(train, pd.DataFrame):
+            blocks = (train.iloc[start:start + chunk_rows] for start in range(0, len(train), chunk_rows))
+
+        totals = []
+        for block in blocks:
+            items_in_block = block['item_nbr'].values
+            pos = np.searchsorted(item_numbers, items_in_block)
+            keep = pos < len(item_numbers)
+            keep[keep] = item_numbers[pos[keep]] == items_in_block[keep]
+            codes = item_codes[pos[keep]]
+            keyed = pd.DataFrame({
+                'store_nbr': block['store_nbr'].values[keep],
+                'family': codes,
+                'date': pd.to_datetime(block['date'].values[keep]).values.astype('datetime64[D]'),
+                'unit_sales': block['unit_sales'].values[keep].astype(np.float64)
+            })
+            totals.append(keyed.groupby(['store_nbr', 'family', 'date'], sort=False)['unit_sales'].sum())
+
+        daily = pd.concat(totals).groupby(level=[0, 1, 2]).sum()
+        series, days = daily.index.droplevel('date'), daily.index.get_level_values('date')
+        # Sorted by store, then category code, i.e. by family name as in from_frame()
+        keys, rows = np.unique(np.column_stack([series.get_level_values(0), series.get_level_values(1)]),
+                               axis=0, return_inverse=True)
+        all_dates = pd.date_range(days.min(), days.max(), freq='D')
+        sales = np.zeros((len(keys), len(all_dates)), dtype=np.float32)
+        sales[rows.ravel(), (days.values - all_dates.values[0]).astype('timedelta64[D]').astype(np.int64)] = daily.values
+        # Closed days and series without sales stay zero
+        np.clip(sales, 0, None, out=sales)
+
+        key_frame = pd.DataFrame({
+            'store_nbr': keys[:, 0],
+            'family': family.cat.categories.values[keys[:, 1]].astype(str)
+        })
+        return cls(key_frame, all_dates, sales)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def series_ids(self):
+        """Numeric store and family identifiers used as model features"""
+        family_index = {family: i for i, family in enumerate(self.families)}
+        store_ids = self.keys['store_nbr'].values.astype(np.float32)
+        family_ids = self.keys['family'].map(family_index).values.astype(np.float32)
+        return store_ids, family_ids
+
+# ============================================================================
+# FEATURES
+# ============================================================================
+
+def calendar_features(dates):
+    """Calendar columns for a date range, one value per date"""
+    dates = pd.DatetimeIndex(dates)
+    return {col: np.asarray(CALENDAR_FEATURES[col](dates)) for col in CALENDAR_COLUMNS}
+
+def history_features(history):
+    """
+    Lag and rolling-mean columns for the day after a (n_series, >= 30) history
+
+    Rolling means cover the days strictly before the target, so training
+    and recursive inference see the same inputs.
+    """
+    columns = {f'sales_lag_{lag}': history[:, -lag] for lag in LAGS}
+    for window in WINDOWS:
+        columns[f'sales_rolling_mean_{window}'] = history[:, -window:].mean(axis=1)
+    return columns
+
+def _chunk_features(panel, rows, feature_cols, calendar, store_ids, family_ids, dtype):
+    """Stacked features and targets for the series in `rows`"""
+    sales = panel.sales[rows]
+    n_series, n_total = sales.shape
+    n_days = n_total - HISTORY_DAYS
+
+    # Prefix sums turn every rolling mean into one subtraction
+    cumsum = np.zeros((n_series, n_total + 1), dtype=np.float64)
+    np.cumsum(sales, axis=1, out=cumsum[:, 1:])
+
+    X = np.empty((n_series, n_days, len(feature_cols)), dtype=dtype)
+    for j, col in enumerate(feature_cols):
+        if col == 'store_id':
+            X[:, :, j] = store_ids[rows, None]
+        elif col == 'family_id':
+            X[:, :, j] = family_ids[rows, None]
+        elif col in calendar:
+            X[:, :, j] = calendar[col][None, :]
+        elif col.startswith('sales_lag_'):
+            lag = int(col.rsplit('_', 1)[1])
+            X[:, :, j] = sales[:, HISTORY_DAYS - lag:n_total - lag]
+        elif col.startswith('sales_rolling_mean_'):
+            window = int(col.rsplit('_', 1)[1])
+            end = cumsum[:, HISTORY_DAYS:n_total]
+            start = cumsum[:, HISTORY_DAYS - window:n_total - window]
+            X[:, :, j] = (end - start) / window
+        else:
+            raise ValueError(f"Unknown global feature: {col}")
+
+    y = sales[:, HISTORY_DAYS:].astype(dtype)
+    return X.reshape(-1, len(feature_cols)), y.reshape(-1)
+
+def iter_training_chunks(panel, feature_cols=None, chunk_series=256, dtype=np.float32):
+    """
+    Yield (X, y) blocks of stacked features, `chunk_series` series at a time
+
+    Only one block is ever materialized, so the full stacked matrix never
+    has to exist as a DataFrame or in float64.
+    """
+    feature_cols = feature_cols or GLOBAL_FEATURE_COLUMNS
+    calendar = calendar_features(panel.dates[HISTORY_DAYS:])
+    store_ids, family_ids = panel.series_ids()
+
+    for start in range(0, len(panel), chunk_series):
+        rows = slice(start, min(start + chunk_series, len(panel)))
+        yield _chunk_features(panel, rows, feature_cols, calendar, store_ids, family_ids, dtype)
+
+def build_training_matrix(panel, feature_cols=None, dtype=np.float32, memmap_dir=None, chunk_series=256):
+    """
+    Stack features for every (series, day) with a full history window
+
+    Args:
+        memmap_dir: When given, blocks are streamed into float32 memory-mapped
+            files in this directory instead of being held in RAM
+
+    Returns:
+        X of shape (n_series * n_days, n_features) and y, both `dtype`
+    """
+    feature_cols = feature_cols or GLOBAL_FEATURE_COLUMNS
+    n_rows = len(panel) * (len(panel.dates) - HISTORY_DAYS)
+    shape = (n_rows, len(feature_cols))
+
+    if memmap_dir is None:
+        X = np.empty(shape, dtype=dtype)
+        y = np.empty(n_rows, dtype=dtype)
+    else:
+        memmap_dir = Path(memmap_dir)
+        memmap_dir.mkdir(parents=True, exist_ok=True)
+        X = np.lib.format.open_memmap(memmap_dir / 'global_X.npy', mode='w+', dtype=dtype, shape=shape)
+        y = np.lib.format.open_memmap(memmap_dir / 'global_y.npy', mode='w+', dtype=dtype, shape=(n_rows,))
+
+    offset = 0
+    for X_chunk, y_chunk in iter_training_chunks(panel, feature_cols, chunk_series, dtype):
+        X[offset:offset + len(X_chunk)] = X_chunk
+        y[offset:offset + len(y_chunk)] = y_chunk
+        offset += len(X_chunk)
+
+    if memmap_dir is not None:
+        X.flush()
+        y.flush()
+    return X, y
+
+def series_residuals(model, X, y, n_series, days=RESIDUAL_DAYS):
+    """
+    Out-of-bag residuals of the last `days` training days of every series
+
+    Args:
+        X, y: Stacked matrix from build_training_matrix(), series-major
+
+    Returns:
+        (n_series, days) float32 array, NaN where every tree saw the row
+    """
+    n_days = len(y) // n_series
+    days = min(days, n_days)
+    rows = (np.arange(n_series)[:, None] * n_days + np.arange(n_days - days, n_days)).ravel()
+    residuals = np.asarray(y[rows], dtype=float) - out_of_bag_predictions(model, X, rows)
+    return residuals.reshape(n_series, days).astype(np.float32)
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unavailable"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 1024 ** 2
+    except ImportError:
+        return None
+
+# ============================================================================
+# GLOBAL MODEL
+# ============================================================================
+
+class HierarchicalForecaster:
+    """Global Random Forest over all series with bottom-up reconciliation"""
+
+    def __init__(self, feature_cols=None):
+        self.feature_cols = list(feature_cols or GLOBAL_FEATURE_COLUMNS)
+        self.model = None
+        self.keys = None
+        self.families = []
+        self.history = None
+        self.residuals = None
+        self.last_date = None
+        self.training_report = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fit(self, panel, params=None, memmap_dir=None):
+        """
+        Fit one Random Forest on the stacked features of every series
+
+        Args:
+            params: Overrides for GLOBAL_RF_PARAMS; `max_samples` bounds the
+                bootstrap sample drawn per tree
+            memmap_dir: Stream the stacked matrix to disk instead of RAM
+        """
+        from sklearn.ensemble import RandomForestRegressor
+        config = dict(GLOBAL_RF_PARAMS)
+        config.update(params or {})
+
+        start = time.perf_counter()
+        X, y = build_training_matrix(panel, self.feature_cols, memmap_dir=memmap_dir)
+        build_seconds = time.perf_counter() - start
+
+        # float32 input is what the trees use internally, so no copy is made
+        start = time.perf_counter()
+        self.model = RandomForestRegressor(**config)
+        self.model.fit(X, y)
+        fit_seconds = time.perf_counter() - start
+        self.residuals = series_residuals(self.model, X, y, len(panel))
+
+        self.training_report = {
+            'rows': int(X.shape[0]),
+            'features': int(X.shape[1]),
+            'matrix_mb': round((X.nbytes + y.nbytes) / 1024 ** 2, 1),
+            'max_samples': config.get('max_samples'),
+            'build_seconds': round(build_seconds, 2),
+            'fit_seconds': round(fit_seconds, 2),
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+        self.keys = panel.keys
+        self.families = panel.families
+        self.history = panel.sales[:, -HISTORY_DAYS:].copy()
+        self.last_date = panel.dates[-1]
+        with self._lock:
+            self._cache.clear()
+        return self
+
+    def forecast(self, horizon=7, batch_size=50000):
+        """
+        Recursive forecast for every series at once
+
+        Each day is one predict call over all series (in row batches of
+        `batch_size`), not one call per series.
+
+        Returns:
+            (dates, forecasts) with forecasts of shape (n_series, horizon)
+        """
+        cached = self._cached(horizon)
+        if cached is not None:
+            return cached
+
+        n_series = len(self.keys)
+        store_ids, family_ids = self._series_ids()
+
+        dates = self._dates(horizon)
+        calendar = calendar_features(dates)
+        history = self.history.astype(np.float32).copy()
+        forecasts = np.zeros((n_series, horizon), dtype=np.float32)
+
+        for h in range(horizon):
+            step = self._predict_step(history, store_ids, family_ids, calendar, h, batch_size)
+            forecasts[:, h] = np.clip(step, 0, None)
+            history = np.concatenate([history[:, 1:], forecasts[:, h:h + 1]], axis=1)
+
+        self._remember(horizon, (dates, forecasts))
+        return dates, forecasts
+
+    def sample_paths(self, horizon=7, store='all', product='all', n_samples=None, seed=DEFAULT_SEED,
+                     batch_size=50000):
+        """
+        Simulated demand paths of one node of the hierarchy
+
+        Every series of the node runs the recursive forecast once per path
+        with a residual bootstrapped from its own out-of-bag residuals
+        added at each step and fed back into its lags. A path draws the
+        same residual day for all of its series, so the summed node keeps
+        the correlation between them. The cost is one prediction per
+        series, path and day: the overall total simulates every series,
+        so the sample count is cut to simulation.MAX_PREDICTIONS and the
+        horizon limited to simulation.MAX_SIMULATED_DAYS.
+
+        Returns:
+            (dates, (n_samples, horizon) array of node totals), or None if
+            the node does not exist
+        """
+        if self.residuals is None:
+            raise ValueError("Global model has no residuals; train it again to simulate")
+        rows = self.node_rows(store, product)
+        if rows is None:
+            return None
+        check_horizon(horizon)
+        n_samples = sample_count(n_samples, len(rows) * horizon)
+        key = ('paths', horizon, tuple(rows.tolist()), n_samples, seed)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        rng = np.random.default_rng(seed)
+        draws = rng.integers(0, self.residuals.shape[1], (n_samples, horizon))
+        store_ids, family_ids = self._series_ids()
+        dates = self._dates(horizon)
+        calendar = calendar_features(dates)
+        totals = np.zeros((n_samples, horizon))
+
+        # Series are simulated a chunk at a time, all paths of a series together
+        chunk = max(1, batch_size // n_samples)
+        for start in range(0, len(rows), chunk):
+            series = rows[start:start + chunk]
+            history = np.repeat(self.history[series].astype(np.float32), n_samples, axis=0)
+            ids = np.repeat(store_ids[series], n_samples), np.repeat(family_ids[series], n_samples)
+            residuals = np.nan_to_num(self.residuals[series])
+            for h in range(horizon):
+                step = self._predict_step(history, *ids, calendar, h, batch_size)
+                step = np.clip(step + residuals[:, draws[:, h]].ravel(), 0, None)
+                totals[:, h] += step.reshape(len(series), n_samples).sum(axis=0)
+                history = np.concatenate([history[:, 1:], step[:, None].astype(np.float32)], axis=1)
+
+        self._remember(key, (dates, totals))
+        return dates, totals
+
+    def _cached(self, key):
+        with self._lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def _series_ids(self):
+        family_index = {family: i for i, family in enumerate(self.families)}
+        store_ids = self.keys['store_nbr'].values.astype(np.float32)
+        family_ids = self.keys['family'].map(family_index).values.astype(np.float32)
+        return store_ids, family_ids
+
+    def _dates(self, horizon):
+        return pd.date_range(self.last_date + timedelta(days=1), periods=horizon, freq='D')
+
+    def _predict_step(self, history, store_ids, family_ids, calendar, h, batch_size):
+        """Predictions for day h of every history row, in row batches of `batch_size`"""
+        columns = history_features(history)
+        X = np.empty((len(history), len(self.feature_cols)), dtype=np.float32)
+        for j, col in enumerate(self.feature_cols):
+            if col == 'store_id':
+                X[:, j] = store_ids
+            elif col == 'family_id':
+                X[:, j] = family_ids
+            elif col in calendar:
+                X[:, j] = calendar[col][h]
+            else:
+                X[:, j] = columns[col]
+
+        return np.concatenate([
+            self.model.predict(X[start:start + batch_size])
+            for start in range(0, len(X), batch_size)
+        ])
+
+    def reconcile(self, horizon=7):
+        """
+        Bottom-up reconciliation: every level is the sum of its series, so
+        series, store, family and total forecasts always add up
+
+        Returns:
+            Dict with 'dates', 'series', 'store', 'family' and 'total'
+        """
+        dates, forecasts = self.forecast(horizon)
+        frame = pd.DataFrame(forecasts)
+
+        return {
+            'dates': dates,
+            'series': forecasts,
+            'store': frame.groupby(self.keys['store_nbr'].values).sum(),
+            'family': frame.groupby(self.keys['family'].values).sum(),
+            'total': forecasts.sum(axis=0)
+        }
+
+    def select(self, horizon=7, store='all', product='all'):
+        """Forecast for one node of the hierarchy, or None if it does not exist"""
+        levels = self.reconcile(horizon)
+        family = self.resolve_family(product)
+
+        if store in (None, 'all') and family is None:
+            values = levels['total']
+        elif store in (None, 'all'):
+            if family not in levels['family'].index:
+                return None
+            values = levels['family'].loc[family].values
+        elif family is None:
+            if int(store) not in levels['store'].index:
+                return None
+            values = levels['store'].loc[int(store)].values
+        else:
+            match = np.flatnonzero(
+                (self.keys['store_nbr'].values == int(store)) & (self.keys['family'].values == family)
+            )
+            if len(match) == 0:
+                return None
+            values = levels['series'][match[0]]
+
+        return levels['dates'], np.asarray(values, dtype=float)
+
+    def node_rows(self, store='all', product='all'):
+        """Rows of the series that make up one node, or None if it has none"""
+        family = self.resolve_family(product)
+        match = np.ones(len(self.keys), dtype=bool)
+        if store not in (None, 'all'):
+            match &= self.keys['store_nbr'].values == int(store)
+        if family is not None:
+            match &= self.keys['family'].values == family
+        rows = np.flatnonzero(match)
+        return rows if len(rows) else None
+
+    def resolve_family(self, product):
+        """Map a family name or dashboard category to a family, None for 'all'"""
+        if product in (None, 'all'):
+            return None
+        for family in self.families:
+            if family.lower() == str(product).lower():
+                return family
+        for family, category in CATEGORY_MAPPING.items():
+            if category.lower() == str(product).lower():
+                return family
+        return product
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump({
+                'model': self.model,
+                'feature_columns': self.feature_cols,
+                'keys': self.keys,
+                'families': self.families,
+                'history': self.history,
+                'residuals': self.residuals,
+                'last_date': self.last_date
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            artifact = pickle.load(f)
+        forecaster = cls(artifact['feature_columns'])
+        forecaster.model = artifact['model']
+        forecaster.keys = artifact['keys']
+        forecaster.families = artifact['families']
+        forecaster.history = artifact['history']
+        # Artifacts saved before simulated intervals have no residuals
+        forecaster.residuals = artifact.get('residuals')
+        forecaster.last_date = artifact['last_date']
+        return forecaster
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def print_training_report(report):
+    print(f"  - Rows: {report['rows']:,} x {report['features']} features ({report['matrix_mb']} MB float32)")
+    print(f"  - max_samples per tree: {report['max_samples']}")
+    print(f"  - Matrix build: {report['build_seconds']}s, fit: {report['fit_seconds']}s")
+    if report['peak_rss_mb'] is not None:
+        print(f"  - Peak RSS: {report['peak_rss_mb']:.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the global store x family Random Forest')
+    parser.add_argument('--train', required=True, help='Raw train.csv or a directory of generated partitions')
+    parser.add_argument('--items', required=True, help='Raw items.csv')
+    parser.add_argument('--output', default=str(ROOT_DIR / 'models' / 'global_random_forest.pkl'))
+    parser.add_argument('--horizon', type=int, default=7)
+    parser.add_argument('--max-samples', type=float, default=GLOBAL_RF_PARAMS['max_samples'],
+                        help='Fraction of rows bootstrapped per tree')
+    parser.add_argument('--memmap-dir', default=None, help='Stream the feature matrix to disk here')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("WING SHOP - HIERARCHICAL STORE x FAMILY FORECASTING")
+    print("="*80)
+
+    train = iter_partitions(args.train, usecols=['date', 'store_nbr', 'item_nbr', 'unit_sales'],
+                            parse_dates=['date'])
+    items = pd.read_csv(args.items, usecols=['item_nbr', 'family'])
+    panel = SeriesPanel.from_raw(train, items)
+    print(f"✓ Panel built: {len(panel)} series x {len(panel.dates)} days")
+
+    forecaster = HierarchicalForecaster().fit(
+        panel, {'max_samples': args.max_samples}, memmap_dir=args.memmap_dir
+    )
+    forecaster.save(args.output)
+    print(f"✓ Global model saved: {args.output}")
+    print_training_report(forecaster.training_report)
+
+    levels = forecaster.reconcile(args.horizon)
+    print(f"\n{args.horizon}-day total forecast: {levels['total'].sum():,.0f}")
+    print(f"Stores: {len(levels['store'])}, families: {len(levels['family'])}")
+
+if __name__ == '__main__':
+    main()
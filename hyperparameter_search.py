@@ -0,0 +1,317 @@
+"""
+Hyperparameter Search for SARIMA and Random Forest
+Successive halving over rolling-origin backtest folds, evaluated in
+parallel worker processes under a wall-clock budget
+"""
+
+import json
+import time
+import argparse
+import itertools
+import warnings
+import multiprocessing
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+
+import backtesting
+from backtesting import FeatureMatrix, load_category_frames, rolling_origin_cutoffs
+from exogenous import EXOGENOUS_FILE, ExogenousIndex
+from feature_store import FEATURE_STORE_DIR, FeatureStore
+from forecast_models import DEFAULT_PARAMS, fit_model, forecast_model, fit_random_forest, forecast_random_forest
+
+ROOT_DIR = Path(__file__).parent
+
+# ============================================================================
+# SEARCH SPACES
+# ============================================================================
+
+SEARCH_SPACES = {
+    'sarima': {
+        'order': [(0, 1, 1), (1, 1, 1), (2, 1, 1), (1, 1, 2), (2, 1, 2)],
+        'seasonal_order': [(0, 1, 1, 7), (1, 1, 1, 7), (1, 0, 1, 7)]
+    },
+    'random_forest': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [6, 10, 16, None],
+        'min_samples_split': [2, 5, 10],
+        'max_features': [1.0, 0.5]
+    }
+}
+
+def expand_candidates(model_name):
+    """All parameter combinations in the search space of a model"""
+    space = SEARCH_SPACES[model_name]
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+def group_candidates(model_name, candidates):
+    """
+    Group candidates that can share fitted state within one task
+
+    Random Forest candidates differing only in n_estimators share one
+    warm-started forest, so the smaller forests come for free.
+    """
+    if model_name != 'random_forest':
+        return [[c] for c in candidates]
+
+    groups = {}
+    for candidate in candidates:
+        key = tuple(sorted(((k, v) for k, v in candidate.items() if k != 'n_estimators'), key=str))
+        groups.setdefault(key, []).append(candidate)
+    return [sorted(g, key=lambda c: c['n_estimators']) for g in groups.values()]
+
+def candidate_id(candidate):
+    return json.dumps(candidate, sort_keys=True)
+
+# ============================================================================
+# WORKER TASKS
+# ============================================================================
+
+def _fold_mse(actual, predicted):
+    return float(np.mean((np.asarray(actual) - np.asarray(predicted)) ** 2))
+
+def _evaluate_group(model_name, category, group, cutoffs, horizon):
+    """
+    Score a candidate group on several folds inside one worker
+
+    Returns:
+        List of (candidate_id, cutoff, mse) tuples
+    """
+    matrix = backtesting._WORKER_MATRICES[category]
+    scores = []
+
+    if model_name == 'random_forest':
+        for cutoff in cutoffs:
+            train = matrix.valid[:cutoff]
+            X, y = matrix.X[:cutoff][train], matrix.sales[:cutoff][train]
+            future = matrix.future(cutoff, horizon)
+            model = None
+            for candidate in group:
+                if model is None:
+                    params = dict(candidate, warm_start=True, n_jobs=1)
+                    model = fit_random_forest(X, y, params)
+                else:
+                    # Grow the existing forest instead of refitting from scratch
+                    model.set_params(n_estimators=candidate['n_estimators'])
+                    model.fit(X, y)
+                predicted = forecast_random_forest(
+                    model, matrix.sales[:cutoff], future, matrix.feature_cols
+                )
+                actual = matrix.sales[cutoff:cutoff + horizon]
+                scores.append((candidate_id(candidate), cutoff, _fold_mse(actual, predicted)))
+        return scores
+
+    candidate = group[0]
+    start_params = None
+    for cutoff in cutoffs:
+        history = matrix.frame.iloc[:cutoff]
+        future = matrix.frame.iloc[cutoff:cutoff + horizon]
+        try:
+            # Warm-start each fold from the previous fold's estimates
+            with warnings.catch_warnings():
+                # statsmodels re-enables its convergence warnings on import
+                warnings.simplefilter('ignore')
+                model = fit_model(model_name, history, dict(candidate, start_params=start_params))
+            start_params = model.params
+            predicted = forecast_model(model_name, model, history, future)
+            mse = _fold_mse(future['unit_sales'].values, predicted)
+        except Exception:
+            mse = float('inf')
+        scores.append((candidate_id(candidate), cutoff, mse))
+    return scores
+
+# ============================================================================
+# SUCCESSIVE HALVING
+# ============================================================================
+
+def successive_halving(model_name, matrices, category='all', horizon=14, n_folds=12, step=7,
+                       min_folds=2, eta=3, workers=None, time_budget=None, log=None):
+    """
+    Successive halving over backtest folds
+
+    Every candidate is scored on `min_folds` folds, the best 1/eta survive
+    and are scored on eta times as many folds, until one is left or all
+    folds are used. Fold scores are cached, so a survivor is only fitted on
+    the folds it has not seen yet.
+
+    Args:
+        time_budget: Wall-clock seconds; when exceeded, the worker
+            processes are terminated (folds still running are lost) and the
+            best candidate so far wins
+
+    Returns:
+        (winner params, winner RMSE, log entries)
+    """
+    start = time.time()
+    log = log if log is not None else []
+    matrix = matrices[category]
+    # Most recent cutoffs first, so early rungs score on the freshest data
+    all_cutoffs = sorted(rolling_origin_cutoffs(len(matrix), horizon, n_folds, step), reverse=True)
+
+    candidates = {candidate_id(c): c for c in expand_candidates(model_name)}
+    survivors = list(candidates)
+    fold_scores = {cid: {} for cid in candidates}
+    n_rung_folds = min_folds
+    rung = 0
+    out_of_time = False
+
+    # A multiprocessing pool, unlike ProcessPoolExecutor, can kill running workers
+    pool = multiprocessing.Pool(processes=workers, initializer=backtesting._init_worker,
+                                initargs=(matrices,))
+    try:
+        while True:
+            rung_cutoffs = all_cutoffs[:n_rung_folds]
+            groups = group_candidates(model_name, [candidates[cid] for cid in survivors])
+
+            results = []
+            for group in groups:
+                todo = [c for c in rung_cutoffs if c not in fold_scores[candidate_id(group[0])]]
+                if todo:
+                    results.append(pool.apply_async(
+                        _evaluate_group, (model_name, category, group, todo, horizon)))
+
+            for result in results:
+                remaining = None if time_budget is None else max(0.0, time_budget - (time.time() - start))
+                result.wait(remaining)
+                if not result.ready():
+                    out_of_time = True
+                    break
+            # Groups that finished count even when the budget ran out
+            for result in results:
+                if result.ready():
+                    for cid, cutoff, mse in result.get():
+                        fold_scores[cid][cutoff] = mse
+
+            ranked = _rank(survivors, fold_scores)
+            for cid, rmse, folds in ranked:
+                log.append({
+                    'model': model_name,
+                    'rung': rung,
+                    'params': candidates[cid],
+                    'folds': folds,
+                    'rmse': rmse,
+                    'elapsed_s': round(time.time() - start, 2)
+                })
+            print(f"  rung {rung}: {len(survivors)} candidates x {len(rung_cutoffs)} folds, "
+                  f"best RMSE={ranked[0][1]:.1f} ({time.time() - start:.0f}s)")
+
+            if out_of_time:
+                print(f"⚠ Time budget of {time_budget:.0f}s reached, stopping at rung {rung}")
+                break
+            if len(survivors) <= 1 or n_rung_folds >= len(all_cutoffs):
+                break
+
+            survivors = [cid for cid, _, _ in ranked[:max(1, len(ranked) // eta)]]
+            n_rung_folds = min(len(all_cutoffs), n_rung_folds * eta)
+            rung += 1
+    finally:
+        # Every submitted fold has finished unless the budget ran out (or a
+        # fold failed); whatever is still running is killed, not awaited
+        pool.terminate()
+        pool.join()
+
+    best_cid, best_rmse, _ = ranked[0]
+    return candidates[best_cid], best_rmse, log
+
+def _rank(survivors, fold_scores):
+    """
+    Rank candidates by RMSE, preferring those scored on the most folds
+    (folds cut short by the time budget leave some candidates behind)
+    """
+    ranked = []
+    for cid in survivors:
+        scores = list(fold_scores[cid].values())
+        rmse = float(np.sqrt(np.mean(scores))) if scores else float('inf')
+        ranked.append((cid, rmse, len(scores)))
+    return sorted(ranked, key=lambda r: (-r[2], r[1]))
+
+# ============================================================================
+# PERSISTENCE
+# ============================================================================
+
+def save_search_results(winners, log, models_dir=None):
+    """Persist the winning parameters and the full search log"""
+    models_dir = Path(models_dir or ROOT_DIR / 'models')
+    models_dir.mkdir(exist_ok=True)
+
+    params_path = models_dir / 'hyperparameters.json'
+    tuned = {}
+    if params_path.exists():
+        with open(params_path, 'r') as f:
+            tuned = json.load(f)
+    tuned.update(winners)
+    with open(params_path, 'w') as f:
+        json.dump(tuned, f, indent=2)
+
+    log_path = models_dir / 'search_log.json'
+    with open(log_path, 'w') as f:
+        json.dump(log, f, indent=2, default=str)
+
+    return params_path, log_path
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Successive-halving search for SARIMA and Random Forest')
+    parser.add_argument('--models', nargs='+', default=['sarima', 'random_forest'], choices=list(SEARCH_SPACES))
+    parser.add_argument('--data', default=None, help='Processed sales CSV')
+    parser.add_argument('--category', default=None, help='Series to tune on (default: first)')
+    parser.add_argument('--horizon', type=int, default=14)
+    parser.add_argument('--folds', type=int, default=12)
+    parser.add_argument('--step', type=int, default=7)
+    parser.add_argument('--min-folds', type=int, default=2)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='Wall-clock seconds for the whole search')
+    parser.add_argument('--feature-store', default=str(FEATURE_STORE_DIR),
+                        help='Feature store directory')
+    parser.add_argument('--no-feature-store', action='store_true',
+                        help='Compute features in memory instead of reading them from the store')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("WING SHOP - HYPERPARAMETER SEARCH")
+    print("="*80)
+
+    frames = load_category_frames(args.data)
+    category = args.category or next(iter(frames))
+    store = None if args.no_feature_store else FeatureStore(args.feature_store)
+    data_path = Path(args.data or backtesting.ROOT_DIR / 'data' / 'processed_sales_data.csv')
+    calendar = ExogenousIndex.shared(data_path.with_name(EXOGENOUS_FILE))
+    matrices = {category: FeatureMatrix(frames[category], store=store, series=category, calendar=calendar)}
+
+    start = time.time()
+    winners = {}
+    log = []
+    for model_name in args.models:
+        budget = None
+        if args.time_budget is not None:
+            # Split what is left of the budget evenly over the remaining models
+            remaining_models = len(args.models) - len(winners)
+            budget = max(0.0, args.time_budget - (time.time() - start)) / remaining_models
+
+        print(f"\nSearching {model_name} ({len(expand_candidates(model_name))} candidates)...")
+        params, rmse, log = successive_halving(
+            model_name, matrices, category, args.horizon, args.folds, args.step,
+            args.min_folds, args.eta, args.workers, budget, log
+        )
+        winners[model_name] = {
+            'params': params,
+            'rmse': rmse,
+            'default_params': {k: DEFAULT_PARAMS[model_name][k] for k in params if k in DEFAULT_PARAMS[model_name]},
+            'category': category,
+            'searched_at': datetime.now().isoformat()
+        }
+        print(f"✓ {model_name} winner: {params} (RMSE={rmse:.1f})")
+
+    params_path, log_path = save_search_results(winners, log)
+    print(f"\n✓ Winners saved: {params_path}")
+    print(f"✓ Search log saved: {log_path}")
+    print("Retrain with: python train_and_save_models.py")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,446 @@
+"""
+Incremental Data Ingestion for Wing Shop
+Appends new daily sales rows to the running service: only the tail of the
+lag/rolling features is recomputed, every batch goes to a write-ahead log
+first, and readers keep using the previous frame until the new one is
+swapped in
+"""
+
+import os
+import sys
+import json
+import pickle
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from exogenous import EXOGENOUS_FILE, ExogenousIndex
+from features import DERIVED_COLUMNS, HISTORY_DAYS, FeatureSet
+from schema import compact_frame, shared_sales_frame
+
+ROOT_DIR = Path(__file__).parent
+
+# Exogenous columns a batch may carry, with the value used when it does not
+EXOGENOUS_DEFAULTS = {
+    'onpromotion': 0,
+    'transactions': None,  # carried forward, like the price: 0 is not a real count
+    'dcoilwtico': None,  # carried forward from the last known price
+    'is_holiday': 0.0
+}
+
+# ============================================================================
+# FEATURES
+# ============================================================================
+
+def normalize_rows(records, last_row=None, calendar=None):
+    """
+    Validate an ingested batch and fill its exogenous columns
+
+    Args:
+        records: List of dicts or DataFrame with at least 'date' and 'unit_sales'
+        last_row: Last row of the current frame, used for carried-forward values
+        calendar: Optional exogenous.ExogenousIndex; values it knows fill
+            missing ones before the defaults apply
+
+    Returns:
+        DataFrame sorted by date
+
+    Raises:
+        ValueError: Missing columns, null or unparseable dates, non-numeric
+            unit_sales or duplicate dates
+    """
+    rows = pd.DataFrame(records).copy()
+    if rows.empty:
+        raise ValueError("No rows to ingest")
+    missing = {'date', 'unit_sales'} - set(rows.columns)
+    if missing:
+        raise ValueError(f"Rows are missing columns: {sorted(missing)}")
+
+    rows['date'] = pd.to_datetime(rows['date'], errors='coerce').dt.normalize()
+    if rows['date'].isna().any():
+        raise ValueError("Rows contain missing or unparseable dates")
+    rows['unit_sales'] = pd.to_numeric(rows['unit_sales'], errors='coerce')
+    if not np.isfinite(rows['unit_sales'].values.astype(np.float64)).all():
+        raise ValueError("Rows contain missing or non-numeric unit_sales")
+    rows['unit_sales'] = rows['unit_sales'].clip(lower=0)
+    rows = rows.sort_values('date').reset_index(drop=True)
+
+    if rows['date'].duplicated().any():
+        raise ValueError("Rows contain duplicate dates")
+
+    for col, default in EXOGENOUS_DEFAULTS.items():
+        if col not in rows.columns:
+            rows[col] = np.nan
+    if calendar is not None:
+        known = calendar.columns(rows['date'])
+        for col, values in known.items():
+            rows[col] = rows[col].fillna(pd.Series(values, index=rows.index))
+
+    for col, default in EXOGENOUS_DEFAULTS.items():
+        if default is None:
+            carried = last_row[col] if last_row is not None and col in last_row else np.nan
+            rows[col] = rows[col].ffill().fillna(carried)
+        else:
+            rows[col] = rows[col].fillna(default)
+
+    return rows
+
+def extend_frame(frame, rows):
+    """
+    Append normalized rows to a processed frame
+
+    Lag and rolling features of the new rows only depend on the last
+    HISTORY_DAYS rows, so they are computed on that tail and nothing
+    already in the frame is recomputed.
+    """
+    # A compact frame keeps no derived columns; an expanded one gets them
+    # from the registry over the tail plus the new rows
+    derived = [c for c in frame.columns if c in DERIVED_COLUMNS]
+    if derived:
+        tail = pd.concat([frame[['date', 'unit_sales']].iloc[-HISTORY_DAYS:], rows[['date', 'unit_sales']]],
+                         ignore_index=True)
+        features = FeatureSet.from_frame(tail)
+        for col in derived:
+            rows[col] = features[col][-len(rows):]
+
+    columns = list(frame.columns) + [c for c in rows.columns
+                                     if c not in frame.columns and c not in DERIVED_COLUMNS]
+    rows = compact_frame(rows.reindex(columns=columns))
+    return pd.concat([frame, rows], ignore_index=True)
+
+# ============================================================================
+# WRITE-AHEAD LOG
+# ============================================================================
+
+class AppendLog:
+    """
+    JSON-lines log of ingested batches
+
+    Each line is {"seq", "ingested_at", "rows"}. A batch is fsynced before
+    it is applied in memory, so a crash never loses an acknowledged batch;
+    a torn last line from a crash mid-write is ignored on replay. The log
+    is the source of sequence numbers: writers take the next one under an
+    exclusive file lock, so the service and the CLI appending to the same
+    log never reuse one. A checkpoint leaves a line without rows that
+    carries the last seq on.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold the log's exclusive lock, shared with other processes, while
+        reading the last seq and appending; yields the handle to append to
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield f
+
+    def append(self, seq, rows, handle):
+        """Write and fsync one batch to a locked() handle; a failed write is cut back off the log"""
+        entry = {
+            'seq': seq,
+            'ingested_at': datetime.now().isoformat(),
+            'rows': json.loads(rows.to_json(orient='records', date_format='iso'))
+        }
+        handle.seek(0, os.SEEK_END)
+        size = handle.tell()
+        try:
+            handle.write(json.dumps(entry) + '\n')
+            handle.flush()
+            os.fsync(handle.fileno())
+        except BaseException:
+            handle.truncate(size)
+            raise
+
+    def last_seq(self):
+        """Seq of the newest logged batch or checkpoint, 0 for an empty log"""
+        seq = 0
+        for entry in self.entries():
+            seq = entry['seq']
+        return seq
+
+    def entries(self, after_seq=0):
+        """Logged batches with seq > after_seq, oldest first"""
+        if not self.path.exists():
+            return
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry['seq'] > after_seq:
+                    yield entry
+
+    def truncate(self, seq, handle):
+        """Empty a locked() log down to a checkpoint line carrying seq"""
+        handle.truncate(0)
+        handle.write(json.dumps({'seq': seq, 'ingested_at': datetime.now().isoformat(), 'rows': []}) + '\n')
+        handle.flush()
+        os.fsync(handle.fileno())
+
+# ============================================================================
+# LIVE DATASET
+# ============================================================================
+
+class LiveDataset:
+    """
+    Processed daily sales frame that accepts appended rows while serving
+
+    Readers take `dataset.frame` without locking; ingest() builds the next
+    frame aside and swaps the reference in one assignment. Writers are
+    serialized by a lock. Restarts load the pickled snapshot (when it is
+    newer than the CSV) and replay the log instead of re-parsing the CSV.
+    Batches another process logged are applied before each ingest.
+    """
+
+    def __init__(self, csv_path, log_path=None, snapshot_path=None):
+        self.csv_path = Path(csv_path)
+        self.log = AppendLog(log_path or self.csv_path.with_name('append_log.jsonl'))
+        self.snapshot_path = Path(snapshot_path or self.csv_path.with_suffix('.snapshot.pkl'))
+        self.frame = None
+        self.seq = 0
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, csv_path):
+        """One dataset per file in the process, so services share one frame"""
+        key = str(Path(csv_path).resolve())
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(csv_path)
+            return cls._instances[key]
+
+    def subscribe(self, callback):
+        """
+        Keep derived state in step with every ingested batch
+
+        callback(frame, new_rows) is called before the batch is logged and
+        builds whatever it derives from the new frame without publishing
+        it; it returns a function that publishes it (or None). Publishing
+        runs after the log write and must not fail, so a batch is logged,
+        applied and acknowledged together or not at all.
+        """
+        self._subscribers.append(callback)
+
+    def load(self):
+        """Load snapshot or CSV, then replay logged batches; returns the frame"""
+        if self.frame is not None:
+            return self.frame
+        self.frame, self.seq = self._read()
+        return self.frame
+
+    def _read(self):
+        """(frame, seq) from the snapshot or CSV plus every logged batch after it"""
+        frame, seq = self._load_snapshot()
+        if frame is None:
+            frame = shared_sales_frame(self.csv_path)
+            seq = 0
+
+        replayed = 0
+        for entry in self.log.entries(after_seq=seq):
+            rows = self._logged_rows(frame, entry)
+            if len(rows):
+                frame = extend_frame(frame, rows)
+                replayed += len(rows)
+            seq = entry['seq']
+
+        if replayed:
+            print(f"✓ Replayed {replayed} ingested rows from {self.log.path}")
+        return frame, seq
+
+    def _logged_rows(self, frame, entry):
+        """
+        Rows of a logged batch that are not in the frame yet
+
+        A regenerated CSV may already hold logged days; those are skipped
+        when their sales match. Any other logged row dated on or before
+        the frame's last day is a conflict, not something to drop.
+
+        Raises:
+            ValueError: The batch overlaps days the frame holds differently
+        """
+        if not entry['rows']:
+            return entry['rows']
+        rows = normalize_rows(entry['rows'], frame.iloc[-1] if len(frame) else None)
+        if not len(frame):
+            return rows
+        overlap = rows['date'] <= frame['date'].iloc[-1]
+        if overlap.any():
+            known = frame.set_index('date')['unit_sales']
+            logged = rows.loc[overlap].set_index('date')['unit_sales']
+            held = known.reindex(logged.index)
+            if held.isna().any() or not np.allclose(held.values, logged.values):
+                raise ValueError(
+                    f"Logged batch {entry['seq']} overlaps days the data holds differently "
+                    f"(through {frame['date'].iloc[-1].strftime('%Y-%m-%d')}); "
+                    f"fix or remove it from {self.log.path}")
+        return rows.loc[~overlap].reset_index(drop=True)
+
+    def _catch_up(self, frame):
+        """
+        Apply batches other processes logged after self.seq
+
+        Subscribers prepare each batch as in ingest(); the publish calls are
+        returned to run once the caller commits. A log checkpointed past
+        self.seq is read again from the snapshot, and subscribers get the
+        rows it adds.
+
+        Returns:
+            (frame, seq, publishers)
+        """
+        entries = list(self.log.entries(after_seq=self.seq))
+        if entries and (entries[0]['seq'] != self.seq + 1 or not entries[0]['rows']):
+            reloaded, seq = self._read()
+            new_rows = reloaded[reloaded['date'] > frame['date'].iloc[-1]] if len(frame) else reloaded
+            publishers = [callback(reloaded, new_rows) for callback in self._subscribers] if len(new_rows) else []
+            return reloaded, seq, publishers
+
+        seq, publishers = self.seq, []
+        for entry in entries:
+            rows = self._logged_rows(frame, entry)
+            if len(rows):
+                frame = extend_frame(frame, rows)
+                new_rows = frame.iloc[-len(rows):]
+                publishers += [callback(frame, new_rows) for callback in self._subscribers]
+            seq = entry['seq']
+        return frame, seq, publishers
+
+    def _load_snapshot(self):
+        try:
+            if self.snapshot_path.stat().st_mtime < self.csv_path.stat().st_mtime:
+                return None, 0
+            with open(self.snapshot_path, 'rb') as f:
+                snapshot = pickle.load(f)
+            return snapshot['frame'], snapshot['seq']
+        except (OSError, pickle.UnpicklingError, KeyError, EOFError):
+            return None, 0
+
+    def ingest(self, records):
+        """
+        Append a batch of new daily rows
+
+        Rows must be dated after the last logged day, including days other
+        processes appended to the same log. Nothing is logged or published
+        unless the rows are valid and every subscriber prepared its update.
+
+        Returns:
+            Dict with the number of rows appended, the new last date and seq
+
+        Raises:
+            ValueError: Invalid rows, or rows dated on or before the last day
+        """
+        with self._lock, self.log.locked() as handle:
+            frame = self.frame if self.frame is not None else self.load()
+            frame, logged_seq, publishers = self._catch_up(frame)
+
+            calendar = ExogenousIndex.shared(self.csv_path.with_name(EXOGENOUS_FILE))
+            rows = normalize_rows(records, frame.iloc[-1] if len(frame) else None, calendar)
+            if len(frame) and rows['date'].iloc[0] <= frame['date'].iloc[-1]:
+                # Batches caught up from the log are still applied
+                self._publish(publishers)
+                self.frame, self.seq = frame, logged_seq
+                raise ValueError(
+                    f"Rows must be dated after {frame['date'].iloc[-1].strftime('%Y-%m-%d')}")
+
+            new_frame = extend_frame(frame, rows)
+            new_rows = new_frame.iloc[-len(rows):]
+            publishers += [callback(new_frame, new_rows) for callback in self._subscribers]
+
+            seq = logged_seq + 1
+            self.log.append(seq, rows, handle)
+            self._publish(publishers)
+            self.frame, self.seq = new_frame, seq
+
+        return {
+            'appended': len(rows),
+            'last_date': new_frame['date'].iloc[-1].strftime('%Y-%m-%d'),
+            'seq': seq
+        }
+
+    @staticmethod
+    def _publish(publishers):
+        for publish in publishers:
+            if publish is not None:
+                publish()
+
+    def checkpoint(self):
+        """Write the current frame, with every logged batch, as the snapshot and empty the log"""
+        with self._lock, self.log.locked() as handle:
+            frame = self.frame if self.frame is not None else self.load()
+            frame, seq, publishers = self._catch_up(frame)
+            self._publish(publishers)
+            self.frame, self.seq = frame, seq
+
+            tmp_path = self.snapshot_path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'frame': frame, 'seq': seq}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+            self.log.truncate(seq, handle)
+        return self.snapshot_path
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Append new daily sales rows')
+    parser.add_argument('rows', nargs='?', help='CSV or JSON file of rows with date and unit_sales')
+    parser.add_argument('--data', default=str(ROOT_DIR / 'data' / 'processed_sales_data.csv'))
+    parser.add_argument('--url', default=None,
+                        help='Post to a running service (e.g. http://localhost:5000) instead of the log')
+    parser.add_argument('--checkpoint', action='store_true',
+                        help='Snapshot the data and empty the append log')
+    args = parser.parse_args()
+
+    dataset = LiveDataset(args.data)
+
+    if args.rows:
+        path = Path(args.rows)
+        if path.suffix == '.json':
+            with open(path, 'r') as f:
+                records = json.load(f)
+            records = records.get('rows', records) if isinstance(records, dict) else records
+        else:
+            records = pd.read_csv(path).to_dict(orient='records')
+
+        if args.url:
+            import urllib.request
+            request = urllib.request.Request(
+                args.url.rstrip('/') + '/api/ingest',
+                data=json.dumps({'rows': records}, default=str).encode('utf-8'),
+                headers={'Content-Type': 'application/json'}
+            )
+            with urllib.request.urlopen(request) as response:
+                print(response.read().decode('utf-8'))
+        else:
+            try:
+                result = dataset.ingest(records)
+            except ValueError as e:
+                print(f"✗ {e}")
+                sys.exit(1)
+            print(f"✓ Appended {result['appended']} rows through {result['last_date']} (seq {result['seq']})")
+
+    if args.checkpoint:
+        print(f"✓ Snapshot written: {dataset.checkpoint()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Replenishment Engine for Wing Shop
+Turns on-hand stock per store and family plus demand forecasts into safety
+stock, reorder points and order quantities for every series in one
+vectorized pass
+"""
+
+import sys
+import argparse
+from statistics import NormalDist
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from hierarchical import CATEGORY_MAPPING
+
+ROOT_DIR = Path(__file__).parent
+INVENTORY_PATH = ROOT_DIR / 'data' / 'inventory.csv'
+
+# Optional inventory columns and the value used when a row leaves them out
+INVENTORY_DEFAULTS = {
+    'on_order': 0.0,
+    'lead_time_days': 3,
+    'review_days': 7,
+    'service_level': 0.95,
+    'pack_size': 1.0,
+    'min_order_qty': 0.0
+}
+
+# Family of the row holding a store's total stock
+ALL_FAMILIES = 'all'
+
+# Recent days used for the spread of daily demand
+SIGMA_WINDOW = 28
+
+PLAN_COLUMNS = [
+    'store_nbr', 'family', 'on_hand', 'on_order', 'inventory_position',
+    'daily_demand', 'lead_time_demand', 'safety_stock', 'reorder_point',
+    'order_up_to', 'order_qty', 'days_of_stock', 'reorder'
+]
+
+# ============================================================================
+# INVENTORY
+# ============================================================================
+
+def family_name(value):
+    """Family of a dashboard category ('Rice' -> 'GROCERY I'); families pass through"""
+    for family, category in CATEGORY_MAPPING.items():
+        if category.lower() == str(value).lower():
+            return family
+    return value
+
+def load_inventory(path=INVENTORY_PATH):
+    """
+    Read on-hand stock per store and family
+
+    The file needs store_nbr, family (or a dashboard category such as
+    'Rice') and on_hand; every other column of INVENTORY_DEFAULTS is
+    optional.
+    """
+    frame = pd.read_csv(path)
+    if 'family' not in frame.columns and 'category' in frame.columns:
+        frame['family'] = frame['category'].map(family_name)
+
+    missing = {'store_nbr', 'family', 'on_hand'} - set(frame.columns)
+    if missing:
+        raise ValueError(f"Inventory is missing columns: {sorted(missing)}")
+
+    for col, default in INVENTORY_DEFAULTS.items():
+        frame[col] = frame[col].fillna(default) if col in frame.columns else default
+
+    if ((frame['service_level'] <= 0) | (frame['service_level'] >= 1)).any():
+        raise ValueError("service_level must be between 0 and 1")
+    if (frame['lead_time_days'] < 0).any() or (frame['review_days'] < 0).any():
+        raise ValueError("lead_time_days and review_days cannot be negative")
+
+    frame = frame.astype({'store_nbr': 'int16', 'lead_time_days': 'int16', 'review_days': 'int16'})
+    return frame.reset_index(drop=True)
+
+_CACHED = {}
+
+def cached_inventory(path=INVENTORY_PATH):
+    """load_inventory() re-read only when the file changes"""
+    path = Path(path)
+    key = (str(path), path.stat().st_mtime_ns)
+    if key not in _CACHED:
+        _CACHED.clear()
+        _CACHED[key] = load_inventory(path)
+    return _CACHED[key]
+
+def store_stock(inventory, store):
+    """
+    The row holding a store's total stock (family 'all'), for forecasts of
+    the whole store
+
+    Family rows are never summed into it: unless they cover every family
+    the store sells, their total would be set against demand for a
+    different scope. Empty when the store has no such row.
+    """
+    rows = inventory[(inventory['store_nbr'] == store) & (inventory['family'].astype(str).str.lower() == ALL_FAMILIES)]
+    if len(rows) > 1:
+        raise ValueError(f"Store {store} has {len(rows)} total stock rows")
+    return rows
+
+# ============================================================================
+# POLICY
+# ============================================================================
+
+def z_scores(service_levels):
+    """Standard normal quantile per service level, computed once per distinct level"""
+    levels, inverse = np.unique(np.asarray(service_levels, dtype=float), return_inverse=True)
+    quantiles = np.array([NormalDist().inv_cdf(level) for level in levels])
+    return quantiles[inverse]
+
+def demand_sigma(history, window=SIGMA_WINDOW):
+    """Standard deviation of daily demand per series over its last `window` days"""
+    history = np.atleast_2d(np.asarray(history, dtype=float))[:, -window:]
+    if history.shape[1] < 2:
+        return np.zeros(history.shape[0])
+    return np.nan_to_num(np.nanstd(history, axis=1, ddof=1))
+
+def required_horizon(inventory):
+    """Forecast days needed to cover the longest lead time plus review period"""
+    return int((inventory['lead_time_days'] + inventory['review_days']).max()) if len(inventory) else 1
+
+def _cumulative(values, days):
+    """values[i, :days[i]].sum() for every row, via one cumulative sum"""
+    padded = np.concatenate([np.zeros((values.shape[0], 1)), np.cumsum(values, axis=1)], axis=1)
+    days = np.minimum(days, values.shape[1])
+    return padded[np.arange(values.shape[0]), days]
+
+def replenishment_plan(inventory, mean, sigma):
+    """
+    Periodic-review order-up-to plan for every inventory row
+
+    Demand over a window of d days is normal with mean equal to the sum of
+    the daily forecasts and variance d * sigma^2. Safety stock covers the
+    lead time plus the review period at the row's service level; an order
+    is placed when the inventory position (on hand + on order) is at or
+    below the reorder point, and brings it up to the order-up-to level,
+    rounded up to whole packs and at least the minimum order.
+
+    Args:
+        inventory: Frame from load_inventory(), one row per series
+        mean: Daily demand forecasts, shape (n_rows, horizon)
+        sigma: Daily demand standard deviation per row, shape (n_rows,)
+
+    Returns:
+        DataFrame with PLAN_COLUMNS
+    """
+    mean = np.atleast_2d(np.asarray(mean, dtype=float))
+    sigma = np.asarray(sigma, dtype=float)
+    if mean.shape[0] != len(inventory):
+        raise ValueError(f"Expected {len(inventory)} forecast rows, got {mean.shape[0]}")
+    if mean.shape[1] < required_horizon(inventory):
+        raise ValueError(f"Forecast horizon must cover {required_horizon(inventory)} days")
+
+    lead = inventory['lead_time_days'].values.astype(int)
+    cover = lead + inventory['review_days'].values.astype(int)
+    z = z_scores(inventory['service_level'].values)
+
+    lead_demand = _cumulative(mean, lead)
+    cover_demand = _cumulative(mean, cover)
+    safety_stock = np.maximum(z * sigma * np.sqrt(cover), 0.0)
+    reorder_point = lead_demand + safety_stock
+    order_up_to = cover_demand + safety_stock
+
+    on_hand = inventory['on_hand'].values.astype(float)
+    position = on_hand + inventory['on_order'].values.astype(float)
+    reorder = position <= reorder_point
+
+    pack = np.maximum(inventory['pack_size'].values.astype(float), 1e-9)
+    shortfall = np.maximum(order_up_to - position, 0.0)
+    order_qty = np.where(
+        reorder,
+        np.maximum(np.ceil(shortfall / pack) * pack, inventory['min_order_qty'].values.astype(float)),
+        0.0
+    )
+
+    daily_demand = mean.mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_stock = np.where(daily_demand > 0, on_hand / daily_demand, np.inf)
+
+    return pd.DataFrame({
+        'store_nbr': inventory['store_nbr'].values,
+        'family': inventory['family'].values,
+        'on_hand': on_hand,
+        'on_order': inventory['on_order'].values.astype(float),
+        'inventory_position': position,
+        'daily_demand': daily_demand,
+        'lead_time_demand': lead_demand,
+        'safety_stock': safety_stock,
+        'reorder_point': reorder_point,
+        'order_up_to': order_up_to,
+        'order_qty': order_qty,
+        'days_of_stock': days_of_stock,
+        'reorder': reorder
+    })
+
+def align_series(inventory, keys):
+    """
+    Row of `keys` (store_nbr, family) matching each inventory row
+
+    Returns:
+        (positions, found) where positions is valid only where found is True
+    """
+    index = pd.MultiIndex.from_arrays([keys['store_nbr'].astype(int).values, keys['family'].astype(str).values])
+    positions = index.get_indexer(pd.MultiIndex.from_arrays(
+        [inventory['store_nbr'].astype(int).values, inventory['family'].astype(str).values]))
+    return positions, positions >= 0
+
+def plan_for_hierarchy(forecaster, inventory):
+    """
+    Plan every inventory row that has a store x family series in the
+    global model
+
+    Returns:
+        (plan, unmatched) where unmatched lists the (store, family) pairs
+        without a forecast
+    """
+    dates, forecasts = forecaster.forecast(horizon=required_horizon(inventory))
+    positions, found = align_series(inventory, forecaster.keys)
+    matched = inventory[found].reset_index(drop=True)
+    plan = replenishment_plan(matched, forecasts[positions[found]], demand_sigma(forecaster.history[positions[found]]))
+    unmatched = inventory.loc[~found, ['store_nbr', 'family']].values.tolist()
+    return plan, unmatched
+
+def plan_records(plan, reorder_only=False):
+    """Plan rows as JSON-ready dicts, most urgent (fewest days of stock) first"""
+    if reorder_only:
+        plan = plan[plan['reorder']]
+    plan = plan.sort_values('days_of_stock')
+    records = []
+    for row in plan.itertuples(index=False):
+        record = {}
+        for col, value in zip(PLAN_COLUMNS, row):
+            if col == 'store_nbr':
+                record[col] = int(value)
+            elif col == 'reorder':
+                record[col] = bool(value)
+            elif col == 'family':
+                record[col] = str(value)
+            else:
+                record[col] = round(float(value), 2) if np.isfinite(value) else None
+        records.append(record)
+    return records
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Reorder plan for every store x family with stock data')
+    parser.add_argument('--inventory', default=str(INVENTORY_PATH))
+    parser.add_argument('--model', default=str(ROOT_DIR / 'models' / 'global_random_forest.pkl'))
+    parser.add_argument('--output', default=None, help='Write the plan to this CSV')
+    args = parser.parse_args()
+
+    from hierarchical import HierarchicalForecaster
+
+    if not Path(args.model).exists():
+        print(f"✗ Global model not found: {args.model}")
+        sys.exit(1)
+
+    inventory = load_inventory(args.inventory)
+    plan, unmatched = plan_for_hierarchy(HierarchicalForecaster.load(args.model), inventory)
+    print(f"✓ Planned {len(plan)} series, {int(plan['reorder'].sum())} need an order")
+    if unmatched:
+        print(f"⚠ No forecast for {len(unmatched)} inventory rows")
+    if args.output:
+        plan.to_csv(args.output, index=False)
+        print(f"✓ Plan written: {args.output}")
+    else:
+        print(plan[plan['reorder']].to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Dashboard KPIs for Wing Shop
+Average sales, period-over-period change, forecast accuracy and next-7-day
+demand for every product and store at once, from the precomputed daily
+rollups and forecasts cached per data and model version
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+
+from aggregations import ALL
+from serialization import to_float_array, records_from_columns
+
+WINDOW_DAYS = 30
+DEMAND_DAYS = 7
+
+KPI_COLUMNS = ['avg_sales', 'prev_avg_sales', 'sales_change', 'volatility', 'mape',
+               'forecast_accuracy', 'next_7day_demand', 'forecast_source']
+
+def daily_matrix(rollups, days):
+    """
+    Daily totals of every rollup key over the last `days` days
+
+    Days a key has no rows count as zero sales (the store was closed or
+    the product did not sell).
+
+    Returns:
+        (keys, dates, values) with values of shape (n_keys, days)
+    """
+    end = rollups.last_period('daily')
+    if end is None:
+        return [], pd.DatetimeIndex([]), np.zeros((0, days))
+
+    dates = pd.date_range(end=end, periods=days, freq='D')
+    keys = rollups.keys()
+    tails = []
+    for product, store in keys:
+        periods, sales = rollups.series_since(dates[0], 'daily', product, store)
+        tails.append(pd.Series(sales, index=pd.DatetimeIndex(periods)))
+
+    long = pd.concat(tails, keys=range(len(keys)))
+    wide = long.unstack(fill_value=0.0).reindex(index=range(len(keys)), columns=dates, fill_value=0.0)
+    return keys, dates, wide.values.astype(np.float64)
+
+class KPIEngine:
+    """
+    Per-(product, store) KPIs recomputed only when the data or model changes
+
+    The sales history part is one vectorized pass over a (keys, 2 x window)
+    matrix of daily totals, memoized per rollups version. Forecast totals
+    come from a callable that is only invoked when the data or model
+    version changes, so repeated requests are answered from memory.
+
+    Args:
+        rollups: aggregations.Rollups over the daily sales
+        window: Days in the current and previous comparison periods
+    """
+
+    def __init__(self, rollups, window=WINDOW_DAYS):
+        self.rollups = rollups
+        self.window = window
+        self._history = None
+        self._forecasts = None
+        self._kpis = None
+        self._lock = threading.Lock()
+
+    def history(self):
+        """Sales KPIs of every key, indexed by (product, store)"""
+        version = self.rollups.version
+        if self._history is not None and self._history[0] == version:
+            return self._history[1]
+
+        keys, _, values = daily_matrix(self.rollups, 2 * self.window)
+        previous, recent = values[:, :self.window], values[:, self.window:]
+        avg_sales = recent.mean(axis=1)
+        prev_avg_sales = previous.mean(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sales_change = np.where(prev_avg_sales > 0,
+                                    (avg_sales - prev_avg_sales) / prev_avg_sales * 100, 0.0)
+            volatility = np.where(avg_sales > 0, recent.std(axis=1, ddof=1) / avg_sales * 100, 0.0)
+
+        history = pd.DataFrame({
+            'avg_sales': avg_sales,
+            'prev_avg_sales': prev_avg_sales,
+            'sales_change': sales_change,
+            'volatility': volatility
+        }, index=pd.MultiIndex.from_tuples(keys, names=['product', 'store']))
+        self._history = (version, history)
+        return history
+
+    def forecast_totals(self, compute, model_version):
+        """
+        Next-DEMAND_DAYS demand per key from compute(), cached until the
+        data or model version changes
+
+        Args:
+            compute: Callable(days) -> {(product, store): total demand}
+            model_version: Hashable id of the model that produced them
+        """
+        key = (self.rollups.version, model_version)
+        if self._forecasts is not None and self._forecasts[0] == key:
+            return self._forecasts[1]
+        totals = compute(DEMAND_DAYS) if compute is not None else {}
+        self._forecasts = (key, totals)
+        return totals
+
+    def kpis(self, compute=None, model_version=None, mape=None):
+        """
+        KPIs of every key in one frame
+
+        Args:
+            compute: Forecast callable for forecast_totals()
+            model_version: Version of the forecasting model
+            mape: Backtest MAPE, either one number or {product: mape};
+                keys without one use their recent volatility instead
+
+        Returns:
+            DataFrame indexed by (product, store) with KPI_COLUMNS
+        """
+        with self._lock:
+            mape_key = tuple(sorted(mape.items())) if isinstance(mape, dict) else mape
+            cache_key = (self.rollups.version, model_version, mape_key)
+            if self._kpis is not None and self._kpis[0] == cache_key:
+                return self._kpis[1]
+
+            kpis = self.history().copy()
+            products = kpis.index.get_level_values('product')
+
+            if isinstance(mape, dict):
+                fallback = mape.get(ALL, np.nan)
+                backtest = np.array([mape.get(p, fallback) for p in products], dtype=float)
+            else:
+                backtest = np.full(len(kpis), np.nan if mape is None else mape, dtype=float)
+            kpis['mape'] = np.where(np.isnan(backtest), kpis['volatility'].values, backtest)
+            kpis['forecast_accuracy'] = np.maximum(0.0, 100 - kpis['mape'].values)
+
+            totals = self.forecast_totals(compute, model_version)
+            forecast = np.array([totals.get(key, np.nan) for key in kpis.index], dtype=float)
+            has_forecast = ~np.isnan(forecast)
+            kpis['next_7day_demand'] = np.where(has_forecast, forecast, kpis['avg_sales'].values * DEMAND_DAYS)
+            kpis['forecast_source'] = np.where(has_forecast, 'model', 'average')
+
+            self._kpis = (cache_key, kpis)
+            return kpis
+
+    def lookup(self, product=ALL, store=ALL, **kwargs):
+        """KPIs of one key as a dict, or None if the key has no sales"""
+        kpis = self.kpis(**kwargs)
+        key = (str(product), str(store))
+        if key not in kpis.index:
+            return None
+        return kpi_record(kpis.loc[key])
+
+def kpi_record(row):
+    return {col: (str(row[col]) if col == 'forecast_source' else float(row[col])) for col in KPI_COLUMNS}
+
+def kpi_records(kpis):
+    """Every key's KPIs as JSON-ready dicts, built column by column"""
+    columns = {
+        'product': kpis.index.get_level_values('product').tolist(),
+        'store': kpis.index.get_level_values('store').tolist()
+    }
+    for col in KPI_COLUMNS:
+        if col == 'forecast_source':
+            columns[col] = kpis[col].tolist()
+        else:
+            columns[col] = to_float_array(kpis[col].values, decimals=2)
+    return records_from_columns(columns)
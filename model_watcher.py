@@ -0,0 +1,168 @@
+"""
+Hot Reload of Model Artifacts for Wing Shop
+Watches models/ for newly trained artifacts, loads and validates them in
+the background and swaps the active model version without a restart
+"""
+
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+
+ARTIFACT_PATTERNS = ['*.pkl', '*.joblib', '*.json']
+
+# Written by the watcher's own processes or by searches, not by training
+IGNORED_ARTIFACTS = {'search_log.json'}
+
+def artifact_paths(models_dir):
+    models_dir = Path(models_dir)
+    paths = set()
+    for pattern in ARTIFACT_PATTERNS:
+        paths.update(p for p in models_dir.glob(pattern) if p.name not in IGNORED_ARTIFACTS)
+    return sorted(paths)
+
+def stat_signature(models_dir):
+    """Cheap change detector: names, sizes and mtimes of every artifact"""
+    return tuple((p.name, s.st_size, s.st_mtime_ns) for p in artifact_paths(models_dir)
+                 for s in [p.stat()])
+
+def content_checksum(models_dir):
+    """SHA-256 over the contents of every artifact"""
+    digest = hashlib.sha256()
+    for path in artifact_paths(models_dir):
+        digest.update(path.name.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def training_date(models_dir):
+    """last_training_date from metadata.json, or None"""
+    try:
+        with open(Path(models_dir) / 'metadata.json', 'r') as f:
+            return json.load(f).get('last_training_date')
+    except (OSError, ValueError):
+        return None
+
+class ModelWatcher:
+    """
+    Polls a models directory and hot-swaps validated artifacts
+
+    A change is noticed from file sizes/mtimes and must hold still for
+    `settle` seconds (training writes artifacts one by one). The content
+    checksum then decides whether anything really changed. The candidate
+    is loaded and validated off the request path; only a candidate that
+    passes `validate` is handed to `swap`, so a broken training run never
+    replaces a working model. Requests that already hold the old objects
+    finish on them.
+
+    Nothing is hashed or started until start() (or the first read of
+    `version`), so constructing a watcher at import time is free.
+
+    Args:
+        models_dir: Directory of trained artifacts
+        load: Callable returning a candidate model version
+        validate: Callable raising if the candidate cannot predict
+        swap: Callable(candidate, version) installing the candidate
+        interval: Seconds between polls
+        settle: Seconds the artifacts must be unchanged before loading
+    """
+
+    def __init__(self, models_dir, load, validate, swap, interval=30.0, settle=2.0):
+        self.models_dir = Path(models_dir)
+        self.load = load
+        self.validate = validate
+        self.swap = swap
+        self.interval = interval
+        self.settle = settle
+        self._version = None
+        self._signature = None
+        self._rejected = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    def _describe(self, checksum=None):
+        return {
+            'last_training_date': training_date(self.models_dir),
+            'checksum': checksum or content_checksum(self.models_dir),
+            'loaded_at': datetime.now().isoformat()
+        }
+
+    def _baseline(self):
+        """Describe the artifacts already loaded, once"""
+        if self._version is None:
+            with self._start_lock:
+                if self._version is None:
+                    self._signature = stat_signature(self.models_dir)
+                    self._version = self._describe()
+
+    @property
+    def version(self):
+        """Training date, checksum and load time of the active artifacts"""
+        self._baseline()
+        return self._version
+
+    def poll(self):
+        """
+        Check once for new artifacts
+
+        Returns:
+            True if a new version was swapped in
+        """
+        self._baseline()
+        with self._lock:
+            signature = stat_signature(self.models_dir)
+            if signature == self._signature:
+                return False
+
+            time.sleep(self.settle)
+            if stat_signature(self.models_dir) != signature:
+                return False  # still being written, try on the next poll
+
+            checksum = content_checksum(self.models_dir)
+            self._signature = signature
+            if checksum in (self.version['checksum'], self._rejected):
+                return False
+
+            try:
+                candidate = self.load()
+                self.validate(candidate)
+            except Exception as e:
+                self._rejected = checksum
+                print(f"⚠ New model artifacts rejected, keeping {self.version['last_training_date']}: {e}")
+                return False
+
+            version = self._describe(checksum)
+            self.swap(candidate, version)
+            self._version = version
+            print(f"✓ Swapped in models trained {version['last_training_date']} ({checksum[:12]})")
+            return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"⚠ Model watcher error: {e}")
+
+    def start(self):
+        """
+        Poll in a daemon thread; a non-positive interval disables watching
+
+        Safe to call on every request: only the first call does any work.
+        """
+        if self._thread is not None or self.interval <= 0:
+            return self
+        self._baseline()
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
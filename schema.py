@@ -0,0 +1,146 @@
+"""
+Compact Schema for the Wing Shop Sales Frame
+Loads processed sales data with minimal dtypes, leaves out the columns
+that can be recomputed from date and unit_sales, and shares one frame per
+file within a process
+"""
+
+import sys
+import argparse
+import threading
+from pathlib import Path
+import pandas as pd
+
+from features import DERIVED_COLUMNS, HISTORY_COLUMNS, add_features
+from features import CALENDAR_COLUMNS as DERIVED_CALENDAR_COLUMNS
+
+ROOT_DIR = Path(__file__).parent
+
+# ============================================================================
+# SCHEMA
+# ============================================================================
+
+FLAG_COLUMNS = ['is_holiday', 'is_weekend', 'is_month_start', 'is_month_end', 'is_payday']
+CALENDAR_COLUMNS = [c for c in DERIVED_CALENDAR_COLUMNS if c not in FLAG_COLUMNS]
+MEASURE_COLUMNS = ['unit_sales', 'transactions', 'dcoilwtico']
+CATEGORICAL_COLUMNS = ['family', 'product', 'category', 'product_name', 'city', 'state', 'type']
+
+SALES_SCHEMA = {
+    **{col: 'int8' for col in FLAG_COLUMNS},
+    **{col: 'int16' for col in CALENDAR_COLUMNS},
+    **{col: 'float32' for col in MEASURE_COLUMNS + HISTORY_COLUMNS},
+    **{col: 'category' for col in CATEGORICAL_COLUMNS},
+    'onpromotion': 'int32',
+    'store_nbr': 'int16',
+    'item_nbr': 'int32'
+}
+
+def compact_frame(frame, drop_derived=False):
+    """
+    Cast a sales frame to SALES_SCHEMA
+
+    Integer columns that contain gaps are left as float32, since int8/int16
+    cannot hold NaN. Columns outside the schema are kept as they are.
+    """
+    if drop_derived:
+        frame = frame.drop(columns=[c for c in DERIVED_COLUMNS if c in frame.columns])
+
+    dtypes = {}
+    for col, dtype in SALES_SCHEMA.items():
+        if col not in frame.columns or str(frame[col].dtype) == dtype:
+            continue
+        if dtype.startswith('int') and frame[col].isna().any():
+            dtype = 'float32'
+        dtypes[col] = dtype
+    return frame.astype(dtypes) if dtypes else frame
+
+# ============================================================================
+# DERIVED COLUMNS
+# ============================================================================
+
+def with_derived(frame, columns=None):
+    """
+    Copy of a compact frame with derived columns recomputed by the feature
+    registry
+
+    Args:
+        frame: Single-series daily frame sorted by date
+        columns: Derived columns wanted (default: all of DERIVED_COLUMNS)
+    """
+    wanted = [c for c in (columns or DERIVED_COLUMNS) if c in DERIVED_COLUMNS and c not in frame.columns]
+    if not wanted:
+        return frame
+    return compact_frame(add_features(frame, wanted))
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+def load_sales_frame(path, drop_derived=True):
+    """Read a sales CSV straight into the compact schema"""
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for c in header if not (drop_derived and c in DERIVED_COLUMNS)]
+    dtypes = {c: SALES_SCHEMA[c] for c in usecols
+              if c in SALES_SCHEMA and SALES_SCHEMA[c] in ('float32', 'category')}
+    frame = pd.read_csv(path, usecols=usecols, dtype=dtypes,
+                        parse_dates=['date'] if 'date' in usecols else False)
+    return compact_frame(frame)
+
+_SHARED_FRAMES = {}
+_SHARED_LOCK = threading.Lock()
+
+def shared_sales_frame(path, drop_derived=True):
+    """
+    One compact frame per file and modification time, shared by every
+    caller in the process (the dashboard and DataProcessor used to each
+    hold their own copy)
+    """
+    path = Path(path).resolve()
+    key = (str(path), path.stat().st_mtime_ns, drop_derived)
+    with _SHARED_LOCK:
+        if key not in _SHARED_FRAMES:
+            for stale in [k for k in _SHARED_FRAMES if k[0] == key[0] and k[2] == drop_derived]:
+                del _SHARED_FRAMES[stale]
+            _SHARED_FRAMES[key] = load_sales_frame(path, drop_derived)
+        return _SHARED_FRAMES[key]
+
+# ============================================================================
+# MEMORY REPORT
+# ============================================================================
+
+def memory_report(frame):
+    """Bytes per column, largest first, plus the total"""
+    usage = frame.memory_usage(deep=True, index=False)
+    rows = [{'column': col, 'dtype': str(frame[col].dtype), 'bytes': int(usage[col])}
+            for col in frame.columns]
+    rows.sort(key=lambda r: r['bytes'], reverse=True)
+    return {'columns': rows, 'total_bytes': int(usage.sum()), 'rows': len(frame)}
+
+def print_memory_report(report, baseline=None):
+    baseline_bytes = {r['column']: r['bytes'] for r in (baseline or {}).get('columns', [])}
+    print(f"{'column':<24} {'dtype':<10} {'bytes':>10} {'before':>10}")
+    for row in report['columns']:
+        before = baseline_bytes.get(row['column'])
+        print(f"{row['column']:<24} {row['dtype']:<10} {row['bytes']:>10,} "
+              f"{before if before is None else format(before, ','):>10}")
+    print(f"{'total':<24} {'':<10} {report['total_bytes']:>10,} "
+          f"{format(baseline['total_bytes'], ',') if baseline else '':>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Bytes per column of the compact sales frame')
+    parser.add_argument('path', nargs='?', default=str(ROOT_DIR / 'data' / 'processed_sales_data.csv'))
+    parser.add_argument('--keep-derived', action='store_true',
+                        help='Keep calendar/lag/rolling columns instead of recomputing them')
+    args = parser.parse_args()
+
+    if not Path(args.path).exists():
+        print(f"✗ {args.path} not found")
+        sys.exit(1)
+
+    baseline = memory_report(pd.read_csv(args.path, parse_dates=['date']))
+    report = memory_report(load_sales_frame(args.path, drop_derived=not args.keep_derived))
+    print_memory_report(report, baseline)
+    print(f"\n✓ {report['total_bytes'] / baseline['total_bytes']:.1%} of the default pandas load")
+
+if __name__ == '__main__':
+    main()
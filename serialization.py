@@ -0,0 +1,240 @@
+"""
+Fast Serialization for Wing Shop API Payloads
+Converts date and value columns straight from NumPy arrays, uses orjson
+when it is installed, and negotiates compact binary encodings (packed
+float32, Arrow IPC) and gzip/brotli compression for JSON
+"""
+
+import gzip
+import json
+import struct
+import importlib.util
+from datetime import date, datetime
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MIMETYPE = 'application/json'
+PACKED_MIMETYPE = 'application/x-wingshop-float32'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+PACKED_MAGIC = b'WSF1'
+PACKED_HEADER = struct.Struct('<4siIHH')
+# Header flag: explicit int32 day offsets precede the columns
+PACKED_SPARSE = 1
+
+# Compressing tiny bodies costs more than it saves
+MIN_COMPRESS_BYTES = 1024
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+# ============================================================================
+# COLUMN CONVERSION
+# ============================================================================
+
+def format_dates(values):
+    """
+    Format a date column as 'YYYY-MM-DD' strings in one vectorized call
+
+    Accepts a pandas Series/DatetimeIndex or any datetime64 array-like.
+    """
+    days = np.asarray(values, dtype='datetime64[ns]').astype('datetime64[D]')
+    return np.datetime_as_string(days).tolist()
+
+def to_float_array(values, decimals=None):
+    """Value column as a contiguous float64 array, optionally rounded"""
+    array = np.ascontiguousarray(values, dtype=np.float64)
+    if decimals is not None:
+        array = np.round(array, decimals)
+    return array
+
+def to_float_list(values, decimals=None):
+    """Value column as a list of Python floats, converted in C rather than per element"""
+    return to_float_array(values, decimals).tolist()
+
+def records_from_columns(columns):
+    """
+    Row-oriented list of dicts from equal-length columns
+
+    Only used for the 'records' response format; 'columnar' skips this.
+    """
+    names = list(columns)
+    values = [c.tolist() if isinstance(c, np.ndarray) else list(c) for c in columns.values()]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+# ============================================================================
+# ENCODING
+# ============================================================================
+
+def _default(obj):
+    """Fallback for types neither encoder handles natively"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(payload):
+    """
+    Encode a payload to JSON bytes
+
+    With orjson installed, NumPy arrays inside the payload are written
+    directly from their buffers without creating Python floats.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode('utf-8')
+
+def json_response(payload, status=200, headers=None):
+    """
+    Flask response for a payload encoded with dumps(), compressed with
+    brotli or gzip when the client accepts it
+    """
+    from flask import Response, has_request_context, request
+
+    body = dumps(payload)
+    headers = dict(headers or {})
+    if has_request_context():
+        body, encoding = compress(body, request.headers.get('Accept-Encoding', ''))
+        headers['Vary'] = 'Accept, Accept-Encoding'
+        if encoding:
+            headers['Content-Encoding'] = encoding
+
+    return Response(body, status=status, mimetype=JSON_MIMETYPE, headers=headers)
+
+def compress(body, accept_encoding):
+    """
+    Compress a response body for the best encoding the client accepts
+
+    Returns:
+        (body, content encoding or None)
+    """
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+
+    accepted = {token.split(';')[0].strip().lower() for token in accept_encoding.split(',')}
+    if 'br' in accepted and brotli is not None:
+        return brotli.compress(body, quality=5), 'br'
+    if 'gzip' in accepted:
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
+
+# ============================================================================
+# BINARY ENCODINGS
+# ============================================================================
+
+def pack_float32(dates, columns):
+    """
+    Pack date-indexed columns as little-endian float32 with a date origin + count
+
+    Layout: 4-byte magic 'WSF1', int32 origin (days since 1970-01-01),
+    uint32 row count, uint16 column count, uint16 flags, then each column
+    as `count` float32 values. Daily data is dense: row i is origin + i
+    days and days missing from the input are NaN. Sparse dates (downsampled
+    or resampled output) set PACKED_SPARSE and write `count` int32 day
+    offsets from the origin before the columns, so the body stays
+    proportional to the points sent instead of the days they span.
+    """
+    days = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]')
+    if len(days) == 0:
+        return PACKED_HEADER.pack(PACKED_MAGIC, 0, 0, len(columns), 0)
+
+    origin = days.min()
+    offsets = (days - origin).astype(np.int64)
+    span = int(offsets.max()) + 1
+    origin_day = int((origin - _EPOCH).astype(np.int64))
+
+    # Offsets cost one extra column, so they pay off once under half the span is filled
+    if len(offsets) * (len(columns) + 1) < span * len(columns):
+        order = np.argsort(offsets, kind='stable')
+        body = np.empty((len(columns), len(offsets)), dtype='<f4')
+        for i, values in enumerate(columns.values()):
+            body[i] = np.asarray(values, dtype=np.float32)[order]
+        header = PACKED_HEADER.pack(PACKED_MAGIC, origin_day, len(offsets), len(columns), PACKED_SPARSE)
+        return header + offsets[order].astype('<i4').tobytes() + body.tobytes()
+
+    body = np.full((len(columns), span), np.nan, dtype='<f4')
+    for i, values in enumerate(columns.values()):
+        body[i, offsets] = np.asarray(values, dtype=np.float32)
+
+    header = PACKED_HEADER.pack(PACKED_MAGIC, origin_day, span, len(columns), 0)
+    return header + body.tobytes()
+
+def unpack_float32(payload):
+    """Inverse of pack_float32, returning (dates, columns list)"""
+    magic, origin, count, n_columns, flags = PACKED_HEADER.unpack_from(payload)
+    if magic != PACKED_MAGIC:
+        raise ValueError("Not a packed float32 payload")
+    offset = PACKED_HEADER.size
+    if flags & PACKED_SPARSE:
+        days = np.frombuffer(payload, dtype='<i4', count=count, offset=offset)
+        offset += 4 * count
+    else:
+        days = np.arange(count)
+    body = np.frombuffer(payload, dtype='<f4', offset=offset).reshape(n_columns, count)
+    dates = _EPOCH + origin + days
+    return dates, list(body)
+
+def arrow_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+def encode_arrow(dates, columns):
+    """Arrow IPC stream with a date32 column and one float32 column per series"""
+    import pyarrow as pa
+
+    days = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]')
+    arrays = {'date': pa.array(days, type=pa.date32())}
+    for name, values in columns.items():
+        arrays[name] = pa.array(np.asarray(values, dtype=np.float32))
+
+    table = pa.table(arrays)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def available_mimetypes():
+    """Encodings this server can produce, JSON first so '*/*' gets JSON"""
+    mimetypes = [JSON_MIMETYPE, PACKED_MIMETYPE]
+    if arrow_available():
+        mimetypes.append(ARROW_MIMETYPE)
+    return mimetypes
+
+def negotiate_mimetype():
+    """Best encoding for the current request's Accept header"""
+    from flask import request
+    return request.accept_mimetypes.best_match(available_mimetypes(), default=JSON_MIMETYPE)
+
+def binary_response(mimetype, dates, columns, status=200):
+    """
+    Flask response for a date-indexed series in a negotiated binary encoding
+
+    Args:
+        mimetype: PACKED_MIMETYPE or ARROW_MIMETYPE
+        dates: Date column
+        columns: Dict of name -> value column
+    """
+    from flask import Response
+
+    if mimetype == ARROW_MIMETYPE:
+        body = encode_arrow(dates, columns)
+    else:
+        body = pack_float32(dates, columns)
+
+    return Response(body, status=status, mimetype=mimetype, headers={
+        'X-Columns': ','.join(columns),
+        'Vary': 'Accept, Accept-Encoding'
+    })
@@ -0,0 +1,271 @@
+"""
+Latest Series State for Wing Shop
+Per-series snapshot of what a recursive forecast needs (the last
+HISTORY_DAYS sales, running rolling sums and sums of squares, the last
+exogenous values), held in preallocated NumPy arrays indexed by series
+and refreshed incrementally as new days are appended
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+
+from features import (
+    LAGS, WINDOWS, HISTORY_DAYS, HISTORY_COLUMNS, EXOGENOUS_DEFAULTS, SCHEDULED_EXOGENOUS, FeatureSet,
+    canonical_name, history_spec
+)
+
+EXOGENOUS_COLUMNS = list(EXOGENOUS_DEFAULTS)
+STATE_COLUMNS = HISTORY_COLUMNS + EXOGENOUS_COLUMNS
+
+class SeriesState:
+    """
+    Latest state of many daily series, one row per series
+
+    Row r of `values` holds the features of the day after series r's last
+    observation (STATE_COLUMNS: lags, rolling means/stds and the latest
+    exogenous values), so building the first forecast step for any series
+    is one row read. append() updates the window, the running sums and
+    that row in O(HISTORY_DAYS) per series and day, without touching the
+    rest of the history.
+
+    Args:
+        series_ids: Ids of the series, in row order
+        capacity: Rows to preallocate; grows by doubling when exceeded
+    """
+
+    def __init__(self, series_ids=(), capacity=None):
+        series_ids = list(series_ids)
+        capacity = max(capacity or len(series_ids), 1)
+        self.index = {}
+        self.window = np.zeros((capacity, HISTORY_DAYS))
+        self.filled = np.zeros(capacity, dtype=np.int64)
+        self.sums = np.zeros((capacity, len(WINDOWS)))
+        self.sumsq = np.zeros((capacity, len(WINDOWS)))
+        self.exogenous = np.full((capacity, len(EXOGENOUS_COLUMNS)), np.nan)
+        self.last_date = np.full(capacity, np.datetime64('NaT'), dtype='datetime64[D]')
+        self.values = np.full((capacity, len(STATE_COLUMNS)), np.nan)
+        self._lock = threading.RLock()
+        for series in series_ids:
+            self._row(series)
+
+    @classmethod
+    def from_frame(cls, frame, series):
+        """State of one series from a daily frame with date, unit_sales and exogenous columns"""
+        state = cls([series])
+        state.append(series, frame)
+        return state
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, series):
+        return series in self.index
+
+    def _row(self, series):
+        """Row of a series, allocating one (and growing the arrays) if it is new"""
+        row = self.index.get(series)
+        if row is not None:
+            return row
+        row = len(self.index)
+        if row >= len(self.window):
+            self._grow(2 * len(self.window))
+        self.index[series] = row
+        return row
+
+    def _grow(self, capacity):
+        for name in ['window', 'filled', 'sums', 'sumsq', 'exogenous', 'last_date', 'values']:
+            old = getattr(self, name)
+            fill = {'exogenous': np.nan, 'values': np.nan, 'last_date': np.datetime64('NaT')}.get(name, 0)
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    # ------------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------------
+
+    def append(self, series, rows):
+        """
+        Append the days of `rows` dated after the series' last day
+
+        Args:
+            series: Series id (new ids get a row)
+            rows: Frame with date, unit_sales and any exogenous columns
+
+        Returns:
+            Number of days appended
+        """
+        with self._lock:
+            r = self._row(series)
+            dates = pd.to_datetime(rows['date']).values.astype('datetime64[D]')
+            new = np.isnat(self.last_date[r]) | (dates > self.last_date[r]) if len(dates) else dates
+            if not np.any(new):
+                return 0
+            sales = rows['unit_sales'].values.astype(np.float64)[new]
+            for value in sales:
+                self._push(r, value)
+            for k, col in enumerate(EXOGENOUS_COLUMNS):
+                if col in rows.columns:
+                    # Missing values keep the last known one (carried forward)
+                    known = rows[col].values.astype(np.float64)[new]
+                    known = known[~np.isnan(known)]
+                    if len(known):
+                        self.exogenous[r, k] = known[-1]
+            self.last_date[r] = dates[new][-1]
+            self._refresh(r)
+            return len(sales)
+
+    def append_day(self, date, sales, series_ids=None):
+        """
+        Append one day for many series at once (vectorized over series)
+
+        Args:
+            date: The day being appended
+            sales: One value per series in `series_ids` (default: every
+                series, in row order)
+        """
+        with self._lock:
+            rows = (np.arange(len(self.index)) if series_ids is None
+                    else np.array([self._row(s) for s in series_ids], dtype=np.int64))
+            date = np.datetime64(pd.Timestamp(date), 'D')
+            # Series already at (or past) the date keep their state
+            new = np.isnat(self.last_date[rows]) | (self.last_date[rows] < date)
+            if not new.any():
+                return 0
+            rows, sales = rows[new], np.asarray(sales, dtype=np.float64)[new]
+            self._push(rows, sales)
+            self.last_date[rows] = date
+            self._refresh(rows)
+            return len(rows)
+
+    def _push(self, rows, values):
+        """Shift `values` into the window and update the running sums"""
+        for k, window in enumerate(WINDOWS):
+            # Slots never filled are zeros, so dropping them subtracts nothing
+            dropped = self.window[rows, -window]
+            self.sums[rows, k] += values - dropped
+            self.sumsq[rows, k] += values * values - dropped * dropped
+        self.window[rows, :-1] = self.window[rows, 1:]
+        self.window[rows, -1] = values
+        self.filled[rows] = np.minimum(self.filled[rows] + 1, HISTORY_DAYS)
+
+    def _refresh(self, rows):
+        """Recompute the feature rows of `rows` from the window and sums"""
+        rows = np.atleast_1d(rows)
+        filled = self.filled[rows]
+        columns = {}
+        for lag in LAGS:
+            columns[f'sales_lag_{lag}'] = np.where(filled >= lag, self.window[rows, -lag], np.nan)
+        for k, window in enumerate(WINDOWS):
+            total, squares = self.sums[rows, k], self.sumsq[rows, k]
+            enough = filled >= window
+            mean = total / window
+            # Sample variance from the running sums; clipped at 0 against rounding
+            var = np.maximum((squares - total * total / window) / (window - 1), 0.0)
+            columns[f'sales_rolling_mean_{window}'] = np.where(enough, mean, np.nan)
+            columns[f'sales_rolling_std_{window}'] = np.where(enough, np.sqrt(var), np.nan)
+        for k, col in enumerate(EXOGENOUS_COLUMNS):
+            columns[col] = self.exogenous[rows, k]
+        self.values[rows] = np.column_stack([columns[col] for col in STATE_COLUMNS])
+
+    # ------------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------------
+
+    def row(self, series):
+        """Features of the day after the series' last day, as {column: value}"""
+        with self._lock:
+            return dict(zip(STATE_COLUMNS, self.values[self.index[series]].tolist()))
+
+    def recent(self, series):
+        """The series' last min(HISTORY_DAYS, days seen) sales, oldest first"""
+        with self._lock:
+            r = self.index[series]
+            return self.window[r, HISTORY_DAYS - self.filled[r]:].copy()
+
+    def last_day(self, series):
+        return pd.Timestamp(self.last_date[self.index[series]])
+
+    def future_exogenous(self, series, n_rows):
+        """
+        Exogenous columns for the next n_rows days, as features.future_exogenous():
+        serving defaults, except that promotions, transactions and the oil
+        price carry their last known value
+        """
+        with self._lock:
+            last = self.exogenous[self.index[series]]
+        exogenous = {}
+        for k, (col, default) in enumerate(EXOGENOUS_DEFAULTS.items()):
+            value = last[k] if np.isnan(default) and not np.isnan(last[k]) else default
+            exogenous[col] = np.full(n_rows, value, dtype=float)
+        return exogenous
+
+    def forecast_inputs(self, series, future_dates, feature_cols, calendar=None):
+        """
+        Inputs of forecast_models.forecast_random_forest() for the days after
+        the series' last day
+
+        Args:
+            calendar: Optional exogenous.ExogenousIndex; the holidays it
+                knows for future_dates replace the serving defaults
+
+        The lag and rolling columns of the first day are read from the
+        series' row; later days are filled recursively by the forecast.
+
+        Returns:
+            (recent sales, (len(future_dates), len(feature_cols)) matrix,
+            number of leading rows whose history columns are filled)
+        """
+        exogenous = self.future_exogenous(series, len(future_dates))
+        if calendar is not None:
+            exogenous = calendar.fill(exogenous, future_dates, columns=SCHEDULED_EXOGENOUS)
+        X = FeatureSet(future_dates, exogenous=exogenous).matrix(feature_cols)
+
+        with self._lock:
+            row, recent = self.row(series), self.recent(series)
+        slots = [(j, canonical_name(col)) for j, col in enumerate(feature_cols) if history_spec(col) is not None]
+        first = np.array([row.get(name, np.nan) for _, name in slots], dtype=float)
+        # Too short a history (NaN features) or lags the row does not hold
+        if not len(X) or not np.isfinite(first).all():
+            return recent, X, 0
+        X[0, [j for j, _ in slots]] = first
+        return recent, X, 1
+
+    def follow(self, dataset, series):
+        """Load a LiveDataset into the state and append every batch ingested into it"""
+        self.append(series, dataset.load())
+        dataset.subscribe(lambda frame, new_rows: lambda: self.append(series, new_rows))
+        return self
+
+_FOLLOWED = {}
+_FOLLOWED_LOCK = threading.Lock()
+
+def live_state(dataset, series):
+    """One SeriesState per LiveDataset, created on first use and kept current"""
+    with _FOLLOWED_LOCK:
+        if id(dataset) not in _FOLLOWED:
+            _FOLLOWED[id(dataset)] = SeriesState([series]).follow(dataset, series)
+        return _FOLLOWED[id(dataset)]
+
+def live_forecast_inputs(dataset, series, future_dates, feature_cols, calendar=None, store=None):
+    """
+    forecast_models.forecast_random_forest() inputs for the days after a
+    LiveDataset's last day
+
+    They come from the feature store (the same stored rows training and
+    backtesting read) once it holds that day. While its background
+    materialization is still catching up with an ingest, or when the store
+    cannot be read, the latest-state snapshot serves the same inputs.
+
+    Args:
+        store: Optional feature_store.FeatureStore materialized from `dataset`
+    """
+    state = live_state(dataset, series)
+    if store is not None:
+        try:
+            if store.last_date(series) == state.last_day(series):
+                return store.forecast_inputs(series, future_dates, feature_cols, calendar)
+        except (KeyError, OSError, ValueError):
+            pass
+    return state.forecast_inputs(series, future_dates, feature_cols, calendar)
@@ -0,0 +1,310 @@
+"""
+Forecast Simulation for Wing Shop
+Draws sample paths of future demand in vectorized NumPy (state space draws
+for SARIMA, the error-correction recursions for Holt-Winters, Prophet's own
+sampler and bootstrapped residuals fed through the recursive Random Forest)
+and turns them into quantiles per day or over a horizon
+"""
+
+import os
+import json
+from pathlib import Path
+import numpy as np
+
+from features import history_spec, next_history_value
+from serialization import format_dates, to_float_array
+
+# Paths drawn per forecast; latency grows linearly with it (the Random
+# Forest predicts every path at every step), interval noise with 1/sqrt(n)
+DEFAULT_SAMPLES = int(os.environ.get('FORECAST_SAMPLES', 1000))
+MAX_SAMPLES = 20000
+
+# Forest predictions one simulation may run (paths x series x days): the
+# global model predicts every series of a node on every path, so its
+# sample count is cut to fit, though never below MIN_SAMPLES
+MAX_PREDICTIONS = int(os.environ.get('FORECAST_SIMULATION_BUDGET', 2_000_000))
+MIN_SAMPLES = 100
+
+# Longest horizon paths are simulated over
+MAX_SIMULATED_DAYS = 90
+
+DEFAULT_CONFIDENCE = 0.95
+
+# Fixed seed so repeated requests return the same intervals
+DEFAULT_SEED = 0
+
+RF_RESIDUALS_FILE = 'random_forest_residuals.json'
+
+def sample_count(n_samples=None, predictions_per_path=1):
+    """
+    Requested sample count, defaulted and clipped to [1, MAX_SAMPLES] and
+    to the MAX_PREDICTIONS budget (down to MIN_SAMPLES) when each path
+    costs `predictions_per_path` forest predictions
+    """
+    n_samples = int(min(max(int(n_samples or DEFAULT_SAMPLES), 1), MAX_SAMPLES))
+    budget = max(MAX_PREDICTIONS // max(int(predictions_per_path), 1), MIN_SAMPLES)
+    return min(n_samples, budget)
+
+def check_horizon(days):
+    """Reject horizons longer than MAX_SIMULATED_DAYS"""
+    if days > MAX_SIMULATED_DAYS:
+        raise ValueError(f"Simulated intervals cover at most {MAX_SIMULATED_DAYS} days")
+
+def interval_quantiles(confidence=DEFAULT_CONFIDENCE):
+    return (1 - confidence) / 2, (1 + confidence) / 2
+
+class SamplePaths:
+    """
+    Simulated demand paths, one row per sample and one column per day
+
+    Args:
+        dates: Forecast dates
+        paths: (n_samples, n_dates) array
+    """
+
+    def __init__(self, dates, paths):
+        self.dates = dates
+        self.paths = np.asarray(paths, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def quantiles(self, qs):
+        """(len(qs), n_dates) quantiles of each day"""
+        return np.quantile(self.paths, np.asarray(qs, dtype=float), axis=0)
+
+    def interval(self, confidence=DEFAULT_CONFIDENCE):
+        """(lower, upper) per day of the central `confidence` interval"""
+        lower, upper = self.quantiles(interval_quantiles(confidence))
+        return lower, upper
+
+    def total(self, days=None):
+        """Demand over the first `days` days (all by default), one value per path"""
+        return self.paths[:, :days].sum(axis=1)
+
+    def total_quantiles(self, qs, days=None):
+        return np.quantile(self.total(days), np.asarray(qs, dtype=float))
+
+    def summary(self, qs, days=None):
+        """
+        JSON-ready per-day and total quantiles
+
+        Returns:
+            Dict with samples, daily (date plus one key per quantile) and
+            total (days, mean and the quantiles of the summed demand)
+        """
+        qs = [float(q) for q in qs]
+        names = [f'q{q * 100:g}' for q in qs]
+        daily = {'date': format_dates(self.dates)}
+        for name, values in zip(names, self.quantiles(qs)):
+            daily[name] = to_float_array(values, decimals=2).tolist()
+        total = self.total(days)
+        return {
+            'samples': len(self),
+            'daily': [dict(zip(daily, row)) for row in zip(*daily.values())],
+            'total': {
+                'days': self.paths.shape[1] if days is None else min(days, self.paths.shape[1]),
+                'mean': round(float(total.mean()), 2),
+                **{name: round(float(value), 2) for name, value in zip(names, np.quantile(total, qs))}
+            }
+        }
+
+# ============================================================================
+# SIMULATORS
+# ============================================================================
+
+def _psd_factor(cov):
+    """F with F @ F.T == cov for a symmetric positive semi-definite matrix"""
+    cov = np.atleast_2d(np.asarray(cov, dtype=float))
+    values, vectors = np.linalg.eigh((cov + cov.T) / 2)
+    return vectors * np.sqrt(np.clip(values, 0.0, None))
+
+def simulate_statespace(forecaster, steps, n_samples=None, seed=DEFAULT_SEED):
+    """
+    Paths of a statespace.StateSpaceForecaster (SARIMA)
+
+    The first state is drawn from N(a[n+1|n], P[n+1|n]) and every step adds
+    observation and state noise, so each day's sample variance converges to
+    forecast_variance().
+    """
+    rng = np.random.default_rng(seed)
+    n_samples = sample_count(n_samples)
+    k = len(forecaster.initial_state)
+    state_factor = _psd_factor(forecaster.selected_state_cov)
+    obs_sd = np.sqrt(max(float(np.atleast_2d(forecaster.obs_cov)[0, 0]), 0.0))
+
+    a = forecaster.initial_state + rng.standard_normal((n_samples, k)) @ _psd_factor(forecaster.initial_state_cov).T
+    paths = np.empty((n_samples, steps))
+    for h in range(steps):
+        paths[:, h] = (forecaster.obs_intercept[0] + a @ forecaster.design[0]
+                       + obs_sd * rng.standard_normal(n_samples))
+        a = (forecaster.state_intercept + a @ forecaster.transition.T
+             + rng.standard_normal((n_samples, k)) @ state_factor.T)
+    return paths
+
+def simulate_holt_winters(forecaster, steps, n_samples=None, seed=DEFAULT_SEED):
+    """
+    Paths of a statespace.HoltWintersForecaster
+
+    Runs the additive-error recursions of HoltWintersResults.simulate() from
+    the final level, slope and seasonal cycle with N(0, sigma) errors.
+    """
+    if forecaster.state.get('sigma') is None:
+        raise ValueError("Exponential Smoothing state has no error sigma; export it again to simulate")
+    rng = np.random.default_rng(seed)
+    n_samples = sample_count(n_samples)
+    params = forecaster.state['params']
+    alpha = params.get('smoothing_level', 0.0)
+    beta = params.get('smoothing_trend', 0.0) if forecaster.trend else 0.0
+    gamma = params.get('smoothing_seasonal', 0.0) if forecaster.seasonal else 0.0
+    mul_trend, mul_seasonal = forecaster.trend == 'mul', forecaster.seasonal == 'mul'
+    eps = rng.standard_normal((steps, n_samples)) * forecaster.state['sigma']
+
+    level = np.full(n_samples, forecaster.level)
+    slope = np.full(n_samples, forecaster.slope if forecaster.trend else (1.0 if mul_trend else 0.0))
+    neutral = 1.0 if mul_seasonal else 0.0
+    cycle = forecaster.cycle if len(forecaster.cycle) else np.array([neutral])
+    seasons = np.tile(cycle, (n_samples, 1))
+    paths = np.empty((n_samples, steps))
+    for t in range(steps):
+        damped = slope ** forecaster.phi if mul_trend else slope * forecaster.phi
+        l0 = level * damped if mul_trend else level + damped
+        j = t % seasons.shape[1]
+        s0 = seasons[:, j] if forecaster.seasonal else np.full(n_samples, neutral)
+        paths[:, t] = (l0 * s0 if mul_seasonal else l0 + s0) + eps[t]
+        kappa_l = 1 / s0 if mul_seasonal else 1.0
+        kappa_b = kappa_l / level if mul_trend else kappa_l
+        kappa_s = 1 / l0 if mul_seasonal else 1.0
+        level, slope = l0 + alpha * kappa_l * eps[t], damped + beta * kappa_b * eps[t]
+        if forecaster.seasonal:
+            seasons[:, j] = s0 + gamma * kappa_s * eps[t]
+
+    if forecaster.lamda is not None:
+        from statespace import _inv_boxcox
+        paths = _inv_boxcox(paths, forecaster.lamda)
+    return paths + forecaster.bias
+
+def simulate_random_forest(model, sales_history, future_features, feature_cols, residuals,
+                           n_samples=None, seed=DEFAULT_SEED, sigma=None):
+    """
+    Paths of the recursive Random Forest forecast
+
+    Every path starts from the same history; at each step the model
+    predicts all paths at once from their own lag/rolling features, a
+    residual drawn from `residuals` is added and the clipped value is fed
+    back as that path's newest sale.
+
+    Args:
+        model: Fitted RandomForestRegressor
+        sales_history: 1-D sales up to the forecast origin
+        future_features: (steps, n_features) matrix as for
+            forecast_models.forecast_random_forest()
+        feature_cols: Column names of future_features
+        residuals: 1-D out-of-sample residuals to bootstrap from, or None
+            to draw N(0, sigma) errors instead
+
+    Returns:
+        (n_samples, steps) array
+    """
+    rng = np.random.default_rng(seed)
+    future_features = np.asarray(future_features, dtype=float)
+    steps = len(future_features)
+    n_samples = sample_count(n_samples, steps)
+
+    lag_slots = []
+    for j, col in enumerate(feature_cols):
+        spec = history_spec(col)
+        if spec is not None:
+            lag_slots.append((j,) + spec)
+    longest = max((n for _, _, n in lag_slots), default=1)
+
+    tail = np.asarray(sales_history, dtype=float)[-longest:]
+    history = np.empty((n_samples, len(tail) + steps))
+    history[:, :len(tail)] = tail
+    if residuals is not None and len(residuals):
+        residuals = np.asarray(residuals, dtype=float)
+        draws = residuals[rng.integers(0, len(residuals), (n_samples, steps))]
+    else:
+        draws = rng.normal(0.0, sigma or 0.0, (n_samples, steps))
+    for i in range(steps):
+        end = len(tail) + i
+        X = np.repeat(future_features[i:i + 1], n_samples, axis=0)
+        for j, kind, n in lag_slots:
+            X[:, j] = next_history_value(kind, n, history[:, max(0, end - longest):end])
+        history[:, end] = np.maximum(model.predict(X) + draws[:, i], 0.0)
+    return history[:, len(tail):]
+
+def simulate(forecaster, steps, n_samples=None, seed=DEFAULT_SEED, dates=None):
+    """
+    Paths of any forecaster from statespace.load_state()
+
+    Args:
+        forecaster: StateSpaceForecaster, HoltWintersForecaster or ProphetForecaster
+        steps: Days after the history
+        dates: Forecast dates (required for Prophet)
+
+    Returns:
+        (n_samples, steps) array
+    """
+    if forecaster.kind == 'statespace':
+        return simulate_statespace(forecaster, steps, n_samples, seed)
+    if forecaster.kind == 'holt_winters':
+        return simulate_holt_winters(forecaster, steps, n_samples, seed)
+    if forecaster.kind == 'prophet':
+        return forecaster.sample(dates, sample_count(n_samples), seed)
+    raise ValueError(f"Cannot simulate {forecaster.kind} forecasts")
+
+def can_simulate(forecaster):
+    return getattr(forecaster, 'kind', None) in ('statespace', 'holt_winters', 'prophet')
+
+# ============================================================================
+# RANDOM FOREST RESIDUALS
+# ============================================================================
+
+def out_of_bag_predictions(model, X, rows=None):
+    """
+    Predictions of a bootstrapped forest for rows of its training matrix,
+    each row predicted only by the trees that did not see it
+
+    Args:
+        rows: Indices into X to predict (default: every row)
+
+    Returns:
+        Array with one prediction per row, NaN for rows every tree saw
+    """
+    X = np.asarray(X, dtype=np.float32)
+    rows = np.arange(len(X)) if rows is None else np.asarray(rows)
+    X_rows = X[rows]
+    totals = np.zeros(len(rows))
+    counts = np.zeros(len(rows))
+    seen = np.zeros(len(X), dtype=bool)
+    for tree, sampled in zip(model.estimators_, model.estimators_samples_):
+        seen[:] = False
+        seen[sampled] = True
+        unseen = ~seen[rows]
+        if unseen.any():
+            totals[unseen] += tree.predict(X_rows[unseen])
+            counts[unseen] += 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+def out_of_bag_residuals(model, X, y):
+    """
+    Training residuals of a bootstrapped forest, each row predicted only by
+    the trees that did not see it, so they behave like out-of-sample errors
+
+    Rows every tree saw are skipped.
+    """
+    residuals = np.asarray(y, dtype=float) - out_of_bag_predictions(model, X)
+    return residuals[~np.isnan(residuals)]
+
+def save_residuals(residuals, path, kind='out_of_bag'):
+    with open(path, 'w') as f:
+        json.dump({'kind': kind, 'residuals': to_float_array(residuals, decimals=4).tolist()}, f)
+
+def load_residuals(path):
+    """Residuals saved by save_residuals(), or None if the file does not exist"""
+    if not Path(path).exists():
+        return None
+    with open(path, 'r') as f:
+        return np.asarray(json.load(f)['residuals'], dtype=float)
@@ -0,0 +1,199 @@
+"""
+Startup Time for Wing Shop
+Defers unpickling the models that pull in scikit-learn and joblib until a
+request needs them, and reports per-module cold import times (from
+python -X importtime) with a budget check that fails CI on regressions
+"""
+
+import os
+import re
+import sys
+import json
+import pickle
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+
+# STARTUP_MODE=lazy defers model loading; the default loads everything up front
+STARTUP_MODE_ENV = 'STARTUP_MODE'
+
+# Libraries a lazy startup must not import; each costs 0.1-1.2s cold
+DEFERRED_MODULES = ['sklearn', 'scipy', 'statsmodels', 'prophet', 'joblib']
+
+# Cold import budgets (milliseconds) checked by `python startup.py --check`
+IMPORT_BUDGETS_MS = {
+    'app': 2000,
+    'api': 2000
+}
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+LOADED_MARKER = '__loaded_modules__'
+
+# ============================================================================
+# DEFERRED LOADING
+# ============================================================================
+
+def lazy_startup():
+    return os.environ.get(STARTUP_MODE_ENV, 'eager').lower() == 'lazy'
+
+class DeferredArtifact:
+    """
+    Model file loaded on the first get(), once, even with concurrent callers
+
+    Args:
+        path: File to load
+        loader: Callable(path) -> model
+    """
+
+    def __init__(self, path, loader):
+        self.path = path
+        self.loader = loader
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self.loader(self.path)
+                    self._loaded = True
+        return self._value
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def load_joblib(path):
+    import joblib
+    return joblib.load(path)
+
+def load_artifact(path, loader=load_pickle):
+    """loader(path) now, or a DeferredArtifact in lazy startup mode"""
+    if lazy_startup():
+        return DeferredArtifact(path, loader)
+    return loader(path)
+
+def resolve(artifact):
+    """The model behind a value returned by load_artifact()"""
+    return artifact.get() if isinstance(artifact, DeferredArtifact) else artifact
+
+def describe(artifact):
+    return 'found (loads on first use)' if isinstance(artifact, DeferredArtifact) else 'loaded'
+
+# ============================================================================
+# IMPORT REPORT
+# ============================================================================
+
+def parse_importtime(stderr):
+    """Rows of python -X importtime output as dicts, in import order"""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            rows.append({
+                'name': match.group(4),
+                'self_ms': int(match.group(1)) / 1000,
+                'cumulative_ms': int(match.group(2)) / 1000,
+                'depth': len(match.group(3)) // 2
+            })
+    return rows
+
+def import_report(module, mode=None, cwd=ROOT_DIR, top=15):
+    """
+    Cold import of `module` in a fresh interpreter
+
+    The cumulative time includes running the module body, so for app.py it
+    covers loading the data and models as well.
+
+    Args:
+        module: Module to import, e.g. 'app' or 'api'
+        mode: STARTUP_MODE for the child; the current one if None
+        top: Number of slowest top-level imports to list
+
+    Returns:
+        Dict with total_ms, budget_ms, the slowest imports and which
+        DEFERRED_MODULES ended up loaded
+    """
+    env = dict(os.environ, MODEL_WATCH_INTERVAL='0')
+    if mode is not None:
+        env[STARTUP_MODE_ENV] = mode
+    code = (f"import sys, json\nimport {module}\n"
+            f"print({LOADED_MARKER!r} + json.dumps(sorted(sys.modules)))")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=str(cwd), env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = parse_importtime(result.stderr)
+    loaded = []
+    for line in result.stdout.splitlines():
+        if line.startswith(LOADED_MARKER):
+            loaded = json.loads(line[len(LOADED_MARKER):])
+    total = next((row['cumulative_ms'] for row in rows if row['name'] == module and row['depth'] == 0), None)
+
+    # Direct imports of the module, slowest first
+    children = [row for row in rows if row['depth'] == 1]
+    children.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+
+    return {
+        'module': module,
+        'mode': env.get(STARTUP_MODE_ENV, 'eager'),
+        'total_ms': total,
+        'budget_ms': IMPORT_BUDGETS_MS.get(module),
+        'imports': [{k: row[k] for k in ('name', 'self_ms', 'cumulative_ms')} for row in children[:top]],
+        'deferred_loaded': [name for name in DEFERRED_MODULES if name in loaded]
+    }
+
+def budget_problems(report, budget_ms=None):
+    """Reasons a report fails its budget (empty if it passes)"""
+    problems = []
+    budget_ms = budget_ms or report['budget_ms']
+    if budget_ms is not None and report['total_ms'] is not None and report['total_ms'] > budget_ms:
+        problems.append(f"{report['module']} took {report['total_ms']:.0f}ms, budget {budget_ms:.0f}ms")
+    if report['mode'] == 'lazy' and report['deferred_loaded']:
+        problems.append(f"{report['module']} imported {', '.join(report['deferred_loaded'])} in lazy mode")
+    return problems
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold import times of the Wing Shop services')
+    parser.add_argument('modules', nargs='*', default=list(IMPORT_BUDGETS_MS))
+    parser.add_argument('--mode', choices=['eager', 'lazy'], default=None,
+                        help='STARTUP_MODE for the measured import (default: current environment)')
+    parser.add_argument('--top', type=int, default=15, help='Slowest imports listed per module')
+    parser.add_argument('--check', action='store_true', help='Exit non-zero if a budget is exceeded')
+    parser.add_argument('--budget-ms', type=float, default=None, help='Override the budget of every module')
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        report = import_report(module, args.mode, top=args.top)
+        print(f"\n{module} ({report['mode']}): {report['total_ms']:.0f}ms")
+        for row in report['imports']:
+            print(f"  {row['cumulative_ms']:9.1f}ms  {row['name']}")
+        if report['deferred_loaded']:
+            print(f"  loaded: {', '.join(report['deferred_loaded'])}")
+
+        if args.check:
+            problems = budget_problems(report, args.budget_ms)
+            for problem in problems:
+                print(f"✗ {problem}")
+            if not problems:
+                print(f"✓ {module} within budget")
+            failed = failed or bool(problems)
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,475 @@
+"""
+Lightweight SARIMA, Exponential Smoothing and Prophet Forecasters for Wing Shop
+Exports the fitted parameters and final state of statsmodels and Prophet
+models to small JSON files, and forecasts from them with NumPy alone so
+serving never imports statsmodels or prophet or unpickles the training data
+"""
+
+import sys
+import json
+import pickle
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).parent
+
+STATE_FILES = {
+    'exp_smoothing': 'exp_smoothing_state.json',
+    'sarima': 'sarima_state.json',
+    'prophet': 'prophet_state.json'
+}
+
+# Steps compared against the original model when a state is exported
+PARITY_STEPS = 56
+PARITY_RTOL = 1e-6
+
+# Holiday dates are exported this far past the end of the history
+HOLIDAY_YEARS = 5
+
+# ============================================================================
+# FORECASTERS
+# ============================================================================
+
+class StateSpaceForecaster:
+    """
+    Linear Gaussian state space forecast from the last predicted state
+
+        y[t] = d + Z a[t] + e[t],     e ~ N(0, H)
+        a[t+1] = c + T a[t] + R n[t], n ~ N(0, Q)
+
+    starting from a[n+1|n] and its covariance P[n+1|n], which is what
+    SARIMAXResults.forecast() does for a model without exogenous inputs.
+    """
+
+    kind = 'statespace'
+
+    def __init__(self, state):
+        self.state = state
+        self.design = np.asarray(state['design'], dtype=float)
+        self.obs_intercept = np.asarray(state['obs_intercept'], dtype=float)
+        self.obs_cov = np.asarray(state['obs_cov'], dtype=float)
+        self.transition = np.asarray(state['transition'], dtype=float)
+        self.state_intercept = np.asarray(state['state_intercept'], dtype=float)
+        self.selected_state_cov = np.asarray(state['selected_state_cov'], dtype=float)
+        self.initial_state = np.asarray(state['predicted_state'], dtype=float)
+        self.initial_state_cov = np.asarray(state['predicted_state_cov'], dtype=float)
+
+    def forecast(self, steps=1):
+        a = self.initial_state.copy()
+        out = np.empty(steps)
+        for h in range(steps):
+            out[h] = (self.obs_intercept + self.design @ a)[0]
+            a = self.state_intercept + self.transition @ a
+        return out
+
+    def forecast_variance(self, steps=1):
+        """Variance of each forecast step (for prediction intervals)"""
+        P = self.initial_state_cov.copy()
+        out = np.empty(steps)
+        for h in range(steps):
+            out[h] = (self.design @ P @ self.design.T + self.obs_cov)[0, 0]
+            P = self.transition @ P @ self.transition.T + self.selected_state_cov
+        return out
+
+class HoltWintersForecaster:
+    """
+    Holt-Winters forecast from the final level, trend and seasonal cycle
+
+    Follows HoltWintersResults.forecast(): additive or multiplicative trend
+    (optionally damped) and seasonality, Box-Cox back-transform and bias
+    removal.
+    """
+
+    kind = 'holt_winters'
+
+    def __init__(self, state):
+        self.state = state
+        self.trend = state['trend']
+        self.seasonal = state['seasonal']
+        self.damped = state['damped']
+        self.phi = state['damping_trend'] if self.damped else 1.0
+        self.level = state['level']
+        self.slope = state['slope']
+        self.cycle = np.asarray(state['seasonal_cycle'], dtype=float)
+        self.lamda = state['boxcox_lambda']
+        self.bias = state['bias']
+
+    def forecast(self, steps=1):
+        h = np.arange(1, steps + 1)
+        if self.trend is None:
+            trended = np.full(steps, self.level)
+        else:
+            growth = np.cumsum(self.phi ** h) if self.damped else h.astype(float)
+            if self.trend == 'mul':
+                trended = self.level * self.slope ** growth
+            else:
+                trended = self.level + self.slope * growth
+
+        if self.seasonal is None:
+            values = trended
+        else:
+            season = self.cycle[(h - 1) % len(self.cycle)]
+            values = trended * season if self.seasonal == 'mul' else trended + season
+
+        if self.lamda is not None:
+            values = _inv_boxcox(values, self.lamda)
+        return values + self.bias
+
+def _inv_boxcox(values, lamda):
+    if lamda == 0:
+        return np.exp(values)
+    return np.power(lamda * values + 1, 1 / lamda)
+
+class ProphetForecaster:
+    """
+    Prophet forecast from the exported trend, seasonality and holiday terms
+
+    Follows Prophet.predict() for linear or flat growth:
+
+        yhat = trend * (1 + X beta_m) + X beta_a * y_scale
+
+    where X holds the Fourier terms of every seasonality followed by the
+    holiday indicators. Intervals are percentiles of simulated paths with
+    the same trend changepoint and noise process as Prophet's vectorized
+    sampler, drawn from a fixed seed so repeated requests agree. Dates past
+    `holidays_until` get no holiday effect.
+    """
+
+    kind = 'prophet'
+
+    def __init__(self, state):
+        self.state = state
+        self.growth = state['growth']
+        self.start = pd.Timestamp(state['start'])
+        self.t_scale_days = state['t_scale_days']
+        self.y_scale = state['y_scale']
+        self.floor = state['floor']
+        self.changepoints_t = np.asarray(state['changepoints_t'], dtype=float)
+        self.k = np.asarray(state['k'], dtype=float)
+        self.m = np.asarray(state['m'], dtype=float)
+        self.delta = np.asarray(state['delta'], dtype=float)
+        self.sigma_obs = np.asarray(state['sigma_obs'], dtype=float)
+        self.beta = np.asarray(state['beta'], dtype=float)
+        self.additive = np.asarray(state['additive'], dtype=float)
+        self.multiplicative = np.asarray(state['multiplicative'], dtype=float)
+        self.holiday_dates = pd.DatetimeIndex(list(state['holiday_days']))
+        self.holiday_columns = list(state['holiday_days'].values())
+        self.last_date = pd.Timestamp(state['last_date'])
+
+    def features(self, dates):
+        """(n_dates, n_columns) regression matrix, in Prophet's column order"""
+        dates = pd.DatetimeIndex(dates)
+        X = np.zeros((len(dates), self.beta.shape[1]))
+        days = (dates - pd.Timestamp('1970-01-01')).total_seconds().values / 86400
+        for season in self.state['seasonalities']:
+            x = 2 * np.pi * days / season['period']
+            for i in range(season['fourier_order']):
+                X[:, season['column'] + 2 * i] = np.sin((i + 1) * x)
+                X[:, season['column'] + 2 * i + 1] = np.cos((i + 1) * x)
+        positions = self.holiday_dates.get_indexer(dates)
+        for row in np.flatnonzero(positions >= 0):
+            X[row, self.holiday_columns[positions[row]]] = 1.0
+        return X
+
+    def _t(self, dates):
+        return ((pd.DatetimeIndex(dates) - self.start).total_seconds().values / 86400) / self.t_scale_days
+
+    def _trend(self, t, k, m, delta):
+        if self.growth == 'flat':
+            return np.full(len(t), m)
+        deltas_t = (self.changepoints_t[None, :] <= t[:, None]) * delta
+        return (k + deltas_t.sum(axis=1)) * t + m + (deltas_t * -self.changepoints_t).sum(axis=1)
+
+    def components(self, dates):
+        """(trend, additive_terms, multiplicative_terms) at the posterior mean"""
+        t = self._t(dates)
+        trend = self._trend(t, self.k.mean(), self.m.mean(), self.delta.mean(axis=0)) * self.y_scale + self.floor
+        X = self.features(dates)
+        beta = self.beta.mean(axis=0)
+        return trend, X @ (beta * self.additive) * self.y_scale, X @ (beta * self.multiplicative)
+
+    def forecast(self, steps=1):
+        """yhat for the `steps` days after the history"""
+        dates = pd.date_range(self.last_date + pd.Timedelta(days=1), periods=steps, freq='D')
+        trend, additive, multiplicative = self.components(dates)
+        return trend * (1 + multiplicative) + additive
+
+    def sample(self, dates, n_samples=None, seed=0):
+        """
+        Simulated paths of yhat over `dates`
+
+        Returns:
+            Array of shape (n_samples, n_dates)
+        """
+        rng = np.random.default_rng(seed)
+        n_samples = n_samples or self.state['uncertainty_samples']
+        t = self._t(dates)
+        X = self.features(dates)
+        future = t > 1
+        n_future = int(future.sum())
+        if n_future > 1:
+            step = np.diff(t[future]).mean()
+        else:
+            step = self.state['history_t_step']
+        likelihood = len(self.changepoints_t) * step
+
+        n_iterations = len(self.k)
+        per_iteration = max(1, int(np.ceil(n_samples / n_iterations)))
+        paths = []
+        for i in range(n_iterations):
+            trend = self._trend(t, self.k[i], self.m[i], self.delta[i])
+            shifts = np.zeros((per_iteration, len(t)))
+            if self.growth == 'linear' and n_future:
+                # Future slope changes arrive at the historical rate with the
+                # historical mean size, as in Prophet's vectorized sampler
+                mean_delta = np.mean(np.abs(self.delta[i])) + 1e-8
+                changes = rng.laplace(0, mean_delta, (per_iteration, n_future))
+                changes *= rng.uniform(size=changes.shape) < likelihood
+                changes = (changes + np.hstack([np.zeros((per_iteration, 1)), changes])[:, :-1]) / 2
+                shifts[:, future] = changes.cumsum(axis=1).cumsum(axis=1) * step
+            trends = (trend + shifts) * self.y_scale + self.floor
+            additive = X @ (self.beta[i] * self.additive) * self.y_scale
+            multiplicative = X @ (self.beta[i] * self.multiplicative)
+            noise = rng.normal(0, self.sigma_obs[i], trends.shape) * self.y_scale
+            paths.append(trends * (1 + multiplicative) + additive + noise)
+        return np.concatenate(paths)[:n_samples]
+
+    def predict(self, df):
+        """
+        Prophet.predict() for a frame with a 'ds' column
+
+        Returns:
+            DataFrame with ds, trend, additive_terms, multiplicative_terms,
+            yhat and, if the model kept uncertainty samples, yhat_lower and
+            yhat_upper
+        """
+        dates = pd.DatetimeIndex(pd.to_datetime(df['ds']))
+        trend, additive, multiplicative = self.components(dates)
+        result = pd.DataFrame({
+            'ds': dates,
+            'trend': trend,
+            'additive_terms': additive,
+            'multiplicative_terms': multiplicative,
+            'yhat': trend * (1 + multiplicative) + additive
+        })
+        if self.state['uncertainty_samples']:
+            paths = self.sample(dates)
+            width = self.state['interval_width']
+            result['yhat_lower'] = np.nanpercentile(paths, 100 * (1 - width) / 2, axis=0)
+            result['yhat_upper'] = np.nanpercentile(paths, 100 * (1 + width) / 2, axis=0)
+        return result
+
+FORECASTERS = {cls.kind: cls for cls in (StateSpaceForecaster, HoltWintersForecaster, ProphetForecaster)}
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def export_sarima(results):
+    """Parameters and final predicted state of a fitted SARIMAXResults"""
+    ssm = results.model.ssm
+    matrices = {name: np.asarray(ssm[name]) for name in
+                ['design', 'obs_intercept', 'obs_cov', 'transition', 'state_intercept',
+                 'selection', 'state_cov']}
+    # Vectors are 1-D and matrices 2-D unless they vary over time
+    time_varying = any(m.ndim == (2 if name.endswith('intercept') else 3)
+                       for name, m in matrices.items())
+    if time_varying or results.model.k_exog:
+        raise ValueError("Only time-invariant models without exogenous inputs can be exported")
+    selection, state_cov = matrices.pop('selection'), matrices.pop('state_cov')
+
+    state = {'kind': StateSpaceForecaster.kind, 'nobs': int(results.nobs)}
+    state.update({name: m.tolist() for name, m in matrices.items()})
+    state['selected_state_cov'] = (selection @ state_cov @ selection.T).tolist()
+    state['predicted_state'] = np.asarray(results.predicted_state)[:, -1].tolist()
+    state['predicted_state_cov'] = np.asarray(results.predicted_state_cov)[:, :, -1].tolist()
+    state['params'] = dict(zip(results.model.param_names, np.asarray(results.params).tolist()))
+    return state
+
+def export_exp_smoothing(results):
+    """Parameters and final level/trend/seasons of a fitted HoltWintersResults"""
+    model = results.model
+    params = results.params
+    m = model.seasonal_periods if model.has_seasonal else 0
+
+    lamda = None
+    if params.get('use_boxcox'):
+        lamda = float(params['lamda'])
+
+    # statsmodels continues the seasonal cycle with the newest m - 1
+    # seasonal states followed by the one before them
+    season = np.asarray(results.season, dtype=float)
+    cycle = np.concatenate([season[-m:-1], season[-m - 1:-m]]) if m else np.array([])
+
+    state = {
+        'kind': HoltWintersForecaster.kind,
+        'nobs': int(model.nobs),
+        'trend': model.trend,
+        'seasonal': model.seasonal,
+        'damped': bool(model.damped_trend),
+        'damping_trend': float(params['damping_trend']) if model.damped_trend else None,
+        'level': float(np.asarray(results.level)[-1]),
+        'slope': float(np.asarray(results.trend)[-1]) if model.has_trend else 0.0,
+        'seasonal_cycle': cycle.tolist(),
+        'boxcox_lambda': lamda,
+        'bias': 0.0,
+        'sigma': _holt_winters_sigma(results, lamda),
+        'params': {k: float(params[k]) for k in ('smoothing_level', 'smoothing_trend', 'smoothing_seasonal')
+                   if params.get(k) is not None}
+    }
+    if params.get('remove_bias'):
+        # The mean residual statsmodels adds is not kept on the results
+        # consistently, so it is read off the first forecast step
+        unbiased = HoltWintersForecaster(state).forecast(1)[0]
+        state['bias'] = float(np.asarray(results.forecast(steps=1))[0] - unbiased)
+    return state
+
+def _holt_winters_sigma(results, lamda):
+    """Additive error standard deviation, as HoltWintersResults.simulate() estimates it"""
+    model = results.model
+    fitted = np.asarray(results.fittedvalues, dtype=float)
+    if lamda is not None:
+        from scipy.stats import boxcox
+        fitted = boxcox(fitted, lamda)
+    resid = np.asarray(model._y, dtype=float) - fitted
+    m = max(model.seasonal_periods or 0, 1)
+    n_params = 2 + 2 * model.has_trend + (m + 1) * model.has_seasonal + model.damped_trend
+    return float(np.sqrt(np.sum(resid ** 2) / (len(resid) - n_params)))
+
+def export_prophet(model):
+    """Trend, seasonality and holiday terms of a fitted Prophet model"""
+    if model.growth not in ('linear', 'flat'):
+        raise ValueError("Only linear or flat growth Prophet models can be exported")
+    if model.extra_regressors:
+        raise ValueError("Prophet models with extra regressors cannot be exported")
+    if any(props['condition_name'] is not None for props in model.seasonalities.values()):
+        raise ValueError("Prophet models with conditional seasonalities cannot be exported")
+
+    history_dates = model.history['ds']
+    last_date = history_dates.max()
+    dates = pd.Series(pd.date_range(history_dates.min(), last_date + pd.DateOffset(years=HOLIDAY_YEARS), freq='D'))
+    features, _, component_cols, _ = model.make_all_seasonality_features(pd.DataFrame({'ds': dates}))
+    columns = list(features.columns)
+
+    seasonalities = []
+    for name, props in model.seasonalities.items():
+        seasonalities.append({
+            'name': name,
+            'period': float(props['period']),
+            'fourier_order': int(props['fourier_order']),
+            'column': columns.index(f'{name}_delim_1')
+        })
+    # Every column after the Fourier terms is a 0/1 holiday indicator
+    first_holiday = sum(2 * season['fourier_order'] for season in seasonalities)
+    holidays = features.values[:, first_holiday:]
+    holiday_days = {}
+    for row in np.flatnonzero(holidays.any(axis=1)):
+        holiday_days[str(dates[row].date())] = (first_holiday + np.flatnonzero(holidays[row])).tolist()
+
+    params = model.params
+    return {
+        'kind': ProphetForecaster.kind,
+        'nobs': int(len(model.history)),
+        'growth': model.growth,
+        'start': str(model.start),
+        'last_date': str(last_date.date()),
+        't_scale_days': model.t_scale.total_seconds() / 86400,
+        'history_t_step': float(np.diff(model.history['t']).mean()),
+        'y_scale': float(model.y_scale),
+        'floor': float(model.history['floor'].iloc[0]),
+        'changepoints_t': np.asarray(model.changepoints_t, dtype=float).tolist(),
+        'k': np.asarray(params['k'], dtype=float).ravel().tolist(),
+        'm': np.asarray(params['m'], dtype=float).ravel().tolist(),
+        'delta': np.asarray(params['delta'], dtype=float).tolist(),
+        'sigma_obs': np.asarray(params['sigma_obs'], dtype=float).ravel().tolist(),
+        'beta': np.asarray(params['beta'], dtype=float).tolist(),
+        'columns': columns,
+        'additive': component_cols['additive_terms'].values.astype(float).tolist(),
+        'multiplicative': component_cols['multiplicative_terms'].values.astype(float).tolist(),
+        'seasonalities': seasonalities,
+        'holiday_days': holiday_days,
+        'holidays_until': str(dates.iloc[-1].date()),
+        'uncertainty_samples': int(model.uncertainty_samples or 0),
+        'interval_width': float(model.interval_width)
+    }
+
+EXPORTERS = {'exp_smoothing': export_exp_smoothing, 'sarima': export_sarima, 'prophet': export_prophet}
+
+def reference_forecast(name, results, steps):
+    """Forecast of the original model for the `steps` days after its history"""
+    if name == 'prophet':
+        dates = pd.date_range(results.history['ds'].max() + pd.Timedelta(days=1), periods=steps, freq='D')
+        # The mean forecast does not depend on the uncertainty samples
+        samples, results.uncertainty_samples = results.uncertainty_samples, 0
+        try:
+            return results.predict(pd.DataFrame({'ds': dates}))['yhat'].values
+        finally:
+            results.uncertainty_samples = samples
+    return np.asarray(results.forecast(steps=steps), dtype=float)
+
+def export_state(name, results, steps=PARITY_STEPS):
+    """
+    Export a fitted model and check that the NumPy forecaster reproduces
+    the original forecast over `steps` days
+
+    Raises:
+        ValueError if the forecasts differ beyond PARITY_RTOL
+    """
+    state = EXPORTERS[name](results)
+    expected = np.asarray(reference_forecast(name, results, steps), dtype=float)
+    actual = forecaster_from_state(state).forecast(steps)
+    scale = np.maximum(np.abs(expected), 1.0)
+    error = float(np.max(np.abs(actual - expected) / scale))
+    if not error <= PARITY_RTOL:
+        raise ValueError(f"{name} export does not match the original model (max relative error {error:.2e})")
+    state['parity'] = {'steps': steps, 'max_relative_error': error}
+    return state
+
+def forecaster_from_state(state):
+    return FORECASTERS[state['kind']](state)
+
+def save_state(state, path):
+    with open(path, 'w') as f:
+        json.dump(state, f)
+
+def load_state(path):
+    """NumPy forecaster from an exported state file"""
+    with open(path, 'r') as f:
+        return forecaster_from_state(json.load(f))
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Export pickled SARIMA/ETS/Prophet models to NumPy state files')
+    parser.add_argument('--models-dir', default=str(ROOT_DIR / 'models'))
+    parser.add_argument('--steps', type=int, default=PARITY_STEPS, help='Days checked against the original model')
+    args = parser.parse_args()
+
+    models_dir = Path(args.models_dir)
+    failed = False
+    for name, state_file in STATE_FILES.items():
+        pickle_path = models_dir / f'{name}_model.pkl'
+        if not pickle_path.exists():
+            print(f"⚠ {pickle_path} not found, skipping")
+            continue
+        with open(pickle_path, 'rb') as f:
+            results = pickle.load(f)
+        try:
+            state = export_state(name, results, args.steps)
+        except ValueError as e:
+            print(f"✗ {e}")
+            failed = True
+            continue
+        save_state(state, models_dir / state_file)
+        size = (models_dir / state_file).stat().st_size
+        print(f"✓ {name}: {pickle_path.stat().st_size:,} -> {size:,} bytes "
+              f"(max relative error {state['parity']['max_relative_error']:.1e})")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+"""
+Synthetic Sales Generators for Wing Shop
+Vectorized, seeded generators for degraded-mode forecasts, demo history and
+benchmark datasets; every result is built in whole-array NumPy calls and the
+same seed always gives the same output
+"""
+
+import sys
+import json
+import time
+import argparse
+import importlib.util
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from schema import compact_frame
+
+DEFAULT_SEED = 42
+
+PRODUCTS = ['Rice', 'Water', 'Oil', 'Noodles', 'Sugar']
+DEFAULT_STORE = 44
+
+def make_rng(seed=DEFAULT_SEED):
+    """NumPy Generator for a seed; None draws fresh entropy"""
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+def _today():
+    return pd.Timestamp.now().normalize()
+
+# ============================================================================
+# SINGLE SERIES
+# ============================================================================
+
+def trend_series(n, base, slope, noise, rng):
+    """base + slope * t + N(0, noise) for t = 0..n-1, clipped at zero"""
+    values = base + slope * np.arange(n, dtype=float) + rng.normal(0.0, noise, n)
+    return np.maximum(values, 0.0)
+
+def fallback_forecast(days, start=None, seed=DEFAULT_SEED, base=100.0, slope=2.0, noise=5.0):
+    """
+    Trend-plus-noise forecast used when no model can predict
+
+    Args:
+        days: Horizon length
+        start: First forecast date (default: tomorrow)
+
+    Returns:
+        (dates, values) as a DatetimeIndex and float array
+    """
+    start = _today() + pd.Timedelta(days=1) if start is None else pd.Timestamp(start)
+    dates = pd.date_range(start=start, periods=days, freq='D')
+    return dates, trend_series(days, base, slope, noise, make_rng(seed))
+
+def synthetic_history(days, end=None, seed=DEFAULT_SEED, base=150.0, slope=0.5, noise=10.0):
+    """
+    Upward-trending daily history for the `days` days before `end`
+
+    Returns:
+        (dates, values) as a DatetimeIndex and float array
+    """
+    end = _today() if end is None else pd.Timestamp(end)
+    dates = pd.date_range(end=end - pd.Timedelta(days=1), periods=days, freq='D')
+    return dates, trend_series(days, base, slope, noise, make_rng(seed))
+
+# ============================================================================
+# MULTI-SERIES DATASETS
+# ============================================================================
+
+# Product families of the raw Favorita data
+FAMILIES = [
+    'AUTOMOTIVE', 'BABY CARE', 'BEAUTY', 'BEVERAGES', 'BOOKS', 'BREAD/BAKERY',
+    'CELEBRATION', 'CLEANING', 'DAIRY', 'DELI', 'EGGS', 'FROZEN FOODS',
+    'GROCERY I', 'GROCERY II', 'HARDWARE', 'HOME AND KITCHEN I', 'HOME AND KITCHEN II',
+    'HOME APPLIANCES', 'HOME CARE', 'LADIESWEAR', 'LAWN AND GARDEN', 'LINGERIE',
+    'LIQUOR,WINE,BEER', 'MAGAZINES', 'MEATS', 'PERSONAL CARE', 'PET SUPPLIES',
+    'PLAYERS AND ELECTRONICS', 'POULTRY', 'PREPARED FOODS', 'PRODUCE',
+    'SCHOOL AND OFFICE SUPPLIES', 'SEAFOOD'
+]
+
+# Fixed-date national holidays (month, day)
+HOLIDAYS = [(1, 1), (5, 1), (5, 24), (8, 10), (10, 9), (11, 2), (11, 3), (12, 25)]
+
+ITEM_OFFSET = 100000
+ANNUAL_GROWTH = 0.03
+HOLIDAY_LIFT = 1.25
+PROMO_LIFT = 1.3
+PROMO_RATE = 0.1
+
+def _hash_level(ids, low, high):
+    """Deterministic level in [low, high) per integer id"""
+    return low + (high - low) * ((np.asarray(ids, dtype=np.int64) * 2654435761) % 1000) / 1000.0
+
+def holiday_flags(dates):
+    dates = pd.DatetimeIndex(dates)
+    codes = dates.month.values * 100 + dates.day.values
+    return np.isin(codes, [m * 100 + d for m, d in HOLIDAYS]).astype(int)
+
+def oil_prices(dates, rng, start_price=90.0):
+    """Daily oil price as a random walk floored at 20"""
+    steps = rng.normal(0.0, 1.0, len(dates))
+    return np.maximum(start_price + np.cumsum(steps), 20.0).round(2)
+
+def item_catalog(families, items_per_family=1):
+    """(item_nbr, family) of every item, items grouped by family"""
+    families = list(families)
+    item_nbr = ITEM_OFFSET + np.arange(len(families) * items_per_family)
+    return item_nbr, np.repeat(np.arange(len(families)), items_per_family)
+
+def sales_block(dates, stores, products, rng, items_per_family=1, origin=None, oil=None):
+    """
+    Daily sales for every (date, store, item) of a date block
+
+    Sales are a per-store and per-item level with yearly growth, weekly
+    and yearly seasonality, holiday and promotion lifts and noise; all of
+    it is drawn as one (dates, stores, items) array.
+
+    Args:
+        dates: Dates of the block
+        stores: Store numbers
+        products: Product families
+        rng: NumPy Generator
+        items_per_family: Items per family (multiplies the row count)
+        origin: Date the growth trend starts from (default: first date)
+        oil: Oil price per date (default: a random walk from rng)
+
+    Returns:
+        Long DataFrame with date, store_nbr, item_nbr, family, unit_sales,
+        onpromotion, transactions, dcoilwtico and is_holiday
+    """
+    dates = pd.DatetimeIndex(dates)
+    stores = np.asarray(stores)
+    products = list(products)
+    item_nbr, family_codes = item_catalog(products, items_per_family)
+    n_dates, n_stores, n_items = len(dates), len(stores), len(item_nbr)
+
+    # Levels depend only on the store and item numbers, so a dataset
+    # generated in blocks has the same levels in every block
+    store_level = _hash_level(stores, 0.6, 1.4)
+    item_level = _hash_level(item_nbr + 17, 50.0, 300.0) / items_per_family
+
+    origin = dates[0] if origin is None else pd.Timestamp(origin)
+    years = (dates - origin).days.values / 365.25
+    holidays = holiday_flags(dates)
+    season = ((1.0 + ANNUAL_GROWTH) ** years
+              * (1.0 + 0.15 * (dates.dayofweek.values >= 5))
+              * (1.0 + 0.1 * np.sin(2 * np.pi * dates.dayofyear.values / 365.25))
+              * np.where(holidays == 1, HOLIDAY_LIFT, 1.0))
+
+    shape = (n_dates, n_stores, n_items)
+    promo = rng.random(shape) < PROMO_RATE
+    mean = (season[:, None, None] * store_level[None, :, None] * item_level[None, None, :]
+            * np.where(promo, PROMO_LIFT, 1.0))
+    sales = np.maximum(mean * (1.0 + rng.normal(0.0, 0.15, shape)), 0.0)
+    transactions = np.rint(sales.sum(axis=2) / 4.0 + rng.normal(0.0, 20.0, (n_dates, n_stores)))
+    oil = oil_prices(dates, rng) if oil is None else np.asarray(oil, dtype=float)
+
+    per_date = n_stores * n_items
+    frame = pd.DataFrame({
+        'date': np.repeat(dates.values, per_date),
+        'store_nbr': np.tile(np.repeat(stores, n_items), n_dates),
+        'item_nbr': np.tile(item_nbr, n_dates * n_stores),
+        'family': pd.Categorical.from_codes(np.tile(family_codes, n_dates * n_stores),
+                                            categories=products),
+        'unit_sales': sales.ravel().round(2),
+        'onpromotion': promo.ravel().astype(int),
+        'transactions': np.repeat(np.maximum(transactions, 0.0).ravel(), n_items),
+        'dcoilwtico': np.repeat(oil, per_date),
+        'is_holiday': np.repeat(holidays, per_date)
+    })
+    return compact_frame(frame)
+
+def sales_frame(start='2023-01-01', end=None, stores=(DEFAULT_STORE,), products=PRODUCTS,
+                seed=DEFAULT_SEED, items_per_family=1):
+    """
+    Synthetic multi-store, multi-product daily sales
+
+    Args:
+        start, end: Date range (end defaults to today)
+        stores: Store numbers, or a count to number stores 1..n
+        products: Product families, or a count of families
+        seed: Seed or Generator; the same seed gives the same frame
+        items_per_family: Items per family
+    """
+    dates = pd.date_range(start=start, end=_today() if end is None else end, freq='D')
+    return sales_block(dates, store_numbers(stores), family_names(products), make_rng(seed),
+                       items_per_family)
+
+def store_numbers(stores):
+    return np.arange(1, stores + 1) if isinstance(stores, int) else np.asarray(stores)
+
+def family_names(products):
+    """Family names for a count: the Favorita families first, then family_N"""
+    if not isinstance(products, int):
+        return list(products)
+    return [FAMILIES[i] if i < len(FAMILIES) else f'family_{i + 1}' for i in range(products)]
+
+# ============================================================================
+# STREAMED DATASETS
+# ============================================================================
+
+def iter_blocks(start, end, stores, families, seed=DEFAULT_SEED, items_per_family=1, block_rows=5_000_000):
+    """
+    Yield (dates, frame) blocks of a dataset too large to build at once
+
+    Each block draws from its own Generator seeded with (seed, block
+    number), so a seed and block size always give the same dataset; the
+    oil price is one walk over the whole range whatever the block size.
+    """
+    dates = pd.date_range(start=start, end=end, freq='D')
+    stores = store_numbers(stores)
+    families = family_names(families)
+    rows_per_day = len(stores) * len(families) * items_per_family
+    block_days = max(1, block_rows // rows_per_day)
+    oil = oil_prices(dates, make_rng([seed, 0]))
+
+    for number, first in enumerate(range(0, len(dates), block_days), start=1):
+        block = dates[first:first + block_days]
+        frame = sales_block(block, stores, families, make_rng([seed, number]),
+                            items_per_family, origin=dates[0], oil=oil[first:first + block_days])
+        yield block, frame
+
+def daily_totals(frame, store=None):
+    """Processed-format daily rows (date, unit_sales, exogenous columns) of a block"""
+    if store is not None:
+        frame = frame[frame['store_nbr'] == store]
+    frame = frame.assign(unit_sales=frame['unit_sales'].astype(np.float64))
+    grouped = frame.groupby('date', sort=True)
+    totals = grouped.agg(unit_sales=('unit_sales', 'sum'), onpromotion=('onpromotion', 'sum'),
+                         dcoilwtico=('dcoilwtico', 'first'), is_holiday=('is_holiday', 'first'))
+    # transactions repeat on every item row of a store
+    store_days = frame.drop_duplicates(['date', 'store_nbr'])
+    totals['transactions'] = store_days.groupby('date')['transactions'].sum()
+    totals = totals.reset_index()
+    totals['unit_sales'] = totals['unit_sales'].round(3)
+    return totals[['date', 'unit_sales', 'onpromotion', 'transactions', 'dcoilwtico', 'is_holiday']]
+
+def write_partition(frame, path, fmt):
+    if fmt == 'parquet':
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False, date_format='%Y-%m-%d')
+
+def read_partitions(path, **read_csv_kwargs):
+    """
+    Read a train.csv-style file, or a directory of part-*.csv/.parquet
+    files written by this generator, as one frame
+    """
+    path = Path(path)
+    if not path.is_dir():
+        return pd.read_csv(path, **read_csv_kwargs)
+    parts = sorted(path.glob('part-*.parquet'))
+    if parts:
+        columns = read_csv_kwargs.get('usecols')
+        return pd.concat([pd.read_parquet(p, columns=columns) for p in parts], ignore_index=True)
+    return pd.concat([pd.read_csv(p, **read_csv_kwargs) for p in sorted(path.glob('part-*.csv'))],
+                     ignore_index=True)
+
+def iter_partitions(path, chunk_rows=5_000_000, **read_csv_kwargs):
+    """
+    Like read_partitions(), one block at a time: every parquet part, or
+    `chunk_rows` rows of each CSV, so the whole file is never in memory
+    """
+    path = Path(path)
+    parts = sorted(path.glob('part-*.parquet')) if path.is_dir() else []
+    if parts:
+        columns = read_csv_kwargs.get('usecols')
+        for part in parts:
+            yield pd.read_parquet(part, columns=columns)
+        return
+    files = sorted(path.glob('part-*.csv')) if path.is_dir() else [path]
+    for file in files:
+        yield from pd.read_csv(file, chunksize=chunk_rows, **read_csv_kwargs)
+
+def generate_dataset(out_dir, start, end, stores, families, items_per_family=1, seed=DEFAULT_SEED,
+                     fmt='csv', block_rows=5_000_000, processed_store=None):
+    """
+    Stream a raw-format dataset to out_dir
+
+    Writes train/part-<first date>.<fmt> blocks (date, store_nbr,
+    item_nbr, unit_sales, onpromotion) plus items.csv, stores.csv,
+    oil.csv, transactions.csv, holidays_events.csv and
+    processed_sales_data.csv (daily totals of one store), shaped like the
+    real inputs of training, ingestion and serving.
+
+    Returns:
+        Manifest dict, also written to out_dir/manifest.json
+    """
+    out_dir = Path(out_dir)
+    train_dir = out_dir / 'train'
+    train_dir.mkdir(parents=True, exist_ok=True)
+    for stale in train_dir.glob('part-*'):
+        stale.unlink()
+
+    stores = store_numbers(stores)
+    families = family_names(families)
+    processed_store = int(stores[0]) if processed_store is None else processed_store
+    started = time.perf_counter()
+    rows, partitions = 0, 0
+    side_tables = {'oil': [], 'transactions': [], 'processed': []}
+
+    for block, frame in iter_blocks(start, end, stores, families, seed, items_per_family, block_rows):
+        part = train_dir / f"part-{block[0].strftime('%Y-%m-%d')}.{fmt}"
+        write_partition(frame[['date', 'store_nbr', 'item_nbr', 'unit_sales', 'onpromotion']], part, fmt)
+        side_tables['oil'].append(frame.drop_duplicates('date')[['date', 'dcoilwtico']])
+        side_tables['transactions'].append(
+            frame.drop_duplicates(['date', 'store_nbr'])[['date', 'store_nbr', 'transactions']])
+        side_tables['processed'].append(daily_totals(frame, processed_store))
+        rows += len(frame)
+        partitions += 1
+        print(f"  ✓ {part.name}: {len(frame):,} rows ({rows:,} total)")
+
+    item_nbr, family_codes = item_catalog(families, items_per_family)
+    pd.DataFrame({
+        'item_nbr': item_nbr,
+        'family': np.asarray(families)[family_codes],
+        'class': 1000 + family_codes,
+        'perishable': np.isin(np.asarray(families)[family_codes],
+                              ['BREAD/BAKERY', 'DAIRY', 'EGGS', 'MEATS', 'POULTRY', 'PRODUCE', 'SEAFOOD']).astype(int)
+    }).to_csv(out_dir / 'items.csv', index=False)
+    pd.DataFrame({
+        'store_nbr': stores,
+        'city': 'Synthetic',
+        'state': 'Synthetic',
+        'type': np.asarray(list('ABCDE'))[stores % 5],
+        'cluster': stores % 17 + 1
+    }).to_csv(out_dir / 'stores.csv', index=False)
+
+    all_dates = pd.date_range(start=start, end=end, freq='D')
+    holiday_dates = all_dates[holiday_flags(all_dates) == 1]
+    pd.DataFrame({'date': holiday_dates, 'type': 'Holiday', 'locale': 'National',
+                  'locale_name': 'Ecuador', 'description': 'Synthetic holiday', 'transferred': False}
+                 ).to_csv(out_dir / 'holidays_events.csv', index=False, date_format='%Y-%m-%d')
+    for name, file_name in [('oil', 'oil.csv'), ('transactions', 'transactions.csv'),
+                            ('processed', 'processed_sales_data.csv')]:
+        pd.concat(side_tables[name], ignore_index=True).to_csv(
+            out_dir / file_name, index=False, date_format='%Y-%m-%d')
+
+    manifest = {
+        'start': str(all_dates[0].date()),
+        'end': str(all_dates[-1].date()),
+        'stores': len(stores),
+        'families': len(families),
+        'items_per_family': items_per_family,
+        'seed': seed,
+        'format': fmt,
+        'block_rows': block_rows,
+        'rows': rows,
+        'partitions': partitions,
+        'processed_store': processed_store,
+        'seconds': round(time.perf_counter() - started, 2),
+        'generated_at': datetime.now().isoformat()
+    }
+    with open(out_dir / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Wing Shop dataset at any scale')
+    parser.add_argument('out_dir', help='Output directory')
+    parser.add_argument('--start', default='2013-01-01')
+    parser.add_argument('--end', default='2017-08-15')
+    parser.add_argument('--stores', type=int, default=54, help='Number of stores')
+    parser.add_argument('--families', type=int, default=len(FAMILIES), help='Number of product families')
+    parser.add_argument('--items-per-family', type=int, default=1,
+                        help='Items per family; rows = days x stores x families x items')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--block-rows', type=int, default=5_000_000,
+                        help='Rows generated and written per partition')
+    parser.add_argument('--processed-store', type=int, default=None,
+                        help='Store summed into processed_sales_data.csv (default: the first)')
+    args = parser.parse_args()
+
+    if args.format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        print("✗ Parquet output needs pyarrow (pip install pyarrow)")
+        sys.exit(1)
+
+    days = len(pd.date_range(args.start, args.end, freq='D'))
+    total = days * args.stores * args.families * args.items_per_family
+    print(f"Generating {total:,} rows: {days} days x {args.stores} stores x "
+          f"{args.families} families x {args.items_per_family} items")
+
+    manifest = generate_dataset(args.out_dir, args.start, args.end, args.stores, args.families,
+                                args.items_per_family, args.seed, args.format, args.block_rows,
+                                args.processed_store)
+    print(f"\n✓ {manifest['rows']:,} rows in {manifest['partitions']} partitions "
+          f"({manifest['seconds']}s) written to {args.out_dir}")
+
+if __name__ == '__main__':
+    main()
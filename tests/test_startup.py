@@ -0,0 +1,17 @@
+"""
+Cold-import budget of the services in lazy startup mode
+
+Each module is imported in a fresh interpreter (startup.import_report) and
+must stay within startup.IMPORT_BUDGETS_MS without importing any of
+startup.DEFERRED_MODULES.
+"""
+
+import pytest
+
+from startup import IMPORT_BUDGETS_MS, budget_problems, import_report
+
+@pytest.mark.parametrize('module', sorted(IMPORT_BUDGETS_MS))
+def test_lazy_import_within_budget(module):
+    report = import_report(module, mode='lazy')
+    assert report['total_ms'] is not None, f"{module} was not found in the import report"
+    assert budget_problems(report) == []
@@ -0,0 +1,75 @@
+"""
+Parity of the exported NumPy forecasters with statsmodels and Prophet
+
+Small models are fitted on a synthetic daily series, exported, written to
+JSON and loaded back; the NumPy forecast must match the original model's
+within PARITY_RTOL (relative to max(|forecast|, 1)).
+"""
+
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+
+from forecast_models import fit_model
+from statespace import (
+    PARITY_RTOL, export_state, load_state, reference_forecast, save_state
+)
+
+STEPS = 28
+
+@pytest.fixture(scope='module')
+def daily_sales():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2016-01-01', periods=240, freq='D')
+    t = np.arange(len(dates))
+    weekly = np.array([0.9, 0.95, 1.0, 1.0, 1.1, 1.3, 1.2])[dates.dayofweek]
+    sales = (1000 + 2 * t) * weekly + rng.normal(0, 30, len(dates))
+    return pd.DataFrame({'date': dates, 'unit_sales': sales})
+
+def _round_trip(name, results, tmp_path):
+    state = export_state(name, results, steps=STEPS)
+    path = tmp_path / f'{name}_state.json'
+    save_state(state, path)
+    return load_state(path)
+
+def _max_relative_error(actual, expected):
+    expected = np.asarray(expected, dtype=float)
+    return float(np.max(np.abs(np.asarray(actual) - expected) / np.maximum(np.abs(expected), 1.0)))
+
+@pytest.mark.parametrize('params', [
+    {'trend': 'add', 'seasonal': 'add'},
+    {'trend': None, 'seasonal': 'add'},
+    {'trend': 'add', 'seasonal': 'mul'},
+])
+def test_exp_smoothing_parity(daily_sales, tmp_path, params):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        results = fit_model('exp_smoothing', daily_sales, params)
+    forecaster = _round_trip('exp_smoothing', results, tmp_path)
+    expected = reference_forecast('exp_smoothing', results, STEPS)
+    assert _max_relative_error(forecaster.forecast(STEPS), expected) <= PARITY_RTOL
+
+@pytest.mark.parametrize('params', [
+    {'order': (1, 1, 1), 'seasonal_order': (1, 1, 1, 7)},
+    {'order': (2, 0, 0), 'seasonal_order': (0, 1, 1, 7)},
+])
+def test_sarima_parity(daily_sales, tmp_path, params):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        results = fit_model('sarima', daily_sales, params)
+    forecaster = _round_trip('sarima', results, tmp_path)
+    expected = reference_forecast('sarima', results, STEPS)
+    assert _max_relative_error(forecaster.forecast(STEPS), expected) <= PARITY_RTOL
+
+def test_prophet_parity(daily_sales, tmp_path):
+    pytest.importorskip('prophet')
+    results = fit_model('prophet', daily_sales)
+    forecaster = _round_trip('prophet', results, tmp_path)
+    expected = reference_forecast('prophet', results, STEPS)
+    assert _max_relative_error(forecaster.forecast(STEPS), expected) <= PARITY_RTOL
+
+    # The predict() frame the dashboard reads carries the same yhat
+    dates = pd.date_range(daily_sales['date'].max() + pd.Timedelta(days=1), periods=STEPS, freq='D')
+    served = forecaster.predict(pd.DataFrame({'ds': dates}))['yhat'].values
+    assert _max_relative_error(served, expected) <= PARITY_RTOL
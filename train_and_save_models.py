@@ -8,15 +8,37 @@ import numpy as np
 import pickle
 import json
 import os
+import argparse
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
 # Time Series Models
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
-from statsmodels.tsa.statespace.sarimax import SARIMAX
-from prophet import Prophet
-from sklearn.ensemble import RandomForestRegressor
+from exogenous import EXOGENOUS_PATH, ExogenousIndex
+from feature_store import FEATURE_STORE_DIR, DEFAULT_SERIES, FeatureStore
+from statespace import STATE_FILES, export_state, save_state
+from simulation import RF_RESIDUALS_FILE, out_of_bag_residuals, save_residuals
+from hierarchical import CATEGORY_MAPPING, SeriesPanel, HierarchicalForecaster, print_training_report
+from forecast_models import (
+    fit_model, holdout_errors, inverse_error_weights, load_tuned_params, RF_FEATURE_COLUMNS
+)
+
+parser = argparse.ArgumentParser(description='Train and save Wing Shop forecasting models')
+parser.add_argument('--store', type=int, default=44, help='Store for the single-series models')
+parser.add_argument('--hierarchical', action='store_true',
+                    help='Also train the global store x family model for every series')
+parser.add_argument('--max-samples', type=float, default=0.2,
+                    help='Fraction of rows bootstrapped per tree in the global model')
+parser.add_argument('--memmap-dir', default=None,
+                    help='Stream the global feature matrix to disk here')
+parser.add_argument('--feature-store', default=str(FEATURE_STORE_DIR),
+                    help='Feature store directory')
+parser.add_argument('--keep-statsmodels', action='store_true',
+                    help='Also pickle the full SARIMA/ETS results objects')
+parser.add_argument('--keep-prophet', action='store_true',
+                    help='Also pickle the full Prophet model')
+args, _ = parser.parse_known_args()
+STORE_NBR = args.store
 
 print("="*80)
 print("WING SHOP - MODEL TRAINING & SAVING")
@@ -36,23 +58,22 @@ oil = pd.read_csv(r"D:\CADT\InternshipII\wing_shop\data\raw\extracted_all\oil.cs
 transactions = pd.read_csv(r"D:\CADT\InternshipII\wing_shop\data\raw\extracted_all\transactions.csv", parse_dates=['date'])
 train = pd.read_csv(r'D:\CADT\InternshipII\wing_shop\data\raw\extracted_all\train.csv', parse_dates=['date'])
 
-# Filter for Store 44
-store_44_data = train[train['store_nbr'] == 44].copy()
+# Filter for the selected store
+store_data = train[train['store_nbr'] == STORE_NBR].copy()
+
+print(f"✓ Store {STORE_NBR} data loaded: {store_data.shape}")
 
-print(f"✓ Store 44 data loaded: {store_44_data.shape}")
+# Dense date-indexed oil, holidays and transactions, shared with serving
+exogenous = ExogenousIndex.from_frames(oil, holiday_events, transactions, store=STORE_NBR)
+exogenous.save(EXOGENOUS_PATH)
+print(f"✓ Exogenous calendar saved: {len(exogenous)} days → {EXOGENOUS_PATH}")
 
 # ============================================================================
 # 2. CREATE PRODUCT CATEGORIES MAPPING
 # ============================================================================
 
 # Map actual families to dashboard categories
-category_mapping = {
-    'GROCERY I': 'Rice',
-    'BEVERAGES': 'Bottled Water',
-    'GROCERY II': 'Cooking Oil',
-    'BREAD/BAKERY': 'Instant Noodles',
-    'PRODUCE': 'Sugar'
-}
+category_mapping = CATEGORY_MAPPING
 
 # For this example, we'll create aggregated data by product family
 # In production, you'd map specific items to categories
@@ -71,11 +92,11 @@ def prepare_category_data(category_filter=None):
         relevant_families = [k for k, v in category_mapping.items() if v == category_filter]
         if relevant_families:
             category_items = items[items['family'].isin(relevant_families)]['item_nbr'].unique()
-            filtered_data = store_44_data[store_44_data['item_nbr'].isin(category_items)].copy()
+            filtered_data = store_data[store_data['item_nbr'].isin(category_items)].copy()
         else:
-            filtered_data = store_44_data.copy()
+            filtered_data = store_data.copy()
     else:
-        filtered_data = store_44_data.copy()
+        filtered_data = store_data.copy()
     
     # Aggregate daily sales
     daily_sales = filtered_data.groupby('date').agg({
@@ -83,27 +104,11 @@ def prepare_category_data(category_filter=None):
         'onpromotion': 'sum'
     }).reset_index()
     
-    # Merge with transactions
-    daily_sales = daily_sales.merge(
-        transactions[transactions['store_nbr'] == 44][['date', 'transactions']], 
-        on='date', 
-        how='left'
-    )
-    
-    # Merge with oil prices
-    daily_sales = daily_sales.merge(oil, on='date', how='left')
-    
-    # Forward fill missing values
-    daily_sales['dcoilwtico'] = daily_sales['dcoilwtico'].fillna(method='ffill').fillna(method='bfill')
+    # Transactions, oil and holidays are slices of the shared calendar
+    for col, values in exogenous.columns(daily_sales['date'], STORE_NBR).items():
+        daily_sales[col] = values
+    daily_sales['dcoilwtico'] = daily_sales['dcoilwtico'].ffill().bfill()
     daily_sales['transactions'] = daily_sales['transactions'].fillna(0)
-    
-    # Add holiday features
-    holiday_events['is_holiday'] = 1
-    daily_sales = daily_sales.merge(
-        holiday_events[['date', 'is_holiday']].drop_duplicates('date'),
-        on='date',
-        how='left'
-    )
     daily_sales['is_holiday'] = daily_sales['is_holiday'].fillna(0)
     
     # Handle negative sales
@@ -112,28 +117,8 @@ def prepare_category_data(category_filter=None):
     # Sort by date
     daily_sales = daily_sales.sort_values('date').reset_index(drop=True)
     
-    # Create features
-    daily_sales['year'] = daily_sales['date'].dt.year
-    daily_sales['month'] = daily_sales['date'].dt.month
-    daily_sales['day'] = daily_sales['date'].dt.day
-    daily_sales['dayofweek'] = daily_sales['date'].dt.dayofweek
-    daily_sales['quarter'] = daily_sales['date'].dt.quarter
-    daily_sales['is_weekend'] = daily_sales['dayofweek'].isin([5, 6]).astype(int)
-    daily_sales['day_of_month'] = daily_sales['date'].dt.day
-    daily_sales['is_month_start'] = daily_sales['date'].dt.is_month_start.astype(int)
-    daily_sales['is_month_end'] = daily_sales['date'].dt.is_month_end.astype(int)
-    daily_sales['is_payday'] = ((daily_sales['day_of_month'] == 15) | 
-                                 (daily_sales['is_month_end'] == 1)).astype(int)
-    
-    # Lag features
-    for lag in [1, 7, 14, 30]:
-        daily_sales[f'sales_lag_{lag}'] = daily_sales['unit_sales'].shift(lag)
-    
-    # Rolling statistics
-    for window in [7, 14, 30]:
-        daily_sales[f'sales_rolling_mean_{window}'] = daily_sales['unit_sales'].rolling(window=window).mean()
-        daily_sales[f'sales_rolling_std_{window}'] = daily_sales['unit_sales'].rolling(window=window).std()
-    
+    # Calendar, lag and rolling features are materialized in the feature
+    # store, so training, backtesting and serving read the same values
     return daily_sales
 
 # ============================================================================
@@ -149,17 +134,42 @@ os.makedirs('data', exist_ok=True)
 # Prepare data for the main category (all products)
 daily_sales = prepare_category_data(category_filter=None)
 
-# Save processed data
+# Save processed data; derived columns live in the feature store, not the CSV
 daily_sales.to_csv('data/processed_sales_data.csv', index=False)
 print("✓ Saved processed data")
 
+# Only dates the store does not hold yet are computed
+feature_store = FeatureStore(args.feature_store)
+written = feature_store.materialize(DEFAULT_SERIES, daily_sales)
+print(f"✓ Feature store: {written} new rows, {feature_store.manifest(DEFAULT_SERIES)['rows']} stored")
+
 # Train models on full dataset
 sales_series = daily_sales.set_index('date')['unit_sales']
 
+# Winners from hyperparameter_search.py override the default configurations
+tuned_params = load_tuned_params('models/hyperparameters.json')
+for model_name, params in tuned_params.items():
+    print(f"✓ Using tuned {model_name} parameters: {params}")
+
+def save_exported(name, results, keep_pickle):
+    """
+    Save the NumPy state the dashboard serves from, checked against the
+    original model; the full pickle is only kept when keep_pickle is set
+    """
+    state = export_state(name, results)
+    save_state(state, f'models/{STATE_FILES[name]}')
+    print(f"  - State export matches the original model over {state['parity']['steps']} days "
+          f"(max relative error {state['parity']['max_relative_error']:.1e})")
+    if keep_pickle:
+        with open(f'models/{name}_model.pkl', 'wb') as f:
+            pickle.dump(results, f)
+    elif os.path.exists(f'models/{name}_model.pkl'):
+        # A stale pickle would be served if the state file went missing
+        os.remove(f'models/{name}_model.pkl')
+
 # Model 1: Moving Average
 print("\nTraining Moving Average...")
-ma_window = 7
-ma_model = {'window': ma_window, 'last_values': sales_series.tail(ma_window).values}
+ma_model = fit_model('ma', daily_sales)
 with open('models/ma_model.pkl', 'wb') as f:
     pickle.dump(ma_model, f)
 print("✓ Saved Moving Average model")
@@ -167,14 +177,8 @@ print("✓ Saved Moving Average model")
 # Model 2: Exponential Smoothing
 print("\nTraining Exponential Smoothing...")
 try:
-    es_model = ExponentialSmoothing(
-        sales_series,
-        seasonal_periods=7,
-        trend='add',
-        seasonal='add'
-    ).fit()
-    with open('models/exp_smoothing_model.pkl', 'wb') as f:
-        pickle.dump(es_model, f)
+    es_model = fit_model('exp_smoothing', daily_sales)
+    save_exported('exp_smoothing', es_model, args.keep_statsmodels)
     print("✓ Saved Exponential Smoothing model")
 except Exception as e:
     print(f"⚠ Exponential Smoothing failed: {e}")
@@ -182,13 +186,8 @@ except Exception as e:
 # Model 3: SARIMA
 print("\nTraining SARIMA...")
 try:
-    sarima_model = SARIMAX(
-        sales_series,
-        order=(1, 1, 1),
-        seasonal_order=(1, 1, 1, 7)
-    ).fit(disp=False)
-    with open('models/sarima_model.pkl', 'wb') as f:
-        pickle.dump(sarima_model, f)
+    sarima_model = fit_model('sarima', daily_sales, tuned_params.get('sarima'))
+    save_exported('sarima', sarima_model, args.keep_statsmodels)
     print("✓ Saved SARIMA model")
 except Exception as e:
     print(f"⚠ SARIMA failed: {e}")
@@ -196,17 +195,8 @@ except Exception as e:
 # Model 4: Prophet
 print("\nTraining Prophet...")
 try:
-    prophet_train = daily_sales[['date', 'unit_sales']].rename(columns={'date': 'ds', 'unit_sales': 'y'})
-    prophet_model = Prophet(
-        yearly_seasonality=True,
-        weekly_seasonality=True,
-        daily_seasonality=False,
-        changepoint_prior_scale=0.05
-    )
-    prophet_model.add_country_holidays(country_name='EC')
-    prophet_model.fit(prophet_train)
-    with open('models/prophet_model.pkl', 'wb') as f:
-        pickle.dump(prophet_model, f)
+    prophet_model = fit_model('prophet', daily_sales)
+    save_exported('prophet', prophet_model, args.keep_prophet)
     print("✓ Saved Prophet model")
 except Exception as e:
     print(f"⚠ Prophet failed: {e}")
@@ -214,27 +204,23 @@ except Exception as e:
 # Model 5: Random Forest
 print("\nTraining Random Forest...")
 try:
-    feature_cols = ['dayofweek', 'month', 'quarter', 'is_weekend', 'is_payday',
-                    'onpromotion', 'transactions', 'dcoilwtico', 'is_holiday',
-                    'sales_lag_1', 'sales_lag_7', 'sales_lag_14', 'sales_lag_30',
-                    'sales_rolling_mean_7', 'sales_rolling_mean_14', 'sales_rolling_mean_30']
-    
-    train_ml = daily_sales.dropna(subset=feature_cols + ['unit_sales'])
-    X_train = train_ml[feature_cols]
-    y_train = train_ml['unit_sales']
-    
-    rf_model = RandomForestRegressor(
-        n_estimators=100,
-        max_depth=10,
-        min_samples_split=5,
-        random_state=42,
-        n_jobs=-1
-    )
-    rf_model.fit(X_train, y_train)
+    feature_cols = RF_FEATURE_COLUMNS
+    rf_features = feature_store.feature_set(DEFAULT_SERIES, daily_sales['date'])
+    rf_model = fit_model('random_forest', daily_sales, tuned_params.get('random_forest'),
+                         features=rf_features)
     
     with open('models/random_forest_model.pkl', 'wb') as f:
         pickle.dump(rf_model, f)
     
+    # Out-of-bag residuals are bootstrapped into the simulated forecast intervals
+    X = rf_features.matrix(feature_cols)
+    y = daily_sales['unit_sales'].values.astype(float)
+    valid = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+    if getattr(rf_model, 'bootstrap', False):
+        residuals = out_of_bag_residuals(rf_model, X[valid], y[valid])
+        save_residuals(residuals, f'models/{RF_RESIDUALS_FILE}')
+        print(f"  - {len(residuals)} out-of-bag residuals (std {residuals.std():.1f})")
+    
     # Save feature columns
     with open('models/feature_columns.json', 'w') as f:
         json.dump(feature_cols, f)
@@ -243,6 +229,38 @@ try:
 except Exception as e:
     print(f"⚠ Random Forest failed: {e}")
 
+# Ensemble weights from holdout error
+print("\nComputing ensemble weights from 28-day holdout...")
+try:
+    errors = holdout_errors(daily_sales, holdout_days=28, params=tuned_params)
+    ensemble_weights = {
+        'holdout_days': 28,
+        'errors': errors,
+        'weights': inverse_error_weights(errors)
+    }
+    with open('models/ensemble_weights.json', 'w') as f:
+        json.dump(ensemble_weights, f, indent=2)
+    for name, weight in ensemble_weights['weights'].items():
+        print(f"  - {name}: weight={weight:.3f}, RMSE={errors[name]['rmse']:.1f}")
+    print("✓ Saved ensemble weights")
+except Exception as e:
+    print(f"⚠ Ensemble weighting failed: {e}")
+
+# Global store x family model
+if args.hierarchical:
+    print("\nTraining global store x family Random Forest...")
+    try:
+        panel = SeriesPanel.from_raw(train, items)
+        print(f"  - {len(panel)} series x {len(panel.dates)} days")
+        hierarchy = HierarchicalForecaster().fit(
+            panel, {'max_samples': args.max_samples}, memmap_dir=args.memmap_dir
+        )
+        print_training_report(hierarchy.training_report)
+        hierarchy.save('models/global_random_forest.pkl')
+        print("✓ Saved global store x family model")
+    except Exception as e:
+        print(f"⚠ Global store x family model failed: {e}")
+
 # ============================================================================
 # 5. SAVE METADATA
 # ============================================================================
@@ -251,6 +269,8 @@ print("\n[4/4] Saving Metadata...")
 
 metadata = {
     'last_training_date': datetime.now().isoformat(),
+    'store_nbr': STORE_NBR,
+    'hierarchical': args.hierarchical,
     'data_date_range': {
         'start': daily_sales['date'].min().isoformat(),
         'end': daily_sales['date'].max().isoformat()
@@ -270,5 +290,6 @@ print("MODEL TRAINING COMPLETE!")
 print("="*80)
 print(f"\nModels saved in: ./models/")
 print(f"Data saved in: ./data/")
+print(f"\nRefresh accuracy metrics with: python backtesting.py")
 print(f"\nYou can now run the Flask dashboard with: python app.py")
 print("="*80)
@@ -6,6 +6,7 @@ Trains and saves the Random Forest model with feature columns for Vercel deploym
 import os
 import pickle
 import json
+import argparse
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
@@ -14,9 +15,11 @@ from sklearn.model_selection import train_test_split
 from datetime import datetime, timedelta
 from pathlib import Path
 
-def create_synthetic_training_data(n_samples=1000):
+from synthetic import make_rng, iter_partitions, DEFAULT_SEED
+
+def create_synthetic_training_data(n_samples=1000, seed=DEFAULT_SEED):
     """Create synthetic training data for Random Forest"""
-    np.random.seed(42)
+    rng = make_rng(seed)
     
     # Generate dates
     dates = pd.date_range(start='2022-01-01', periods=n_samples, freq='D')
@@ -24,14 +27,14 @@ def create_synthetic_training_data(n_samples=1000):
     # Create features
     data = {
         'date': dates,
-        'lag_1': np.random.uniform(50, 300, n_samples),
-        'lag_7': np.random.uniform(50, 300, n_samples),
-        'lag_30': np.random.uniform(50, 300, n_samples),
-        'rolling_mean_7': np.random.uniform(80, 250, n_samples),
-        'rolling_mean_30': np.random.uniform(80, 250, n_samples),
+        'lag_1': rng.uniform(50, 300, n_samples),
+        'lag_7': rng.uniform(50, 300, n_samples),
+        'lag_30': rng.uniform(50, 300, n_samples),
+        'rolling_mean_7': rng.uniform(80, 250, n_samples),
+        'rolling_mean_30': rng.uniform(80, 250, n_samples),
         'day_of_week': np.tile(np.arange(7), n_samples // 7 + 1)[:n_samples],
         'month': np.repeat(np.arange(1, 13), n_samples // 12 + 1)[:n_samples],
-        'is_holiday': np.random.binomial(1, 0.1, n_samples),
+        'is_holiday': rng.binomial(1, 0.1, n_samples),
     }
     
     df = pd.DataFrame(data)
@@ -45,7 +48,7 @@ def create_synthetic_training_data(n_samples=1000):
         df['rolling_mean_30'] * 0.05 +
         (df['day_of_week'] / 7 * 50) +  # Day of week effect
         (df['is_holiday'] * 30) +  # Holiday boost
-        np.random.normal(0, 15, n_samples)  # Noise
+        rng.normal(0, 15, n_samples)  # Noise
     )
     
     # Ensure non-negative sales
@@ -57,9 +60,10 @@ def train_random_forest(X, y):
     """Train Random Forest model"""
     print("\n[3/4] Training Random Forest Model...")
     
-    # Split data
+    # Chronological split: the test set is the most recent 20% of days, so
+    # the score is not inflated by training on the future
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
+        X, y, test_size=0.2, shuffle=False
     )
     
     # Train model
@@ -109,7 +113,69 @@ def train_random_forest(X, y):
         'accuracy': float(test_score)
     }
 
+def train_global_random_forest(train_path, items_path, models_dir, max_samples=0.2, memmap_dir=None):
+    """
+    Train one Random Forest across every store x family series
+    
+    The stacked feature matrix is streamed as float32 (optionally into a
+    memory-mapped file) and each tree sees a `max_samples` bootstrap, so the
+    full multi-store history fits on one machine.
+    """
+    from hierarchical import SeriesPanel, HierarchicalForecaster, print_training_report
+    
+    print("\n[1/3] Building store x family panel...")
+    # Streamed: each block is reduced to daily store x family totals as it is read
+    train = iter_partitions(
+        train_path,
+        usecols=['date', 'store_nbr', 'item_nbr', 'unit_sales'],
+        dtype={'store_nbr': 'int16', 'item_nbr': 'int32', 'unit_sales': 'float32'},
+        parse_dates=['date']
+    )
+    items = pd.read_csv(items_path, usecols=['item_nbr', 'family'])
+    panel = SeriesPanel.from_raw(train, items)
+    print(f"✓ Panel: {len(panel)} series x {len(panel.dates)} days")
+    
+    print("\n[2/3] Training global Random Forest...")
+    forecaster = HierarchicalForecaster().fit(
+        panel, {'max_samples': max_samples}, memmap_dir=memmap_dir
+    )
+    print_training_report(forecaster.training_report)
+    
+    print("\n[3/3] Saving global model...")
+    model_path = models_dir / 'global_random_forest.pkl'
+    forecaster.save(model_path)
+    print(f"✓ Global model saved: {model_path}")
+    
+    report_path = models_dir / 'global_training_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(forecaster.training_report, f, indent=2)
+    print(f"✓ Training report saved: {report_path}")
+    
+    return forecaster
+
 def main():
+    parser = argparse.ArgumentParser(description='Train and save the Random Forest model')
+    parser.add_argument('--global', dest='global_model', action='store_true',
+                        help='Train one global model across all store x family series')
+    parser.add_argument('--train', help='Raw train.csv or a directory of generated partitions (global mode)')
+    parser.add_argument('--items', help='Raw items.csv (global mode)')
+    parser.add_argument('--max-samples', type=float, default=0.2,
+                        help='Fraction of rows bootstrapped per tree (global mode)')
+    parser.add_argument('--memmap-dir', default=None,
+                        help='Stream the feature matrix to disk here (global mode)')
+    args = parser.parse_args()
+    
+    if args.global_model:
+        if not args.train or not args.items:
+            parser.error('--global requires --train and --items')
+        print("="*80)
+        print("GLOBAL RANDOM FOREST TRAINING ACROSS ALL STORE x FAMILY SERIES")
+        print("="*80)
+        models_dir = Path(__file__).parent / 'models'
+        models_dir.mkdir(exist_ok=True)
+        train_global_random_forest(args.train, args.items, models_dir, args.max_samples, args.memmap_dir)
+        return
+    
     print("="*80)
     print("RANDOM FOREST MODEL TRAINING & SAVING FOR VERCEL DEPLOYMENT")
     print("="*80)